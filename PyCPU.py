@@ -14,19 +14,45 @@ import sys, os, time, struct, re
 
 sys.path.append("lib")
 
-import pydasm
+try:
+    import pydasm
+    
+    # pydasm only decodes from the start of a string
+    decode_in_place = False
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32, which can decode
+    # straight out of a page at an offset
+    from ia32 import dasm as pydasm
+    
+    decode_in_place = True
 
 from PyContext import PyContext
-from PyFlags import PyFlags
+from PyFlags import PyFlags, defined_flags
+from PyJIT import PyJIT
+from PyFusion import PyFusion
+from PyPredecode import ends_block
 from PyInstruction import *
 from PyDebug import *
 
+#
+# register_slot: Builds a property exposing one slot of the register file
+#                as a member (cpu.EAX and friends)
+#
+def register_slot(slot):
+    def get(self):
+        return self.registers[slot]
+    
+    def set(self, value):
+        self.registers[slot] = value
+    
+    return property(get, set)
+
 '''
 PyCPU:
 
     The heart of PyEmu.  The CPU class handles execution of instructions.
 '''
-class PyCPU:
+class PyCPU(object):
     DEBUG = 0
     
     # Bitmap of eflags
@@ -48,10 +74,110 @@ class PyCPU:
                   "VIP": 0x100000,
                   "ID": 0x200000 }
     
+    # Masks by operand size
+    masks = {1: 0xff, 2: 0xffff, 4: 0xffffffff}
+    
+    # CPU attributes outside the register file and arithmetic flags that
+    # get_state has to save
+    state_names = ("EIP", "CS", "SS", "DS", "ES", "FS", "GS", "TF", "IF", "DF",
+                   "IOPL", "NT", "RF", "VM", "AC", "VIF", "VIP", "ID")
+    
+    # Precompiled little endian unpackers by access size
+    unpackers = {1: struct.Struct("<B"), 2: struct.Struct("<H"), 4: struct.Struct("<I")}
+    
+    # Register views by size.  Each maps a register name and its pydasm
+    # index to (name, slot, shift, mask, keep).  slot indexes the general
+    # purpose register file, or is None for registers we keep as plain
+    # members.  keep is the mask of bits a write leaves alone.
+    register_views = {4: {}, 2: {}, 1: {}}
+    for index, name in enumerate(["EAX", "ECX", "EDX", "EBX", "ESP", "EBP", "ESI", "EDI"]):
+        register_views[4][name] = register_views[4][index] = (name, index, 0, 0xffffffff, 0)
+        register_views[2][name[1:]] = register_views[2][index] = (name[1:], index, 0, 0xffff, 0xffff0000)
+    for index, name in enumerate(["AL", "CL", "DL", "BL"]):
+        register_views[1][name] = register_views[1][index] = (name, index, 0, 0xff, 0xffffff00)
+    for index, name in enumerate(["AH", "CH", "DH", "BH"]):
+        register_views[1][name] = register_views[1][index + 4] = (name, index, 8, 0xff, 0xffff00ff)
+    register_views[4]["EIP"] = ("EIP", None, 0, 0xffffffff, 0)
+    for name in ["CS", "SS", "DS", "ES", "FS", "GS"]:
+        register_views[2][name] = (name, None, 0, 0xffff, 0)
+    for name in ["CF", "PF", "AF", "ZF", "SF", "TF", "IF", "DF", "OF", "IOPL", "NT", "RF", "VM", "AC", "VIF", "VIP", "ID"]:
+        register_views[1][name] = (name, None, 0, 0xff, 0)
+    del index, name
+    
+    # Prefix bytes we skip when looking for the opcode
+    prefixes = ["\xf0", "\xf2", "\xf3", "\x2e", "\x36", "\x3e", "\x26", "\x64", "\x65", "\x66", "\x67"]
+    
+    # Opcode maps used to resolve an instruction to its handler at decode
+    # time.  An entry is either a method name, a list of 8 names indexed by
+    # the ModRM reg field for group opcodes or a (16 bit, 32 bit) tuple for
+    # string instructions whose form depends on the operand size.  Anything
+    # missing here falls back to the mnemonic table.
+    opcode_map = {0x00: "ADD", 0x01: "ADD", 0x03: "ADD", 0x04: "ADD", 0x05: "ADD",
+                  0x06: "PUSH", 0x07: "POP",
+                  0x08: "OR", 0x09: "OR", 0x0b: "OR", 0x0c: "OR", 0x0d: "OR",
+                  0x10: "ADC", 0x11: "ADC", 0x13: "ADC", 0x14: "ADC", 0x15: "ADC",
+                  0x16: "PUSH",
+                  0x18: "SBB", 0x19: "SBB", 0x1b: "SBB", 0x1c: "SBB", 0x1d: "SBB",
+                  0x1f: "POP",
+                  0x20: "AND", 0x21: "AND", 0x23: "AND", 0x24: "AND", 0x25: "AND",
+                  0x28: "SUB", 0x29: "SUB", 0x2b: "SUB", 0x2c: "SUB", 0x2d: "SUB",
+                  0x30: "XOR", 0x31: "XOR", 0x33: "XOR", 0x34: "XOR", 0x35: "XOR",
+                  0x38: "CMP", 0x39: "CMP", 0x3b: "CMP", 0x3c: "CMP", 0x3d: "CMP",
+                  0x40: "INC", 0x41: "INC", 0x42: "INC", 0x43: "INC", 0x44: "INC", 0x45: "INC", 0x46: "INC", 0x47: "INC",
+                  0x48: "DEC", 0x49: "DEC", 0x4a: "DEC", 0x4b: "DEC", 0x4c: "DEC", 0x4d: "DEC", 0x4e: "DEC", 0x4f: "DEC",
+                  0x50: "PUSH", 0x51: "PUSH", 0x52: "PUSH", 0x53: "PUSH", 0x54: "PUSH", 0x55: "PUSH", 0x56: "PUSH", 0x57: "PUSH",
+                  0x58: "POP", 0x59: "POP", 0x5a: "POP", 0x5b: "POP", 0x5c: "POP", 0x5d: "POP", 0x5e: "POP", 0x5f: "POP",
+                  0x60: "PUSHA",
+                  0x68: "PUSH", 0x69: "IMUL", 0x6a: "PUSH", 0x6b: "IMUL",
+                  0x72: "JC", 0x73: "JNC", 0x74: "JZ", 0x75: "JNZ", 0x76: "JBE", 0x77: "JA", 0x78: "JS", 0x79: "JNS",
+                  0x7c: "JL", 0x7d: "JGE", 0x7e: "JLE", 0x7f: "JG",
+                  0x80: [None, None, None, None, None, None, "XOR", "CMP"],
+                  0x81: ["ADD", "OR", "ADC", "SBB", "AND", "SUB", "XOR", "CMP"],
+                  0x83: ["ADD", "OR", "ADC", "SBB", "AND", "SUB", "XOR", "CMP"],
+                  0x84: "TEST", 0x85: "TEST", 0x86: "XCHG", 0x87: "XCHG",
+                  0x88: "MOV", 0x89: "MOV", 0x8a: "MOV", 0x8b: "MOV", 0x8c: "MOV", 0x8d: "LEA",
+                  0x8f: ["POP", None, None, None, None, None, None, None],
+                  0x90: "NOP", 0x91: "XCHG", 0x92: "XCHG", 0x93: "XCHG", 0x94: "XCHG", 0x95: "XCHG", 0x96: "XCHG", 0x97: "XCHG",
+                  0x99: "CDQ",
+                  0xa0: "MOV", 0xa1: "MOV", 0xa3: "MOV",
+                  0xa4: "MOVSB", 0xa5: ("MOVSW", "MOVSD"), 0xa6: "CMPSB", 0xa7: ("CMPSW", "CMPSD"),
+                  0xa9: "TEST", 0xaa: "STOSB", 0xab: ("STOSW", "STOSD"), 0xae: "SCASB", 0xaf: ("SCASW", "SCASD"),
+                  0xb0: "MOV", 0xb1: "MOV", 0xb2: "MOV", 0xb3: "MOV", 0xb4: "MOV", 0xb5: "MOV", 0xb6: "MOV", 0xb7: "MOV",
+                  0xb8: "MOV", 0xb9: "MOV", 0xba: "MOV", 0xbb: "MOV", 0xbc: "MOV", 0xbd: "MOV", 0xbe: "MOV", 0xbf: "MOV",
+                  0xc0: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xc1: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xc2: "RET", 0xc3: "RET",
+                  0xc6: ["MOV", None, None, None, None, None, None, None],
+                  0xc7: ["MOV", None, None, None, None, None, None, None],
+                  0xc9: "LEAVE", 0xca: "RET", 0xcb: "RET", 0xcc: "INT", 0xcd: "INT",
+                  0xd0: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xd1: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xd2: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xd3: ["ROL", "ROR", "RCL", "RCR", "SHL", "SHR", None, "SAR"],
+                  0xe8: "CALL", 0xe9: "JMP", 0xea: "JMP", 0xeb: "JMP",
+                  0xf6: ["TEST", None, "NOT", "NEG", "MUL", "IMUL", "DIV", "IDIV"],
+                  0xf7: ["TEST", None, "NOT", "NEG", "MUL", "IMUL", "DIV", "IDIV"],
+                  0xf8: "CLC", 0xfc: "CLD",
+                  0xfe: ["INC", "DEC", None, None, None, None, None, None],
+                  0xff: ["INC", "DEC", "CALL", "CALL", "JMP", "JMP", "PUSH", None]}
+    
+    # The 0x0f two byte opcode map
+    opcode_map_0f = {0x20: "MOV", 0x21: "MOV", 0x22: "MOV",
+                     0x82: "JC", 0x83: "JNC", 0x84: "JZ", 0x85: "JNZ", 0x86: "JBE", 0x87: "JA", 0x88: "JS", 0x89: "JNS",
+                     0x8c: "JL", 0x8d: "JGE", 0x8e: "JLE", 0x8f: "JG",
+                     0x90: "SETO", 0x92: "SETC", 0x93: "SETNC", 0x94: "SETZ", 0x95: "SETNZ", 0x96: "SETBE", 0x97: "SETA",
+                     0x99: "SETNS", 0x9a: "SETP", 0x9b: "SETNP", 0x9c: "SETL", 0x9d: "SETGE", 0x9e: "SETLE", 0x9f: "SETG",
+                     0xa0: "PUSH", 0xa9: "POP", 0xaf: "IMUL",
+                     0xb6: "MOVZX", 0xb7: "MOVZX", 0xbe: "MOVSX", 0xbf: "MOVSX",
+                     0xc8: "BSWAP", 0xc9: "BSWAP", 0xca: "BSWAP", 0xcb: "BSWAP", 0xcc: "BSWAP", 0xcd: "BSWAP", 0xce: "BSWAP", 0xcf: "BSWAP"}
+    
     def __init__(self, emu):
         # We store the emu object so we can communicate and request info
         self.emu = emu
         
+        # The general purpose register file indexed the same as pydasm
+        self.registers = [0, 0, 0, 0, 0, 0, 0, 0]
+        
         # Initialize all our registers and flags
         self.EAX = 0x00000000
         self.ECX = 0x00000000
@@ -71,6 +197,15 @@ class PyCPU:
         self.CS = 0x0000
         self.SS = 0x0000
         
+        # Lazy flags.  ALU instructions only record what they did and
+        # CF/PF/AF/ZF/SF/OF are worked out when somebody reads them.
+        # flag_values holds the settled values, flags_record the last
+        # operation and flags_defined the flags that operation sets.
+        self.flag_values = {"CF": 0, "PF": 0, "AF": 0, "ZF": 0, "SF": 0, "OF": 0}
+        self.flags_record = None
+        self.flags_defined = frozenset()
+        self.flags_object = None
+        
         self.CF = 0
         self.PF = 0
         self.AF = 0
@@ -89,8 +224,9 @@ class PyCPU:
         self.VIP = 0
         self.ID = 0
         
-        # The function table of all the instructions supported.  I use a
-        # mnemonic table instead of an opcode map to allow mnemonic handlers.
+        # The function table of all the instructions supported by name.  The
+        # opcode tables below are what we dispatch on, this is the fallback
+        # for anything they dont cover.
         self.supported_instructions = { "adc": lambda instruction: self.ADC(instruction),
                                         "add": lambda instruction: self.ADD(instruction),
                                         "and": lambda instruction: self.AND(instruction),
@@ -199,7 +335,109 @@ class PyCPU:
                                         "test": lambda instruction: self.TEST(instruction),
                                         "xchg": lambda instruction: self.XCHG(instruction),
                                         "xor": lambda instruction: self.XOR(instruction)}
+        
+        # Build the 256 entry dispatch tables from the opcode maps binding
+        # the handler methods directly
+        self.opcode_table = self.build_opcode_table(self.opcode_map)
+        self.opcode_table_0f = self.build_opcode_table(self.opcode_map_0f)
+
+        # The decoded instruction cache.  Maps an address to a PyInstruction
+        # that has already been decoded, had its mnemonic normalized and its
+        # handler bound.  code_pages maps a page to the cached addresses on
+        # it so a write to that page can throw away stale decodes.
+        self.decode_cache = {}
+        self.decode_cache_size = 0x10000
+        self.decode_cache_hits = 0
+        self.decode_cache_misses = 0
+        self.code_pages = {}
+        
+        # Pages written since the last emulator snapshot, None when no
+        # snapshot is being tracked
+        self.dirty_pages = None
+        
+        # A one entry TLB each for code and data holding the last page
+        # address we translated and its PyMemoryPage
+        self.code_tlb_page = None
+        self.code_tlb_entry = None
+        self.data_tlb_page = None
+        self.data_tlb_entry = None
+        
+        # Basic block translation.  When block_mode is set the emulator runs
+        # a whole translated block per dispatch.  blocks maps a start
+        # address to its PyBlock and block_pages maps a page to the blocks
+        # decoded from it.
+        self.block_mode = False
+        self.block_limit = 64
+        self.blocks = {}
+        self.block_pages = {}
+        
+        # Blocks run more than jit_threshold times get compiled to python,
+        # zero leaves every block interpreted
+        self.jit = PyJIT(self)
+        self.jit_threshold = 0
+        
+        # Common idioms run as one specialized handler when fusion_mode is
+        # set, turn it off to see every instruction dispatched on its own
+        self.fusion = PyFusion(self)
+        self.fusion_mode = True
+        
+        # A PyCache holding decodes and compiled blocks saved by earlier
+        # runs of the same image, set by the emulator
+        self.code_cache = None
+        
+        # A PyPredecoder holding instructions decoded ahead of time from
+        # the loaded image, set by the emulator
+        self.predecoder = None
 
+    #
+    # build_opcode_table: Turns an opcode map into a 256 entry list of bound
+    #                     handler methods
+    #
+    def build_opcode_table(self, opcode_map):
+        table = [None] * 256
+        
+        for opcode, entry in opcode_map.items():
+            if isinstance(entry, list):
+                table[opcode] = [name and getattr(self, name) for name in entry]
+            elif isinstance(entry, tuple):
+                table[opcode] = tuple([getattr(self, name) for name in entry])
+            else:
+                table[opcode] = getattr(self, entry)
+        
+        return table
+    
+    #
+    # get_handler: Resolves the handler for a decoded instruction using the
+    #              opcode tables.  The raw bytes tell us if this is a two
+    #              byte opcode.
+    #
+    def get_handler(self, instruction, rawinstruction):
+        # Skip any prefixes to see if we have the 0x0f escape
+        index = 0
+        while rawinstruction[index] in self.prefixes:
+            index += 1
+        
+        if rawinstruction[index] == "\x0f":
+            entry = self.opcode_table_0f[instruction.opcode & 0xff]
+        else:
+            entry = self.opcode_table[instruction.opcode & 0xff]
+        
+        # Group opcodes are selected by the ModRM reg field
+        if isinstance(entry, list):
+            entry = entry[(instruction.modrm >> 3) & 0x7]
+        # String instructions are selected by the operand size
+        elif isinstance(entry, tuple):
+            entry = entry[not instruction.operand_so()]
+        
+        if entry:
+            return entry
+        
+        # We dont have it in our tables so try by name
+        if instruction.mnemonic in self.supported_instructions:
+            return self.supported_instructions[instruction.mnemonic]
+        
+        return None
+    
     def get_msb(self, value, size):
         return (value >> ((8 * size) - 1))
     
@@ -207,6 +445,9 @@ class PyCPU:
         return (value & 0x1)
             
     def get_mask(self, size):
+        if size in self.masks:
+            return self.masks[size]
+        
         return (2 ** (8 * size) - 1)
     
     #
@@ -216,305 +457,20 @@ class PyCPU:
     #               exist.
     #
     def get_register(self, register, size):
-        if size == 4:
-            if register == "EAX" or register == 0:
-                register = "EAX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EAX, "read")
-                    
-                return self.EAX
-            elif register == "ECX" or register == 1:
-                register = "ECX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ECX, "read")
-                    
-                return self.ECX
-            elif register == "EDX" or register == 2:
-                register = "EDX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EDX, "read")
-                    
-                return self.EDX
-            elif register == "EBX" or register == 3:
-                register = "EBX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EBX, "read")
-                    
-                return self.EBX
-            elif register == "ESP" or register == 4:
-                register = "ESP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ESP, "read")
-                    
-                return self.ESP
-            elif register == "EBP" or register == 5:
-                register = "EBP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EBP, "read")
-                    
-                return self.EBP
-            elif register == "ESI" or register == 6:
-                register = "ESI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ESI, "read")
-                    
-                return self.ESI
-            elif register == "EDI" or register == 7:
-                register = "EDI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EDI, "read")
-                    
-                return self.EDI
-            elif register == "EIP":
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EIP, "read")
-                    
-                return self.EIP
-        elif size == 2:
-            # Registers
-            if   register == "AX" or register == 0:
-                register = "AX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EAX & 0xFFFF, "read")
-                    
-                return self.EAX & 0xFFFF
-            elif register == "CX" or register == 1:
-                register = "CX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ECX & 0xFFFF, "read")
-                    
-                return self.ECX & 0xFFFF
-            elif register == "DX" or register == 2:
-                register = "DX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EDX & 0xFFFF, "read")
-                    
-                return self.EDX & 0xFFFF
-            elif register == "BX" or register == 3:
-                register = "BX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EBX & 0xFFFF, "read")
-                    
-                return self.EBX & 0xFFFF
-            elif register == "SP" or register == 4:
-                register = "SP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ESP & 0xFFFF, "read")
-                    
-                return self.ESP & 0xFFFF
-            elif register == "BP" or register == 5:
-                register = "BP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EBP & 0xFFFF, "read")
-                    
-                return self.EBP & 0xFFFF
-            elif register == "SI" or register == 6:
-                register = "SI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ESI & 0xFFFF, "read")
-                    
-                return self.ESI & 0xFFFF
-            elif register == "DI" or register == 7:
-                register = "DI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EDI & 0xFFFF, "read")
-                    
-                return self.EDI & 0xFFFF
-                
-            # Segment registers
-            elif register == "CS":
-                register = "CS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.CS & 0xFFFF, "read")
-                    
-                return self.CS & 0xFFFF
-            elif register == "SS":
-                register = "SS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.SS & 0xFFFF, "read")
-                    
-                return self.SS & 0xFFFF
-            elif register == "DS":
-                register = "DS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.DS & 0xFFFF, "read")
-                    
-                return self.DS & 0xFFFF
-            elif register == "ES":
-                register = "ES"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ES & 0xFFFF, "read")
-                    
-                return self.ES & 0xFFFF
-            elif register == "FS":
-                register = "FS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.FS & 0xFFFF, "read")
-                    
-                return self.FS & 0xFFFF
-            elif register == "GS":
-                register = "GS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.GS & 0xFFFF, "read")
-                    
-                return self.GS & 0xFFFF
-        elif size == 1:
-            if   register == "AL" or register == 0:
-                register = "AL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EAX & 0xFF, "read")
-                    
-                return self.EAX & 0xFF
-            elif register == "CL" or register == 1:
-                register = "CL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.ECX & 0xFF, "read")
-                    
-                return self.ECX & 0xFF
-            elif register == "DL" or register == 2:
-                register = "DL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EDX & 0xFF, "read")
-                    
-                return self.EDX & 0xFF
-            elif register == "BL" or register == 3:
-                register = "BL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, self.EBX & 0xFF, "read")
-                    
-                return self.EBX & 0xFF
-            elif register == "AH" or register == 4:
-                register = "AH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, ((self.EAX & 0xFF00) >> 8), "read")
-                    
-                return ((self.EAX & 0xFF00) >> 8)
-            elif register == "CH" or register == 5:
-                register = "CH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, ((self.ECX & 0xFF00) >> 8), "read")
-                    
-                return ((self.ECX & 0xFF00) >> 8)
-            elif register == "DH" or register == 6:
-                register = "DH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, ((self.EDX & 0xFF00) >> 8), "read")
-                    
-                return ((self.EDX & 0xFF00) >> 8)
-            elif register == "BH" or register == 7:
-                register = "BH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, ((self.EBX & 0xFF00) >> 8), "read")
-                    
-                return ((self.EBX & 0xFF00) >> 8)
-            
-            # Flags
-            elif register == "CF":
-                register = "CF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.CF & 0xFF), "read")
-                    
-                return (self.CF & 0xFF)
-            elif register == "PF":
-                register = "PF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.PF & 0xFF), "read")
-                    
-                return (self.PF & 0xFF)
-            elif register == "AF":
-                register = "AF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.AF & 0xFF), "read")
-                    
-                return (self.AF & 0xFF)
-            elif register == "ZF":
-                register = "ZF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.ZF & 0xFF), "read")
-                    
-                return (self.ZF & 0xFF)
-            elif register == "SF":
-                register = "SF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.SF & 0xFF), "read")
-                    
-                return (self.SF & 0xFF)
-            elif register == "TF":
-                register = "TF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.TF & 0xFF), "read")
-                    
-                return (self.TF & 0xFF)
-            elif register == "IF":
-                register = "IF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.IF & 0xFF), "read")
-                    
-                return (self.IF & 0xFF)
-            elif register == "DF":
-                register = "DF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.DF & 0xFF), "read")
-                    
-                return (self.DF & 0xFF)
-            elif register == "OF":
-                register = "OF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.OF & 0xFF), "read")
-                    
-                return (self.OF & 0xFF)
-            elif register == "IOPL":
-                register = "IOPL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.IOPL & 0xFF), "read")
-                    
-                return (self.IOPL & 0xFF)
-            elif register == "NT":
-                register = "NT"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.NT & 0xFF), "read")
-                    
-                return (self.NT & 0xFF)
-            elif register == "RF":
-                register = "RF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.RF & 0xFF), "read")
-                    
-                return (self.RF & 0xFF)
-            elif register == "VM":
-                register = "VM"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.VM & 0xFF), "read")
-                    
-                return (self.VM & 0xFF)
-            elif register == "AC":
-                register = "AC"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.AC & 0xFF), "read")
-                    
-                return (self.AC & 0xFF)
-            elif register == "VIF":
-                register = "VIF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.VIF & 0xFF), "read")
-                    
-                return (self.VIF & 0xFF)
-            elif register == "VIP":
-                register = "VIP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.VIP & 0xFF), "read")
-                    
-                return (self.VIP & 0xFF)
-            elif register == "ID":
-                register = "ID"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, (self.ID & 0xFF), "read")
-                    
-                return (self.ID & 0xFF)
-        else:
+        if size not in self.register_views or register not in self.register_views[size]:
             return False
         
-        return False
+        name, slot, shift, mask, keep = self.register_views[size][register]
+        
+        if slot == None:
+            value = getattr(self, name) & mask
+        else:
+            value = (self.registers[slot] >> shift) & mask
+        
+        if self.emu.register_handlers and name in self.emu.register_handlers:
+            self.emu.register_handlers[name](self.emu, name, value, "read")
+        
+        return value
     
     # Convenience get_register wrapper function
     def get_register32(self, register):
@@ -531,7 +487,11 @@ class PyCPU:
     #             calls any handlers we may have.
     #
     def get_memory(self, address, size):
-        value = self.emu.memory.get_memory(address, size)
+        # Nobody is watching this page so skip the handler chain
+        if not self.watched(address, size):
+            return self.read_memory(address, size)
+        
+        value = self.read_memory(address, size)
 
         # The processor only fetches mem in dword max, this lets us hack
         # around code fetches
@@ -551,6 +511,10 @@ class PyCPU:
                 result = self.emu.memory_handlers[address](self.emu, address, value, size, "read")
             else:
                 result = value
+            
+            # Call any range handlers covering this access
+            for handler in self.get_range_handlers(address, size):
+                result = handler(self.emu, address, value, size, "read")
                     
             # Check if we are touching stack
             if address <= self.emu.stack_base and address >= (self.emu.stack_base - self.emu.stack_size):
@@ -562,7 +526,7 @@ class PyCPU:
                     result = self.emu.stack_read_handler(self.emu, address, value, size)
                 else:
                     result = value
-            elif address <= self.emu.heap_base and address >= (self.emu.heap_base + self.emu.heap_size):
+            elif address >= self.emu.heap_base and address <= (self.emu.heap_base + self.emu.heap_size):
                 if self.emu.heap_access_handler:
                     self.emu.heap_access_handler(self.emu, address, value, size, "read")
                 
@@ -578,6 +542,133 @@ class PyCPU:
                  
         return value
     
+    #
+    # read_memory: Reads a value through the data TLB.  Aligned reads inside
+    #              one page unpack straight from the page data, anything
+    #              else goes to the memory manager.
+    #
+    def read_memory(self, address, size):
+        page = address & 0xfffff000
+        
+        if page != self.data_tlb_page:
+            if page not in self.emu.memory.pages:
+                return self.emu.memory.get_memory(address, size)
+            
+            self.data_tlb_page = page
+            self.data_tlb_entry = self.emu.memory.pages[page]
+        
+        offset = address & 0xfff
+        if size not in self.unpackers or offset + size > 0x1000:
+            return self.emu.memory.get_memory(address, size)
+        
+        return self.unpackers[size].unpack_from(self.data_tlb_entry.data, offset)[0]
+    
+    #
+    # read_code: Reads raw instruction bytes through the code TLB
+    #
+    def read_code(self, address, size):
+        page = address & 0xfffff000
+        
+        if page != self.code_tlb_page:
+            if page not in self.emu.memory.pages:
+                return self.emu.memory.get_memory(address, size)
+            
+            self.code_tlb_page = page
+            self.code_tlb_entry = self.emu.memory.pages[page]
+        
+        offset = address & 0xfff
+        if offset + size > 0x1000:
+            return self.emu.memory.get_memory(address, size)
+        
+        return self.code_tlb_entry.data[offset:offset + size]
+    
+    #
+    # read_code_page: Returns the page holding address and the offset of
+    #                 address in it so the decoder can read in place.  An
+    #                 instruction that could cross into the next page gets
+    #                 a copy of its bytes at offset 0 instead.
+    #
+    def read_code_page(self, address):
+        offset = address & 0xfff
+        if offset > 0x1000 - 15:
+            return (self.read_code(address, 32), 0)
+        
+        page = address & 0xfffff000
+        if page != self.code_tlb_page:
+            if page not in self.emu.memory.pages:
+                return (self.read_code(address, 32), 0)
+            
+            self.code_tlb_page = page
+            self.code_tlb_entry = self.emu.memory.pages[page]
+        
+        return (self.code_tlb_entry.data, offset)
+    
+    #
+    # mark_dirty: Records the pages in a range as written since the last
+    #             snapshot.  Does nothing unless a snapshot is active.
+    #
+    def mark_dirty(self, address, size):
+        if self.dirty_pages == None:
+            return True
+        
+        for page in self.get_pages(address, size):
+            self.dirty_pages.add(page)
+        
+        return True
+    
+    #
+    # get_pages: Returns the pages a range touches.  The range is wrapped
+    #            to 32 bits and stops at the top of the address space so a
+    #            bogus address cant walk billions of pages.
+    #
+    def get_pages(self, address, size):
+        address &= 0xffffffff
+        end = min(address + size, 0x100000000)
+        
+        return xrange(address & 0xfffff000, end, 0x1000)
+    
+    #
+    # get_state: Returns a copy of the register file, the lazy flag state
+    #            and every other CPU attribute a snapshot has to carry
+    #
+    def get_state(self):
+        values = {}
+        for name in self.state_names:
+            values[name] = getattr(self, name)
+        
+        return (list(self.registers), dict(self.flag_values), self.flags_record, self.flags_defined, values)
+    
+    #
+    # set_state: Puts back a state returned by get_state
+    #
+    def set_state(self, state):
+        registers, flag_values, flags_record, flags_defined, values = state
+        
+        # Compiled address functions hold on to this list so copy in place
+        self.registers[:] = registers
+        
+        self.flag_values = dict(flag_values)
+        self.flags_record = flags_record
+        self.flags_defined = flags_defined
+        self.flags_object = None
+        
+        for name, value in values.items():
+            setattr(self, name, value)
+        
+        return True
+    
+    #
+    # flush_tlb: Forgets the cached page translations.  Needed whenever
+    #            page objects are replaced in the memory manager.
+    #
+    def flush_tlb(self):
+        self.code_tlb_page = None
+        self.code_tlb_entry = None
+        self.data_tlb_page = None
+        self.data_tlb_entry = None
+        
+        return True
+    
     # Convenience wrappers for get_memory    
     def get_memory32(self, address):
         value = self.get_memory(address, 4)
@@ -741,528 +832,893 @@ class PyCPU:
     #               handler if present.
     #
     def set_register(self, register, value, size):
-        value &= self.get_mask(size)
-        if size == 4:
-            if   register == "EAX" or register == 0:
-                register = "EAX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EAX = value
-                
-                return True
-            elif register == "ECX" or register == 1:
-                register = "ECX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ECX = value
-                
-                return True
-            elif register == "EDX" or register == 2:
-                register = "EDX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDX = value
-                
-                return True
-            elif register == "EBX" or register == 3:
-                register = "EBX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EBX = value
-                
-                return True
-            elif register == "ESP" or register == 4:
-                register = "ESP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ESP = value
-                
-                return True
-            elif register == "EBP" or register == 5:
-                register = "EBP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EBP = value
-                
-                return True
-            elif register == "ESI" or register == 6:
-                register = "ESI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ESI = value
-                
-                return True
-            elif register == "EDI" or register == 7:
-                register = "EDI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDI = value
-                
-                return True
-            elif register == "EIP":       
-                register = "EIP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EIP = value
-                
-                return True
-        elif size == 2:
-            # Registers
-            if   register == "AX" or register == 0:
-                register = "AX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EAX = (self.EAX & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "CX" or register == 1:
-                register = "CX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ECX = (self.ECX & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "DX" or register == 2:
-                register = "DX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDX = (self.EDX & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "BX" or register == 3:
-                register = "BX"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EBX = (self.EBX & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "SP" or register == 4:
-                register = "SP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ESP = (self.ESP & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "BP" or register == 5:
-                register = "BP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EBP = (self.EBP & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "SI" or register == 6:
-                register = "SI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ESI = (self.ESI & 0xffff0000) | (value & 0xffff)
-                
-                return True
-            elif register == "DI" or register == 7:
-                register = "DI"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDI = (self.EDI & 0xffff0000) | (value & 0xffff)
-                
-                return True
+        if size not in self.register_views or register not in self.register_views[size]:
+            return False
+        
+        name, slot, shift, mask, keep = self.register_views[size][register]
+        
+        value &= mask
+        
+        if self.emu.register_handlers and name in self.emu.register_handlers:
+            self.emu.register_handlers[name](self.emu, name, value, "write")
+        
+        if slot == None:
+            setattr(self, name, value)
+        elif keep:
+            self.registers[slot] = (self.registers[slot] & keep) | (value << shift)
+        else:
+            self.registers[slot] = value
+        
+        return True
+    
+    # Convenience wrappers for set_register
+    def set_register32(self, register, value):
+        return self.set_register(register, value, 4)
+   
+    def set_register16(self, register, value):
+        return self.set_register(register, value, 2)
+    
+    def set_register8(self, register, value):
+        return self.set_register(register, value, 1)
+    
+    #
+    # set_memory: Handles setting of memory from the CPU.  Calls the memory
+    #             manager via the emulator object.  We also call our user
+    #             handlers if they are present.
+    #
+    def set_memory(self, address, value, size):
+        # Nobody is watching this page so skip the handler chain
+        if not self.watched(address, size):
+            # Self modifying code needs to be decoded again
+            if self.code_pages or self.block_pages or self.predecoder:
+                self.invalidate_code(address, size)
             
-            # Segment Registers
-            elif register == "CS":
-                register = "CS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.CS = value & 0xffff
-                
-                return True
-            elif register == "SS":
-                register = "SS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.SS = value & 0xffff
-                
-                return True
-            elif register == "DS":
-                register = "DS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.DS = value & 0xffff
-                
-                return True
-            elif register == "ES":
-                register = "ES"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ES = value & 0xffff
-                
-                return True
-            elif register == "FS":
-                register = "FS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.FS = value & 0xffff
-                
-                return True
-            elif register == "GS":
-                register = "GS"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.GS = value & 0xffff
-                
-                return True
-        elif size == 1:
-            if   register == "AL" or register == 0:
-                register = "AL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EAX = (self.EAX & 0xffffff00) | (value & 0xff)
-                
-                return True
-            elif register == "CL" or register == 1:
-                register = "CL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ECX = (self.ECX & 0xffffff00) | (value & 0xff)
-                
-                return True
-            elif register == "DL" or register == 2:
-                register = "DL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDX = (self.EDX & 0xffffff00) | (value & 0xff)
-                
-                return True
-            elif register == "BL" or register == 3:
-                register = "BL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EBX = (self.EBX & 0xffffff00) | (value & 0xff)
-                
-                return True
-            elif register == "AH" or register == 4:
-                register = "AH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EAX = (self.EAX & 0xffff00ff) | ((value & 0xff) << 8)
-                
-                return True
-            elif register == "CH" or register == 5:
-                register = "CH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.ECX = (self.ECX & 0xffff00ff) | ((value & 0xff) << 8)
-                
-                return True
-            elif register == "DH" or register == 6:
-                register = "DH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                    
-                self.EDX = (self.EDX & 0xffff00ff) | ((value & 0xff) << 8)
-                
-                return True
-            elif register == "BH" or register == 6:
-                register = "BH"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
+            # Remember the pages a snapshot restore has to put back
+            if self.dirty_pages != None:
+                self.dirty_pages.add(address & 0xfffff000)
+                self.dirty_pages.add((address + size - 1) & 0xfffff000)
+            
+            return self.emu.memory.set_memory(address, value, size)
+        
+        # Call our global memory access handler
+        if self.emu.memory_access_handler:
+            self.emu.memory_access_handler(self.emu, address, value, size, "write")
+        
+        # Call our specific memory write handler    
+        if self.emu.memory_write_handler:
+            result = self.emu.memory_write_handler(self.emu, address, value, size)
+        else:
+            result = True
+        
+        # Call our address specific memory handler
+        if address in self.emu.memory_handlers:
+            result = self.emu.memory_handlers[address](self.emu, address, value, size, "write")
+        else:
+            result = True
+        
+        # Call any range handlers covering this access
+        for handler in self.get_range_handlers(address, size):
+            result = handler(self.emu, address, value, size, "write")
                     
-                self.EBX = (self.EBX & 0xffff00ff) | ((value & 0xff) << 8)
-                
-                return True
+        # Check if we are on stack so we can trigger handlers
+        if address <= self.emu.stack_base and address >= (self.emu.stack_base - self.emu.stack_size):
+            if self.emu.stack_access_handler:
+                self.emu.stack_access_handler(self.emu, address, value, size, "write")
             
-            # Flags
-            elif register == "CF":
-                register = "CF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.CF = (value & 0xff)
-                
-                return True
-            elif register == "PF":
-                register = "PF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.PF = (value & 0xff)
-                
-                return True
-            elif register == "AF":
-                register = "AF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.AF = (value & 0xff)
-                
-                return True
-            elif register == "ZF":
-                register = "ZF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.ZF = (value & 0xff)
-                
-                return True
-            elif register == "SF":
-                register = "SF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.SF = (value & 0xff)
-                
-                return True
-            elif register == "TF":
-                register = "TF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.TF = (value & 0xff)
-                
-                return True
-            elif register == "IF":
-                register = "IF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.IF = (value & 0xff)
-                
-                return True
-            elif register == "DF":
-                register = "DF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.DF = (value & 0xff)
-                
-                return True
-            elif register == "OF":
-                register = "OF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.OF = (value & 0xff)
-                
-                return True
-            elif register == "IOPL":
-                register = "IOPL"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.IOPL = (value & 0xff)
-                
-                return True
-            elif register == "NT":
-                register = "NT"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.NT = (value & 0xff)
-                
-                return True
-            elif register == "RF":
-                register = "RF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.RF = (value & 0xff)
-                
-                return True
-            elif register == "VM":
-                register = "VM"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.VM = (value & 0xff)
-                
-                return True
-            elif register == "AC":
-                register = "AC"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.AC = (value & 0xff)
-                
-                return True
-            elif register == "VIF":
-                register = "VIF"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.VIF = (value & 0xff)
-                
-                return True
-            elif register == "VIP":
-                register = "VIP"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.VIP = (value & 0xff)
+            # Call our specific stack write handler    
+            if self.emu.stack_write_handler:
+                result = self.emu.stack_write_handler(self.emu, address, value, size)
+            else:
+                result = True
+        elif address >= self.emu.heap_base and address <= (self.emu.heap_base + self.emu.heap_size):
+            if self.emu.heap_access_handler:
+                self.emu.heap_access_handler(self.emu, address, value, size, "write")
+            
+            # Call our specific heap write handler    
+            if self.emu.heap_write_handler:
+                result = self.emu.heap_write_handler(self.emu, address, value, size)
+            else:
+                result = True
                 
+        # This lets the user bypass memory writes
+        if result:
+            # Self modifying code needs to be decoded again
+            if self.code_pages or self.block_pages or self.predecoder:
+                self.invalidate_code(address, size)
+            
+            # Remember the pages a snapshot restore has to put back
+            if self.dirty_pages != None:
+                self.dirty_pages.add(address & 0xfffff000)
+                self.dirty_pages.add((address + size - 1) & 0xfffff000)
+            
+            return self.emu.memory.set_memory(address, value, size)
+        
+        return False
+    
+    # Convenience wrappers for set_memory            
+    def set_memory32(self, address, value):
+        return self.set_memory(address, value, 4)
+    
+    def set_memory16(self, address, value):
+        return self.set_memory(address, value, 2)
+    
+    def set_memory8(self, address, value):
+        return self.set_memory(address, value, 1)
+    
+    #
+    # watched: Checks the page watch index to see if any memory, stack or
+    #          heap handler could want to see this access
+    #
+    def watched(self, address, size):
+        emu = self.emu
+        
+        if emu.watch_all:
+            return True
+        
+        if not emu.watched_pages:
+            return False
+        
+        return (address & 0xfffff000) in emu.watched_pages or ((address + size - 1) & 0xfffff000) in emu.watched_pages
+    
+    #
+    # watched_range: Checks if a memory, stack or heap handler wants to see
+    #                accesses anywhere in the given range.  The bulk string
+    #                helpers only run when nobody is watching.
+    #
+    def watched_range(self, address, size):
+        emu = self.emu
+        
+        if emu.watch_all:
+            return True
+        
+        for page in self.get_pages(address, size):
+            if page in emu.watched_pages:
                 return True
-            elif register == "ID":
-                register = "ID"
-                if register in self.emu.register_handlers:
-                    self.emu.register_handlers[register](self.emu, register, value, "write")
-                
-                self.ID = (value & 0xff)
-                
-                return True 
+        
+        return False
+    
+    #
+    # get_range_handlers: Returns the range handlers covering an access
+    #
+    def get_range_handlers(self, address, size):
+        pages = self.emu.watched_pages
+        end = address + size
+        
+        ranges = pages.get(address & 0xfffff000, [])
+        if (end - 1) & 0xfffff000 != address & 0xfffff000:
+            ranges = ranges + [r for r in pages.get((end - 1) & 0xfffff000, []) if r not in ranges]
+        
+        return [handler for start, stop, handler in ranges if start < end and address < stop]
+    
+    #
+    # get_memory_block: Reads a run of raw bytes a page at a time without
+    #                   calling any handlers
+    #
+    def get_memory_block(self, address, size):
+        data = []
+        
+        while size > 0:
+            chunk = min(size, 0x1000 - (address & 0xfff))
+            
+            value = self.emu.memory.get_memory(address, chunk)
+            if isinstance(value, bool) or value == None:
+                return False
+            
+            # Small reads come back as integers
+            if not isinstance(value, str):
+                value = struct.pack("<I", value & 0xffffffff)[:chunk]
+            
+            data.append(value)
+            address += chunk
+            size -= chunk
+        
+        return "".join(data)
+    
+    #
+    # set_memory_block: Writes a run of raw bytes a page at a time without
+    #                   calling any handlers
+    #
+    def set_memory_block(self, address, data):
+        start = address
+        offset = 0
+        
+        while offset < len(data):
+            chunk = min(len(data) - offset, 0x1000 - (address & 0xfff))
+            
+            if not self.emu.memory.set_memory(address, data[offset:offset + chunk], chunk):
+                return False
+            
+            address += chunk
+            offset += chunk
+        
+        if self.code_pages or self.block_pages or self.predecoder:
+            self.invalidate_code(start, len(data))
+        
+        self.mark_dirty(start, len(data))
+        
+        return True
+    
+    #
+    # string_range: Returns the lowest address and the length in bytes of
+    #               count elements walked from address in the DF direction
+    #
+    def string_range(self, address, count, size):
+        length = count * size
+        
+        if self.DF:
+            address = address - length + size
+        
+        if address < 0 or address + length > 0x100000000:
+            return (False, length)
+        
+        return (address, length)
+    
+    #
+    # string_advance: Moves a string register over count elements in the
+    #                 DF direction
+    #
+    def string_advance(self, register, count, size):
+        if self.DF:
+            count = -count
+        
+        self.set_register32(register, (self.get_register32(register) + count * size) & 0xffffffff)
+    
+    #
+    # rep_movs: Runs a whole rep movs as one block copy.  Returns False
+    #           when the caller has to step element by element.
+    #
+    def rep_movs(self, size):
+        count = self.ECX
+        if not count:
+            return True
+        
+        source, length = self.string_range(self.ESI, count, size)
+        dest = self.string_range(self.EDI, count, size)[0]
+        if source is False or dest is False:
+            return False
+        
+        # Overlapping copies depend on element order
+        if source < dest + length and dest < source + length:
+            return False
+        
+        if self.watched_range(source, length) or self.watched_range(dest, length):
+            return False
+        
+        data = self.get_memory_block(source, length)
+        if data is False or not self.set_memory_block(dest, data):
+            return False
+        
+        self.string_advance("ESI", count, size)
+        self.string_advance("EDI", count, size)
+        self.set_register32("ECX", 0)
+        
+        return True
+    
+    #
+    # rep_stos: Runs a whole rep stos as one block fill.  Returns False
+    #           when the caller has to step element by element.
+    #
+    def rep_stos(self, size):
+        count = self.ECX
+        if not count:
+            return True
+        
+        dest, length = self.string_range(self.EDI, count, size)
+        if dest is False or self.watched_range(dest, length):
+            return False
+        
+        value = struct.pack("<I", self.get_register(0, size))[:size]
+        if not self.set_memory_block(dest, value * count):
+            return False
+        
+        self.string_advance("EDI", count, size)
+        self.set_register32("ECX", 0)
+        
+        return True
+    
+    #
+    # string_chunk: Returns how many bytes from address we can take on the
+    #               current page walking in the DF direction
+    #
+    def string_chunk(self, address, count):
+        if self.DF:
+            return min(count, (address & 0xfff) + 1)
+        
+        return min(count, 0x1000 - (address & 0xfff))
+    
+    #
+    # string_bytes: Reads chunk bytes walking from address in the DF
+    #               direction, returned in the order they are visited
+    #
+    def string_bytes(self, address, chunk):
+        if self.DF:
+            start = address - chunk + 1
+        else:
+            start = address
+        
+        if self.watched_range(start, chunk):
+            # Let the handlers see this byte
+            value = self.get_memory(address, 1)
+            if isinstance(value, bool):
+                return False
+            
+            data = chr(value & 0xff)
+        else:
+            data = self.get_memory_block(start, chunk)
+            if data is False:
+                return False
+        
+        if self.DF:
+            data = data[::-1]
+        
+        return data
+    
+    #
+    # rep_scasb: Scans for AL a page at a time for repe/repne scasb.
+    #            Returns False when the caller has to step instead.
+    #
+    def rep_scasb(self, instruction):
+        count = self.ECX
+        if not count:
+            return True
+        
+        al = self.get_register8("AL")
+        target = chr(al)
+        repne = instruction.prefix == "repne"
+        
+        address = self.EDI
+        done = 0
+        last = None
+        
+        while done < count:
+            data = self.string_bytes(address, self.string_chunk(address, count - done))
+            if data is False:
+                return False
+            
+            if repne:
+                index = data.find(target)
+            else:
+                index = len(data) - len(data.lstrip(target))
+                if index == len(data):
+                    index = -1
+            
+            if index >= 0:
+                done += index + 1
+                last = ord(data[index])
+                break
+            
+            done += len(data)
+            last = ord(data[-1])
+            if self.DF:
+                address = (address - len(data)) & 0xffffffff
+            else:
+                address = (address + len(data)) & 0xffffffff
+        
+        self.set_flags("CMP", al, last, al - last, 1)
+        
+        self.string_advance("EDI", done, 1)
+        self.set_register32("ECX", count - done)
+        
+        return True
+    
+    #
+    # rep_cmpsb: Compares ESI and EDI a page at a time for repe/repne
+    #            cmpsb.  Returns False when the caller has to step instead.
+    #
+    def rep_cmpsb(self, instruction):
+        count = self.ECX
+        if not count:
+            return True
+        
+        repe = instruction.prefix != "repne"
+        
+        source = self.ESI
+        dest = self.EDI
+        done = 0
+        last = None
+        
+        while done < count:
+            chunk = self.string_chunk(dest, self.string_chunk(source, count - done))
+            
+            data1 = self.string_bytes(source, chunk)
+            data2 = self.string_bytes(dest, chunk)
+            if data1 is False or data2 is False:
+                return False
+            
+            # A watched byte may shorten one side
+            chunk = min(len(data1), len(data2))
+            data1 = data1[:chunk]
+            data2 = data2[:chunk]
+            
+            index = -1
+            if not repe or data1 != data2:
+                for i in xrange(chunk):
+                    if (data1[i] == data2[i]) != repe:
+                        index = i
+                        break
+            
+            if index >= 0:
+                done += index + 1
+                last = (ord(data1[index]), ord(data2[index]))
+                break
+            
+            done += chunk
+            last = (ord(data1[-1]), ord(data2[-1]))
+            if self.DF:
+                source = (source - chunk) & 0xffffffff
+                dest = (dest - chunk) & 0xffffffff
+            else:
+                source = (source + chunk) & 0xffffffff
+                dest = (dest + chunk) & 0xffffffff
+        
+        self.set_flags("CMP", last[0], last[1], last[0] - last[1], 1)
+        
+        self.string_advance("ESI", done, 1)
+        self.string_advance("EDI", done, 1)
+        self.set_register32("ECX", count - done)
+        
+        return True
+    
+    #
+    # set_flags: Records an ALU operation for lazy flag evaluation.  Nothing
+    #            is computed here unless the new operation leaves some flags
+    #            alone, then the previous record has to be settled first.
+    #
+    def set_flags(self, mnemonic, op1, op2, result, size):
+        mask = self.get_mask(size)
+        
+        if mnemonic in defined_flags:
+            defined = defined_flags[mnemonic]
+        else:
+            defined = frozenset()
+        
+        if self.flags_record and not self.flags_defined <= defined:
+            self.materialize_flags()
+        
+        self.flags_record = (mnemonic, op1 & mask, op2 & mask, result & mask, size)
+        self.flags_defined = defined
+        self.flags_object = None
+        
+        return True
+    
+    #
+    # materialize_flags: Works out every flag the pending record defines
+    #                    and stores them
+    #
+    def materialize_flags(self):
+        if not self.flags_record:
+            return True
+        
+        if not self.flags_object:
+            self.flags_object = PyFlags(*self.flags_record)
+        
+        for flag in self.flags_defined:
+            self.flag_values[flag] = self.flags_object.get_flag(flag)
+        
+        self.flags_record = None
+        self.flags_defined = frozenset()
+        self.flags_object = None
+        
+        return True
+    
+    #
+    # read_flag: Returns an arithmetic flag, computing it from the pending
+    #            record if that record defines it
+    #
+    def read_flag(self, flag):
+        if flag in self.flags_defined:
+            if not self.flags_object:
+                self.flags_object = PyFlags(*self.flags_record)
+            
+            return self.flags_object.get_flag(flag)
+        
+        return self.flag_values[flag]
+    
+    #
+    # write_flag: Sets an arithmetic flag directly
+    #
+    def write_flag(self, flag, value):
+        if flag in self.flags_defined:
+            self.materialize_flags()
+        
+        self.flag_values[flag] = value
+    
+    EAX = register_slot(0)
+    ECX = register_slot(1)
+    EDX = register_slot(2)
+    EBX = register_slot(3)
+    ESP = register_slot(4)
+    EBP = register_slot(5)
+    ESI = register_slot(6)
+    EDI = register_slot(7)
+    
+    CF = property(lambda self: self.read_flag("CF"), lambda self, value: self.write_flag("CF", value))
+    PF = property(lambda self: self.read_flag("PF"), lambda self, value: self.write_flag("PF", value))
+    AF = property(lambda self: self.read_flag("AF"), lambda self, value: self.write_flag("AF", value))
+    ZF = property(lambda self: self.read_flag("ZF"), lambda self, value: self.write_flag("ZF", value))
+    SF = property(lambda self: self.read_flag("SF"), lambda self, value: self.write_flag("SF", value))
+    OF = property(lambda self: self.read_flag("OF"), lambda self, value: self.write_flag("OF", value))
+
+    # Sign extends a value
+    def sign_extend(self, number, orig_size, dest_size):
+        orig_max = (2 ** (8 * orig_size) - 1)
+        dest_max = (2 ** (8 * dest_size) - 1)
+        
+        orig_shift = (8 * orig_size)
+        dest_shirt = (8 * dest_size)
+        
+        masknumber = number & orig_max
+        msb = masknumber >> (orig_shift - 1)
+        
+        if msb:
+            signextended = ((dest_max << orig_shift) | masknumber) & dest_max
+        else:
+            signextended = number & dest_max
+        
+        return signextended
+    
+    # Swaps a dword bytes
+    def swap_bytes(self, value):
+        return (((value & 0xff) << 24) | (((value & 0xff00) >> 8) << 16) | (((value & 0xff0000) >> 16) << 8) | ((value & 0xff000000) >> 24))
+    
+    #
+    # decode: Fetches and decodes the instruction at address returning a
+    #         PyInstruction ready for execution.  The mnemonic is normalized
+    #         and the instruction handler is bound to the instruction.
+    #
+    def decode(self, address):
+        # Fetch raw instruction from memory
+        if decode_in_place:
+            rawinstruction, offset = self.read_code_page(address)
         else:
+            rawinstruction, offset = self.read_code(address, 32), 0
+        
+        if not rawinstruction:
+            print "[!] Problem fetching raw bytes from 0x%08x" % (address)
+            
             return False
         
-        return False
-    
-    # Convenience wrappers for set_register
-    def set_register32(self, register, value):
-        return self.set_register(register, value, 4)
-   
-    def set_register16(self, register, value):
-        return self.set_register(register, value, 2)
+        # Decode instruction from raw returning a pydasm.instruction
+        if decode_in_place:
+            instruction = pydasm.get_instruction(rawinstruction, pydasm.MODE_32, offset)
+        else:
+            instruction = pydasm.get_instruction(rawinstruction, pydasm.MODE_32)
+        
+        if not instruction:
+            print "[!] Problem decoding instruction"
+            
+            return False
+        
+        # Create our python class for instruction, we do this in case we ever leave pydasm
+        pyinstruction = PyInstruction(instruction)
+        
+        # An oversight in pydasm mnemonic parsing
+        pyinstruction.split_prefix()
+        
+        # Bind the handler now so execution is a single call
+        pyinstruction.handler = self.get_handler(pyinstruction, rawinstruction[offset:offset + instruction.length])
+        
+        return self.link(address, pyinstruction)
     
-    def set_register8(self, register, value):
-        return self.set_register(register, value, 1)
+    #
+    # link: Readies a decoded instruction with its handler bound for
+    #       execution at address
+    #
+    def link(self, address, pyinstruction):
+        # Compile the effective address of each memory operand once
+        for op in [pyinstruction.op1, pyinstruction.op2, pyinstruction.op3]:
+            if op and op.type == pydasm.OPERAND_TYPE_MEMORY:
+                op.address = self.compile_address(pyinstruction, op)
+        
+        self.bind_hooks(address, pyinstruction)
+        
+        if self.fusion_mode:
+            self.fusion.fuse_instruction(pyinstruction)
+        
+        return pyinstruction
     
     #
-    # set_memory: Handles setting of memory from the CPU.  Calls the memory
-    #             manager via the emulator object.  We also call our user
-    #             handlers if they are present.
+    # fetch: Returns the decoded instruction at address.  We check the
+    #        decode cache first, then anything predecoded and the code
+    #        cache saved by earlier runs and only decode when none has it.
     #
-    def set_memory(self, address, value, size):
-        # Call our global memory access handler
-        if self.emu.memory_access_handler:
-            self.emu.memory_access_handler(self.emu, address, value, size, "write")
+    def fetch(self, address):
+        if address in self.decode_cache:
+            self.decode_cache_hits += 1
+            
+            return self.decode_cache[address]
         
-        # Call our specific memory write handler    
-        if self.emu.memory_write_handler:
-            result = self.emu.memory_write_handler(self.emu, address, value, size)
-        else:
-            result = True
+        self.decode_cache_misses += 1
         
-        # Call our address specific memory handler
-        if address in self.emu.memory_handlers:
-            result = self.emu.memory_handlers[address](self.emu, address, value, size, "write")
-        else:
-            result = True
-                    
-        # Check if we are on stack so we can trigger handlers
-        if address <= self.emu.stack_base and address >= (self.emu.stack_base - self.emu.stack_size):
-            if self.emu.stack_access_handler:
-                self.emu.stack_access_handler(self.emu, address, value, size, "write")
+        # Anything decoded ahead of time is ready to go
+        pyinstruction = None
+        if self.predecoder:
+            pyinstruction = self.predecoder.get_instruction(address)
+        
+        # The code cache relies on code_pages to hear about writes
+        if not pyinstruction and self.code_cache and self.decode_cache_size:
+            pyinstruction = self.code_cache.get_instruction(address)
+        
+        if not pyinstruction:
+            pyinstruction = self.decode(address)
+            if not pyinstruction:
+                return False
             
-            # Call our specific stack write handler    
-            if self.emu.stack_write_handler:
-                result = self.emu.stack_write_handler(self.emu, address, value, size)
-            else:
-                result = True
-        elif address >= self.emu.heap_base and address <= (self.emu.heap_base + self.emu.heap_size):
-            if self.emu.heap_access_handler:
-                self.emu.heap_access_handler(self.emu, address, value, size, "write")
+            if self.code_cache and self.decode_cache_size:
+                self.code_cache.add_instruction(address, pyinstruction)
+        
+        # When we fill up just start over, hot code will come right back
+        if len(self.decode_cache) >= self.decode_cache_size:
+            self.flush_decode_cache()
+        
+        if self.decode_cache_size:
+            self.decode_cache[address] = pyinstruction
             
-            # Call our specific heap write handler    
-            if self.emu.heap_write_handler:
-                result = self.emu.heap_write_handler(self.emu, address, value, size)
-            else:
-                result = True
+            # Remember which pages this instruction lives on
+            for page in set([address & 0xfffff000, (address + pyinstruction.length - 1) & 0xfffff000]):
+                if page not in self.code_pages:
+                    self.code_pages[page] = []
                 
-        # This lets the user bypass memory writes
-        if result:
-            return self.emu.memory.set_memory(address, value, size)
+                self.code_pages[page].append(address)
         
-        return False
+        return pyinstruction
     
-    # Convenience wrappers for set_memory            
-    def set_memory32(self, address, value):
-        return self.set_memory(address, value, 4)
+    #
+    # bind_hooks: Marks whether any user handler wants to see this decoded
+    #             instruction.  Unhooked instructions skip the handler
+    #             lookups entirely.
+    #
+    def bind_hooks(self, address, instruction):
+        handlers = self.emu.opcode_handlers
+        
+        instruction.hooked = (instruction.opcode in handlers or
+                              (0x0f << 7 | instruction.opcode) in handlers or
+                              instruction.mnemonic.upper() in self.emu.mnemonic_handlers)
+        instruction.pc_hooked = address in self.emu.pc_handlers or self.emu.os.get_library(address) is not None
     
-    def set_memory16(self, address, value):
-        return self.set_memory(address, value, 2)
+    #
+    # rebind_hooks: Updates every decoded instruction after the user
+    #               handlers change
+    #
+    def rebind_hooks(self):
+        for address, instruction in self.decode_cache.items():
+            self.bind_hooks(address, instruction)
+        
+        for block in self.blocks.values():
+            for address, instruction in block.instructions:
+                self.bind_hooks(address, instruction)
+        
+        # Compiled blocks have their hooks baked in
+        return self.deoptimize()
     
-    def set_memory8(self, address, value):
-        return self.set_memory(address, value, 1)
+    #
+    # flush_decode_cache: Throws away every decoded instruction
+    #
+    def flush_decode_cache(self):
+        self.decode_cache = {}
+        self.code_pages = {}
+        
+        # Without code_pages we wont hear about writes to checked pages
+        if self.code_cache:
+            self.code_cache.flush()
+        
+        return True
     
-    def set_flags(self, mnemonic, op1, op2, result, size):
-        mask = self.get_mask(size)
+    #
+    # set_decode_cache_size: Sets the maximum number of cached instructions,
+    #                        a size of 0 disables the cache.
+    #
+    def set_decode_cache_size(self, size):
+        self.decode_cache_size = size
+        
+        return self.flush_decode_cache()
+    
+    #
+    # invalidate_code: Called on a memory write.  If the write lands on a
+    #                  page we have decoded from we drop everything cached
+    #                  on that page.
+    #
+    def invalidate_code(self, address, size):
+        for page in self.get_pages(address, size):
+            if self.code_cache:
+                self.code_cache.invalidate(page)
+            
+            if self.predecoder:
+                self.predecoder.invalidate(page)
+            
+            if page in self.code_pages:
+                for cached in self.code_pages[page]:
+                    if cached in self.decode_cache:
+                        del self.decode_cache[cached]
+                
+                del self.code_pages[page]
+            
+            if page in self.block_pages:
+                for block in self.block_pages[page]:
+                    block.valid = False
+                    
+                    if self.blocks.get(block.start) is block:
+                        del self.blocks[block.start]
+                
+                del self.block_pages[page]
+        
+        return True
+    
+    #
+    # translate_block: Discovers the basic block starting at address and
+    #                  builds a callable that executes it.  Blocks end at
+    #                  the first control transfer or before any address a
+    #                  pc handler or library is registered on.
+    #
+    def translate_block(self, address):
+        start = address
+        instructions = []
+        
+        while len(instructions) < self.block_limit:
+            # Handlers and libraries are only checked on block entry
+            if instructions and (address in self.emu.pc_handlers or self.emu.os.get_library(address) is not None):
+                break
+            
+            instruction = self.fetch(address)
+            if not instruction or not instruction.handler:
+                break
+            
+            instructions.append((address, instruction))
+            address += instruction.length
+            
+            if ends_block(instruction.mnemonic):
+                break
+        
+        if not instructions:
+            return False
+        
+        block = PyBlock(start, address, instructions)
         
-        op1 &= mask
-        op2 &= mask
-        result &= mask
+        # Fused pairs replace the handlers of both their instructions
+        if self.fusion_mode:
+            handlers = self.fusion.fuse_block(block, instructions)
+        else:
+            handlers = [i.handler for a, i in instructions]
         
-        flags = PyFlags(mnemonic, op1, op2, result, size)
+        # Everything but the last instruction is straight line code so we
+        # dont need to check if it changed EIP
+        body = [(a, handlers[n], i, a + i.length) for n, (a, i) in enumerate(instructions[:-1])]
+        lastaddress, last = instructions[-1]
+        lasthandler = handlers[-1]
+        lastnext = lastaddress + last.length
         
-        cf = flags.get_CF()
-        if cf != None:
-            self.CF = cf
+        def run():
+            executed = 0
             
-        af = flags.get_AF()
-        if af != None:
-            self.AF = af
+            for address, handler, instruction, nextaddress in body:
+                self.EIP = address
+                if not handler(instruction):
+                    return 0
+                
+                executed += 1
+                
+                # We overwrote ourselves, let the caller translate again
+                if not block.valid:
+                    self.EIP = nextaddress
+                    
+                    return executed
             
-        zf = flags.get_ZF()
-        if zf != None:
-            self.ZF = zf
+            self.EIP = lastaddress
+            if not lasthandler(last):
+                return 0
             
-        sf = flags.get_SF()
-        if sf != None:
-            self.SF = sf
+            if self.EIP == lastaddress:
+                self.EIP = lastnext
             
-        of = flags.get_OF()
-        if of != None:
-            self.OF = of
+            return executed + 1
+        
+        block.run = run
+        block.interpreted = run
+        
+        self.blocks[start] = block
+        for page in xrange(start & 0xfffff000, address, 0x1000):
+            if page not in self.block_pages:
+                self.block_pages[page] = []
             
-        pf = flags.get_PF()
-        if pf != None:
-            self.PF = pf
+            self.block_pages[page].append(block)
+        
+        return block
+    
+    #
+    # flush_blocks: Throws away every translated block
+    #
+    def flush_blocks(self):
+        for block in self.blocks.values():
+            block.valid = False
+        
+        self.blocks = {}
+        self.block_pages = {}
         
         return True
-
-    # Sign extends a value
-    def sign_extend(self, number, orig_size, dest_size):
-        orig_max = (2 ** (8 * orig_size) - 1)
-        dest_max = (2 ** (8 * dest_size) - 1)
+    
+    #
+    # deoptimize: Puts every compiled block back on the interpreter, they
+    #             get compiled again once they are hot
+    #
+    def deoptimize(self):
+        for block in self.blocks.values():
+            if block.compiled:
+                block.run = block.interpreted
+                block.code = None
+                block.hits = 0
+                block.compiled = False
+        
+        # Fused pairs were picked for the hooks we had then
+        if self.fusion_mode:
+            self.flush_blocks()
         
-        orig_shift = (8 * orig_size)
-        dest_shirt = (8 * dest_size)
+        return True
+    
+    #
+    # set_jit_threshold: Sets how many runs make a block hot enough to
+    #                    compile, zero turns compilation off
+    #
+    def set_jit_threshold(self, threshold):
+        self.jit_threshold = threshold
         
-        masknumber = number & orig_max
-        msb = masknumber >> (orig_shift - 1)
+        return self.deoptimize()
+    
+    #
+    # set_fusion_mode: Turns instruction fusion on or off.  Everything
+    #                  decoded or translated so far is thrown away.
+    #
+    def set_fusion_mode(self, mode):
+        self.fusion_mode = bool(mode)
         
-        if msb:
-            signextended = ((dest_max << orig_shift) | masknumber) & dest_max
-        else:
-            signextended = number & dest_max
+        self.flush_blocks()
         
-        return signextended
+        return self.flush_decode_cache()
     
-    # Swaps a dword bytes
-    def swap_bytes(self, value):
-        return (((value & 0xff) << 24) | (((value & 0xff00) >> 8) << 16) | (((value & 0xff0000) >> 16) << 8) | ((value & 0xff000000) >> 24))
+    #
+    # set_block_mode: Turns block translation on or off.  When off we use
+    #                 the single step interpreter.
+    #
+    def set_block_mode(self, mode):
+        self.block_mode = bool(mode)
+        
+        return self.flush_blocks()
+    
+    #
+    # execute_block: Executes the block at EIP returning the number of
+    #                instructions executed or 0 on failure.  We single step
+    #                when a handler needs to see this exact address, when
+    #                the block is larger than limit or when end is inside it.
+    #
+    def execute_block(self, end=0, limit=0):
+        eip = self.EIP
+        
+        # Anything inside the library range takes the slow path which
+        # does the exact lookup
+        pyos = self.emu.os
+        if self.DEBUG > 0 or eip in self.emu.pc_handlers or pyos.library_start <= eip < pyos.library_end:
+            return int(bool(self.execute()))
+        
+        if eip in self.blocks:
+            block = self.blocks[eip]
+        else:
+            block = self.translate_block(eip)
+            if not block:
+                return int(bool(self.execute()))
+        
+        if (limit and block.count > limit) or (end and block.start < end < block.end):
+            return int(bool(self.execute()))
+        
+        if self.jit_threshold and not block.compiled:
+            block.hits += 1
+            
+            # We only try once, blocks with hooks stay interpreted until
+            # the hooks change
+            if block.hits >= self.jit_threshold:
+                self.jit.compile_block(block)
+                
+                block.compiled = True
+        
+        return block.run()
     
     #
     # execute: The method for advancing execution.  EIP will be saved and
@@ -1270,12 +1726,20 @@ class PyCPU:
     #          
     def execute(self):
         
+        # A cached instruction knows if its address is hooked, so the
+        # handler and library lookups only happen on a miss
+        pyinstruction = self.decode_cache.get(self.EIP)
+        if pyinstruction and not pyinstruction.pc_hooked:
+            self.decode_cache_hits += 1
+            
+            return self.execute_instruction(pyinstruction)
+        
         # Check our program counter handlers
         if self.EIP in self.emu.pc_handlers:
             self.emu.pc_handlers[self.EIP](self.emu, self.EIP)
         
-        if self.EIP in self.emu.os.libraries:
-            library = self.emu.os.libraries[self.EIP]
+        library = self.emu.os.get_library(self.EIP)
+        if library:
             #if self.DEBUG > 1:
             print "[*] Calling 0x%08x:%s" % (self.EIP, library['name'])
             
@@ -1290,39 +1754,27 @@ class PyCPU:
                 print "[*] Need a handler"
                 return False
                        
-        oldeip = self.EIP
-        
-        # Fetch raw instruction from memory
-        rawinstruction = self.get_memory(self.EIP, 32)
-        if not rawinstruction:
-            print "[!] Problem fetching raw bytes from 0x%08x" % (self.EIP)
-            
-            return False
-        
-        # Decode instruction from raw returning a pydasm.instruction
-        instruction = pydasm.get_instruction(rawinstruction, pydasm.MODE_32)
-        if not instruction:
-            print "[!] Problem decoding instruction"
-            
+        # Grab the decoded instruction from the cache or decode it
+        pyinstruction = self.fetch(self.EIP)
+        if not pyinstruction:
             return False
         
-        # Create our python class for instruction, we do this in case we ever leave pydasm
-        pyinstruction = PyInstruction(instruction)
+        return self.execute_instruction(pyinstruction)
+    
+    #
+    # execute_instruction: Runs a decoded instruction at EIP and advances
+    #                      EIP past it unless it branched.
+    #
+    def execute_instruction(self, pyinstruction):
+        oldeip = self.EIP
         
         if self.DEBUG > 0:
             print "[*] Executing [0x%x][%x] %s" % (self.EIP, pyinstruction.opcode, pyinstruction.disasm)
         
-        # An oversight in pydasm mnemonic parsing
-        pyinstruction.mnemonic = pyinstruction.mnemonic.split()
-        if pyinstruction.mnemonic[0] in ["rep", "repe", "repne", "lock"]:
-            pyinstruction.mnemonic = pyinstruction.mnemonic[1]
-        else:
-            pyinstruction.mnemonic = pyinstruction.mnemonic[0]
-        
         # Check if we support this instruction
-        if pyinstruction.mnemonic in self.supported_instructions:
+        if pyinstruction.handler:
             # Execute!
-            if not self.supported_instructions[pyinstruction.mnemonic](pyinstruction):
+            if not pyinstruction.handler(pyinstruction):
                 
                 return False
         else:
@@ -1352,418 +1804,71 @@ class PyCPU:
             print "[!] get_memory_address() couldnt understand opnum"
             
             return False
- 
         
-        # Call our convenience functions for mod/rm bytes
-        mod = instruction.get_mod()
-        rm = instruction.get_rm()
-        
-        # Call our convenience function for s/i/b bytes
-        scale = instruction.get_scale()
-        index = instruction.get_index()
-        base = instruction.get_base()
-        
-        if size == 2:
-            # do 16 bit
-            if mod == 0x0:
-                # do register deref
-                if rm == 0x5:
-                    address = op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching displacement memory for %x" % address
-                        
-                    return address
-                elif rm == 0x4:
-                    # do sib
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register16(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 8)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching 32 bit sib %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register16(op.basereg)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching register [%d] %x" % (op.basereg, address)
-                        
-                    return address
-            elif mod == 0x1:
-                # do register deref + displacement8
-                if rm == 0x4:
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement + ebp
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 8)
-                    
-                    address += (op.displacement & 0xff)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + sib + disp8 %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register16(op.basereg) + op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + disp8 %x" % address
-                        
-                    return address
-            elif mod == 0x2:
-                # do register deref + displacement32
-                if rm == 0x4:
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement + ebp
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register16("EBP") + (self.get_register16(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register16(base)
-                            else:
-                                address = self.get_register16(base) + (self.get_register16(index) * 8)
-                        
-                    address += op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + sib + disp32 %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register16(op.basereg) + op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + disp32 %x" % address
-                        
-                    return address
-            elif mod == 0x3:
-                address = self.get_register16(op.basereg)
-                
-                if self.DEBUG > 2:
-                    print "[*] Fetching plain register %x" % op.reg
-                    
-                return address
-            else:
-                print "[!] get_memory_address(): unknown memory"
-                
-                return False
+        if not op.address:
+            if op.type != pydasm.OPERAND_TYPE_MEMORY:
+                # A plain register operand
+                if size == 2:
+                    return self.get_register16(op.basereg)
+                else:
+                    return self.get_register32(op.basereg)
+            
+            op.address = self.compile_address(instruction, op)
+        
+        # Only go through get_register when someone wants to see the reads
+        if self.emu.register_handlers:
+            asize = instruction.address_so() and 2 or 4
+            for register in op.address_registers:
+                self.get_register(register, asize)
+        
+        return op.address()
+    
+    #
+    # compile_address: Builds the effective address function for a memory
+    #                  operand from its base, index, scale and displacement.
+    #                  The result is cached on the operand by decode().
+    #
+    def compile_address(self, instruction, op):
+        if instruction.address_so():
+            mask = self.masks[2]
         else:
-            # do 32 bit
-            # do mod
-            if mod == 0x0:
-                # do register deref
-                if rm == 0x5:
-                    address = op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching displacement memory for %x" % address
-                        
-                    return address
-                elif rm == 0x4:
-                    # do sib
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = op.displacement + (self.get_register32(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 8)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching 32 bit sib %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register32(op.basereg)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching register [%d] %x" % (op.basereg, address)
-                        
-                    return address
-            elif mod == 0x1:
-                # do register deref + displacement8
-                if rm == 0x4:
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement + ebp
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address =  self.get_register32("EBP") + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register32("EBP") + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register32("EBP") + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = (op.displacement & 0xff)
-                            else:
-                                address = self.get_register32("EBP") + (self.get_register32(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 8)
-                    
-                    address += (op.displacement & 0xff)
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + sib + disp8 %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register32(op.basereg) + op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + disp8 %x" % address
-                        
-                    return address
-            elif mod == 0x2:
-                # do register deref + displacement32
-                if rm == 0x4:
-                    if base == 0x5:
-                        # If base reg is 5 we must use displacement + ebp
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address =  self.get_register32("EBP") + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address =  self.get_register32("EBP") + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register32("EBP") + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = op.displacement
-                            else:
-                                address = self.get_register32("EBP") + (self.get_register32(index) * 8)
-                    else:
-                        if scale == 0x0:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index))
-                        elif scale == 0x1:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 2)
-                        elif scale == 0x2:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 4)
-                        elif scale == 0x3:
-                            if index == 0x4:
-                                address = self.get_register32(base)
-                            else:
-                                address = self.get_register32(base) + (self.get_register32(index) * 8)
-                        
-                    address += op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + sib + disp32 %x" % address
-                        
-                    return address
-                else:
-                    address = self.get_register32(op.basereg) + op.displacement
-                    
-                    if self.DEBUG > 2:
-                        print "[*] Fetching reg + disp32 %x" % address
-                        
-                    return address
-            elif mod == 0x3:
-                address = self.get_register32(op.basereg)
-                
-                if self.DEBUG > 2:
-                    print "[*] Fetching plain register %x" % op.reg
-                    
-                return address
-            else:
-                print "[!] get_memory_address(): unknown memory"
-                
-                return False
-                
-        return False
+            mask = self.masks[4]
+        
+        registers = self.registers
+        
+        # pydasm marks unused base and index registers with REGISTER_NOP
+        base = index = None
+        if 0 <= op.basereg < 8:
+            base = op.basereg
+        if 0 <= op.indexreg < 8:
+            index = op.indexreg
+        
+        scale = 1 << (instruction.get_scale() or 0)
+        
+        # Sign extend the displacement from its encoded width
+        displacement = op.displacement
+        if op.dispbytes in self.masks:
+            displacement &= self.masks[op.dispbytes]
+            if displacement & (1 << (op.dispbytes * 8 - 1)):
+                displacement -= 1 << (op.dispbytes * 8)
+        
+        op.address_registers = tuple([r for r in (base, index) if r != None])
+        
+        if base == None and index == None:
+            address = displacement & mask
+            
+            return lambda: address
+        elif index == None:
+            if not displacement:
+                return lambda: registers[base] & mask
+            
+            return lambda: (registers[base] + displacement) & mask
+        elif base == None:
+            return lambda: (registers[index] * scale + displacement) & mask
+        elif scale == 1:
+            return lambda: (registers[base] + registers[index] + displacement) & mask
+        
+        return lambda: (registers[base] + registers[index] * scale + displacement) & mask
         
     #
     # get_disasm: will fetch the current instruction and pretty it up
@@ -1928,7 +2033,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -1974,7 +2079,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2020,7 +2125,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2046,7 +2151,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2076,7 +2181,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2122,7 +2227,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2168,7 +2273,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2179,8 +2284,8 @@ class PyCPU:
         else:
             return False
             
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -2238,7 +2343,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2284,7 +2389,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2330,7 +2435,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2356,7 +2461,7 @@ class PyCPU:
             self.set_register(0, result, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2386,7 +2491,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2433,7 +2538,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2479,7 +2584,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2490,8 +2595,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -2545,7 +2650,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2587,7 +2692,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2628,7 +2733,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2652,7 +2757,7 @@ class PyCPU:
             self.set_register(0, result, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2680,7 +2785,7 @@ class PyCPU:
             self.set_register(0, result, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2722,7 +2827,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2762,7 +2867,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2773,8 +2878,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -2812,7 +2917,7 @@ class PyCPU:
             self.set_register(op1.reg, value, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2822,8 +2927,8 @@ class PyCPU:
         else:
             return False
             
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -2854,7 +2959,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2890,7 +2995,7 @@ class PyCPU:
             self.set_register32("EIP", eip)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2948,7 +3053,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2964,7 +3069,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -2975,8 +3080,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3011,7 +3116,7 @@ class PyCPU:
                 self.set_register32("EDX", 0x0) 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3022,8 +3127,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3053,7 +3158,7 @@ class PyCPU:
             self.CF = 0
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3064,8 +3169,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3095,7 +3200,7 @@ class PyCPU:
             self.DF = 0
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3106,8 +3211,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3156,7 +3261,7 @@ class PyCPU:
                 self.set_flags("CMP", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3194,7 +3299,7 @@ class PyCPU:
                 self.set_flags("CMP", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3233,7 +3338,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3255,7 +3360,7 @@ class PyCPU:
             self.set_flags("CMP", op1value, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3281,7 +3386,7 @@ class PyCPU:
             self.set_flags("CMP", op1value, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3316,7 +3421,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3355,7 +3460,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3393,7 +3498,7 @@ class PyCPU:
                 self.set_flags("CMP", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3404,8 +3509,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3438,7 +3543,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3462,7 +3567,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3473,8 +3578,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3566,7 +3671,10 @@ class PyCPU:
                         self.set_register16("DI", op1value - size)
             
             else:
-                if instruction.repe():
+                if instruction.prefix and self.rep_cmpsb(instruction):
+                    op1value = self.ESI
+                    op2value = self.EDI
+                elif instruction.repe():
                     repcount = self.get_register32("ECX")
                     
                     while repcount and self.ZF:
@@ -3629,7 +3737,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3640,8 +3748,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3797,7 +3905,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3808,8 +3916,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -3965,7 +4073,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -3976,8 +4084,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4023,7 +4131,7 @@ class PyCPU:
             self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4068,7 +4176,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4116,7 +4224,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4127,8 +4235,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4192,7 +4300,7 @@ class PyCPU:
                     self.set_register8("AH", ax % op1valuederef)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4282,7 +4390,7 @@ class PyCPU:
                         self.set_register32("EDX", eaxedx % op1valuederef)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4293,8 +4401,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4359,7 +4467,7 @@ class PyCPU:
                     self.set_register8("AH", ax % op1valuederef)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4449,7 +4557,7 @@ class PyCPU:
                         self.set_register32("EDX", eaxedx % op1valuederef)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4460,8 +4568,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4524,7 +4632,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4579,7 +4687,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4636,7 +4744,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4678,7 +4786,7 @@ class PyCPU:
                 self.set_register16("AX", result)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4780,7 +4888,7 @@ class PyCPU:
                     self.set_register32("EDX", high)
                     self.set_register32("EAX", low)
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4791,8 +4899,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4842,7 +4950,7 @@ class PyCPU:
             self.set_register(op1.reg, result, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4890,7 +4998,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4944,7 +5052,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -4955,8 +5063,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -4988,7 +5096,7 @@ class PyCPU:
             self.dispatch_interrupt(op1value)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5005,7 +5113,7 @@ class PyCPU:
             self.dispatch_interrupt(op1value)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5016,8 +5124,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5059,7 +5167,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5086,7 +5194,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5096,8 +5204,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5139,7 +5247,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5167,7 +5275,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5178,8 +5286,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5220,7 +5328,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5248,7 +5356,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5259,8 +5367,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5301,7 +5409,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5329,7 +5437,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5340,8 +5448,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5382,7 +5490,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5410,7 +5518,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5421,8 +5529,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5463,7 +5571,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5491,7 +5599,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5502,8 +5610,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5543,7 +5651,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5571,7 +5679,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5582,8 +5690,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5624,7 +5732,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5652,7 +5760,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
         
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5663,8 +5771,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5706,7 +5814,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5735,7 +5843,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5746,8 +5854,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5788,7 +5896,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5818,7 +5926,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5829,8 +5937,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -5871,7 +5979,7 @@ class PyCPU:
             self.set_register32("EIP", result)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5887,7 +5995,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5908,7 +6016,7 @@ class PyCPU:
             self.set_register32("EIP", result)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5942,7 +6050,7 @@ class PyCPU:
                 self.set_register32("EIP", result)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5958,7 +6066,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -5969,8 +6077,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6011,7 +6119,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6040,7 +6148,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6051,8 +6159,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6094,7 +6202,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6122,7 +6230,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6133,8 +6241,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6176,7 +6284,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6204,7 +6312,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6215,8 +6323,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6258,7 +6366,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6286,7 +6394,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6297,8 +6405,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6340,7 +6448,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6365,7 +6473,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6376,8 +6484,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6419,7 +6527,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
     
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6447,7 +6555,7 @@ class PyCPU:
                 self.set_register32("EIP", eip)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6458,8 +6566,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6502,7 +6610,7 @@ class PyCPU:
                 self.set_register32("EIP", result)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6524,7 +6632,7 @@ class PyCPU:
                 self.set_register32("EIP", result)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6535,8 +6643,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6576,7 +6684,7 @@ class PyCPU:
             self.set_register(op1.reg, op2value, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6587,8 +6695,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6626,7 +6734,7 @@ class PyCPU:
             self.set_register32("EBP", newebp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6637,8 +6745,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -6684,7 +6792,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6714,7 +6822,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6741,7 +6849,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6769,7 +6877,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6797,7 +6905,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6825,7 +6933,7 @@ class PyCPU:
                 self.set_memory(op1value, op2value, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6870,7 +6978,7 @@ class PyCPU:
                 self.set_memory(op1value, op2value, asize)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6899,7 +7007,7 @@ class PyCPU:
                 self.set_register(op1.reg, op2valuederef, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6946,7 +7054,7 @@ class PyCPU:
                 self.set_register(op1.reg, op2valuederef, osize)
     
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -6980,7 +7088,7 @@ class PyCPU:
                 return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7005,7 +7113,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7038,13 +7146,12 @@ class PyCPU:
                 self.set_register(0, op2value, osize)
             else:
                 op2value = self.get_memory_address(instruction, 2, asize)
-                offset = op2.displacement
-                op2valuederef = self.get_memory(op2value + offset, asize)
+                op2valuederef = self.get_memory(op2value, asize)
                 
                 self.set_register(0, op2valuederef, osize)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7082,7 +7189,7 @@ class PyCPU:
                 return False
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7101,7 +7208,7 @@ class PyCPU:
             self.set_register8(op1.reg, op2value)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7130,7 +7237,7 @@ class PyCPU:
             self.set_register(op1.reg, op2value, osize)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7158,7 +7265,7 @@ class PyCPU:
                 self.set_memory(op1value, op2value, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7195,7 +7302,7 @@ class PyCPU:
                 self.set_memory(op1value, op2value, asize)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7206,8 +7313,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7241,7 +7348,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7265,7 +7372,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7276,8 +7383,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7341,7 +7448,10 @@ class PyCPU:
                         self.set_register16("SI", op2value - size)
             
             else:
-                if instruction.rep():
+                if instruction.rep() and self.rep_movs(size):
+                    op1value = self.EDI
+                    op2value = self.ESI
+                elif instruction.rep():
                     repcount = self.get_register32("ECX")
                     
                     while repcount > 0:
@@ -7377,7 +7487,7 @@ class PyCPU:
                         self.set_register32("ESI", op2value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7388,8 +7498,8 @@ class PyCPU:
         else:
             return False
         
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7452,7 +7562,10 @@ class PyCPU:
                         self.set_register16("SI", op2value - size)
             
             else:
-                if instruction.rep():
+                if instruction.rep() and self.rep_movs(size):
+                    op1value = self.EDI
+                    op2value = self.ESI
+                elif instruction.rep():
                     repcount = self.get_register32("ECX")
                     
                     while repcount > 0:
@@ -7488,7 +7601,7 @@ class PyCPU:
                         self.set_register32("ESI", op2value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7499,8 +7612,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7563,7 +7676,10 @@ class PyCPU:
                         self.set_register16("SI", op2value - size)
             
             else:
-                if instruction.rep():
+                if instruction.rep() and self.rep_movs(size):
+                    op1value = self.EDI
+                    op2value = self.ESI
+                elif instruction.rep():
                     repcount = self.get_register32("ECX")
                     
                     while repcount > 0:
@@ -7598,7 +7714,7 @@ class PyCPU:
                         self.set_register32("ESI", op2value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7609,8 +7725,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7646,7 +7762,7 @@ class PyCPU:
             op1value = self.get_register(op1.reg, size)
 
             if op2.type == pydasm.OPERAND_TYPE_REGISTER:
-                op2value = self.get_register(op2.reg, size)
+                op2value = self.get_register(op2.reg, 1)
                 
                 result = self.sign_extend(op2value, 1, size)
     
@@ -7662,7 +7778,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7681,7 +7797,7 @@ class PyCPU:
             op1value = self.get_register(op1.reg, size)
 
             if op2.type == pydasm.OPERAND_TYPE_REGISTER:
-                op2value = self.get_register(op2.reg, size)
+                op2value = self.get_register(op2.reg, 2)
                 
                 result = self.sign_extend(op2value, 2, size)
     
@@ -7697,7 +7813,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7708,8 +7824,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7745,7 +7861,7 @@ class PyCPU:
             op1value = self.get_register(op1.reg, size)
 
             if op2.type == pydasm.OPERAND_TYPE_REGISTER:
-                op2value = self.get_register(op2.reg, size)
+                op2value = self.get_register(op2.reg, 1)
                 
                 result = op2value
     
@@ -7761,7 +7877,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7780,7 +7896,7 @@ class PyCPU:
             op1value = self.get_register(op1.reg, size)
 
             if op2.type == pydasm.OPERAND_TYPE_REGISTER:
-                op2value = self.get_register(op2.reg, size)
+                op2value = self.get_register(op2.reg, 2)
                 
                 result = op2value
     
@@ -7796,7 +7912,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7807,8 +7923,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -7864,7 +7980,7 @@ class PyCPU:
                 self.set_register16("AX", result)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7967,7 +8083,7 @@ class PyCPU:
                     self.set_register32("EAX", low)
                     
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -7978,8 +8094,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8031,7 +8147,7 @@ class PyCPU:
 
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8071,7 +8187,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8082,8 +8198,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8108,7 +8224,7 @@ class PyCPU:
         op2valuederef = None
 
         opcode = instruction.opcode
-        if opcode in self.emu.opcode_handlers:
+        if instruction.hooked and opcode in self.emu.opcode_handlers:
             if op1valuederef != None and op2valuederef == None:
                 self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8116,8 +8232,8 @@ class PyCPU:
             else:
                 self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1value, op2value, op3value)
                 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8171,7 +8287,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8211,7 +8327,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8222,8 +8338,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8278,7 +8394,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8320,7 +8436,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8362,7 +8478,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8386,7 +8502,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8414,7 +8530,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8455,7 +8571,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8497,7 +8613,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8508,8 +8624,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8541,7 +8657,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8556,7 +8672,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8571,7 +8687,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8598,7 +8714,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8636,7 +8752,7 @@ class PyCPU:
                 self.set_register("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8647,8 +8763,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8680,7 +8796,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8695,7 +8811,7 @@ class PyCPU:
             return False
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8710,7 +8826,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8737,7 +8853,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8764,7 +8880,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8787,7 +8903,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8827,7 +8943,7 @@ class PyCPU:
                 self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8838,8 +8954,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8916,7 +9032,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -8926,8 +9042,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -8995,7 +9111,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9057,7 +9173,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9108,7 +9224,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9170,7 +9286,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9222,7 +9338,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9284,7 +9400,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9295,8 +9411,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -9354,7 +9470,7 @@ class PyCPU:
                 
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
 
@@ -9364,7 +9480,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9416,17 +9532,17 @@ class PyCPU:
     
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
                 
                 if op2value == 1:
-                    self.OF = self.get_msb(op1value, size) ^ self.CF
+                    self.OF = self.get_msb(op1valuederef, size) ^ self.CF
             
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9467,7 +9583,7 @@ class PyCPU:
        
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
                     
@@ -9477,7 +9593,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                          
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9529,7 +9645,7 @@ class PyCPU:
    
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
                     
@@ -9539,7 +9655,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9581,7 +9697,7 @@ class PyCPU:
 
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
                 
@@ -9591,7 +9707,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9643,7 +9759,7 @@ class PyCPU:
 
                 while tempcount:
                     tempcf = self.get_msb(op1valuederef, size)
-                    op1value = (op1value * 2) + self.CF
+                    op1valuederef = ((op1valuederef * 2) + self.CF) & self.get_mask(size)
                     self.CF = tempcf
                     tempcount -= 1
                     
@@ -9653,7 +9769,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9664,8 +9780,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -9696,7 +9812,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9710,7 +9826,7 @@ class PyCPU:
             return False
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9731,7 +9847,7 @@ class PyCPU:
             self.set_register32("ESP", esp)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9745,7 +9861,7 @@ class PyCPU:
             return False
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9756,8 +9872,8 @@ class PyCPU:
         else:
             return False
         
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -9829,7 +9945,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9895,7 +10011,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -9950,7 +10066,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                          
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10016,7 +10132,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10072,7 +10188,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10138,7 +10254,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10149,8 +10265,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -10222,7 +10338,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10288,7 +10404,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10343,7 +10459,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                          
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10409,7 +10525,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10465,7 +10581,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10531,7 +10647,7 @@ class PyCPU:
                 self.set_memory(op1value, op1valuederef, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10542,8 +10658,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -10615,7 +10731,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10675,7 +10791,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10731,7 +10847,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10791,7 +10907,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10847,7 +10963,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10907,7 +11023,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -10918,8 +11034,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -10959,7 +11075,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -10979,7 +11095,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -10987,7 +11103,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11015,7 +11131,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -11035,7 +11151,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -11043,7 +11159,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11067,7 +11183,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -11087,7 +11203,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -11095,7 +11211,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11123,7 +11239,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -11143,7 +11259,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -11151,7 +11267,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11175,7 +11291,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -11195,7 +11311,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -11203,7 +11319,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11231,7 +11347,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1value, op2value, result, size)
@@ -11251,7 +11367,7 @@ class PyCPU:
                 tempcount = op2value & countmask
                 while tempcount:
                     self.CF = self.get_lsb(result)
-                    result = result / 2
+                    result = (result >> 1) | (result & (1 << ((8 * size) - 1)))
                     tempcount -= 1
                 
                 self.set_flags("SAR", op1valuederef, op2value, result, size)
@@ -11259,7 +11375,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11270,8 +11386,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -11333,7 +11449,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11383,7 +11499,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11435,7 +11551,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11463,7 +11579,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11495,7 +11611,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11545,7 +11661,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11595,7 +11711,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11606,8 +11722,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -11643,7 +11759,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11666,7 +11782,7 @@ class PyCPU:
             return False
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11677,8 +11793,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -11767,7 +11883,10 @@ class PyCPU:
                         self.set_register16("DI", op1value - size)
             
             else:
-                if instruction.repe():
+                if instruction.prefix and self.rep_scasb(instruction):
+                    op1value = self.get_register8("AL")
+                    op2value = self.EDI
+                elif instruction.repe():
                     repcount = self.get_register32("ECX")
                     
                     while repcount and self.ZF:
@@ -11827,7 +11946,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11838,8 +11957,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -11988,7 +12107,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -11999,8 +12118,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12149,7 +12268,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
                         
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12160,8 +12279,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12213,7 +12332,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12224,8 +12343,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12277,7 +12396,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12288,8 +12407,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12341,7 +12460,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12352,8 +12471,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12386,7 +12505,7 @@ class PyCPU:
                 op1value = self.get_register(op1.reg, size)
 
                 # Do logic
-                if self.ZF and self.SF == self.OF:
+                if not self.ZF and self.SF == self.OF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -12397,7 +12516,7 @@ class PyCPU:
                 op1value = self.get_memory_address(instruction, 1, size)
 
                 # Do logic
-                if self.ZF and self.SF == self.OF:
+                if not self.ZF and self.SF == self.OF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -12405,7 +12524,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12416,8 +12535,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12471,7 +12590,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12482,8 +12601,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12537,7 +12656,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12548,8 +12667,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12573,7 +12692,7 @@ class PyCPU:
         op1valuederef = None
         op2valuederef = None
 
-        #0F 96 SETBE r/m8 Set byte if above (CF=1 and ZF=1)
+        #0F 96 SETBE r/m8 Set byte if below or equal (CF=1 or ZF=1)
         if instruction.opcode == 0x96:
 
             size = 1
@@ -12582,7 +12701,7 @@ class PyCPU:
                 op1value = self.get_register(op1.reg, size)
 
                 # Do logic
-                if self.CF and self.ZF:
+                if self.CF or self.ZF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -12593,7 +12712,7 @@ class PyCPU:
                 op1value = self.get_memory_address(instruction, 1, size)
 
                 # Do logic
-                if self.CF and self.ZF:
+                if self.CF or self.ZF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -12601,7 +12720,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12612,8 +12731,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12665,7 +12784,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12676,8 +12795,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12729,7 +12848,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12740,8 +12859,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12793,7 +12912,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12804,8 +12923,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12857,7 +12976,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12868,8 +12987,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12921,7 +13040,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12932,8 +13051,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -12985,7 +13104,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -12996,8 +13115,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13049,7 +13168,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13060,8 +13179,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13113,7 +13232,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13124,8 +13243,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13177,7 +13296,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13188,8 +13307,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13241,7 +13360,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13252,8 +13371,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13305,7 +13424,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13316,8 +13435,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13369,7 +13488,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13380,8 +13499,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13433,7 +13552,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13444,8 +13563,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13497,7 +13616,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13508,8 +13627,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13561,7 +13680,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13572,8 +13691,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13625,7 +13744,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13636,8 +13755,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13689,7 +13808,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13700,8 +13819,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13753,7 +13872,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13764,8 +13883,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13817,7 +13936,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13828,8 +13947,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13881,7 +14000,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13892,8 +14011,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -13927,7 +14046,7 @@ class PyCPU:
                 op1value = self.get_register(op1.reg, size)
 
                 # Do logic
-                if self.ZF and self.SF == self.OF:
+                if not self.ZF and self.SF == self.OF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -13938,7 +14057,7 @@ class PyCPU:
                 op1value = self.get_memory_address(instruction, 1, size)
 
                 # Do logic
-                if self.ZF and self.SF == self.OF:
+                if not self.ZF and self.SF == self.OF:
                     result = 0x1
                 else:
                     result = 0x0
@@ -13946,7 +14065,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -13957,8 +14076,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14010,7 +14129,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14021,8 +14140,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14074,7 +14193,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = 0x0f << 7 | instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14085,8 +14204,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14158,7 +14277,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14218,7 +14337,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14274,7 +14393,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14334,7 +14453,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14390,7 +14509,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14450,7 +14569,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14461,8 +14580,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14530,7 +14649,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14586,7 +14705,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14642,7 +14761,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14694,7 +14813,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14750,7 +14869,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14761,8 +14880,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14790,7 +14909,7 @@ class PyCPU:
             return False
                 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14809,7 +14928,7 @@ class PyCPU:
             return False
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14820,8 +14939,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -14879,8 +14998,11 @@ class PyCPU:
                         self.set_register16("DI", op1value - size)
             
             else:
-                if instruction.rep():
-                    repcount = self.get_register16("CX")
+                if instruction.rep() and self.rep_stos(size):
+                    op1value = self.EDI
+                    op2value = self.get_register(0, size)
+                elif instruction.rep():
+                    repcount = self.get_register32("ECX")
                     
                     while repcount > 0:
                         op1value = self.get_register32("EDI")
@@ -14896,7 +15018,7 @@ class PyCPU:
                         
                         repcount -= 1
                         
-                    self.set_register32("CX", repcount)
+                    self.set_register32("ECX", repcount)
                 else:
                     op1value = self.get_register32("EDI")
                     op2value = self.get_register(0, size)
@@ -14909,7 +15031,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -14920,8 +15042,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15009,7 +15131,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15020,8 +15142,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15044,8 +15166,8 @@ class PyCPU:
         op1valuederef = None
         op2valuederef = None
         
-        #AA MOVSB
-        if instruction.opcode == 0xaa:
+        #AB STOSD
+        if instruction.opcode == 0xab:
             size = 4
             
             if ao:
@@ -15078,8 +15200,11 @@ class PyCPU:
                         self.set_register16("DI", op1value - size)
             
             else:
-                if instruction.rep():
-                    repcount = self.get_register16("CX")
+                if instruction.rep() and self.rep_stos(size):
+                    op1value = self.EDI
+                    op2value = self.get_register(0, size)
+                elif instruction.rep():
+                    repcount = self.get_register32("ECX")
                     
                     while repcount > 0:
                         op1value = self.get_register32("EDI")
@@ -15094,7 +15219,7 @@ class PyCPU:
                     
                         repcount -= 1
                         
-                    self.set_register32("CX", repcount)
+                    self.set_register32("ECX", repcount)
                 else:
                     op1value = self.get_register32("EDI")
                     op2value = self.get_register(0, size)
@@ -15107,7 +15232,7 @@ class PyCPU:
                         self.set_register32("EDI", op1value - size)
             
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15118,8 +15243,8 @@ class PyCPU:
         else:
             return False
         
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15176,7 +15301,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15222,7 +15347,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15268,7 +15393,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15294,7 +15419,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15324,7 +15449,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15370,7 +15495,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15416,7 +15541,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15427,8 +15552,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15479,7 +15604,7 @@ class PyCPU:
                 self.set_flags("LOGIC", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15517,7 +15642,7 @@ class PyCPU:
                 self.set_flags("LOGIC", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15543,7 +15668,7 @@ class PyCPU:
             self.set_flags("LOGIC", op1value, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15577,7 +15702,7 @@ class PyCPU:
                 self.set_flags("LOGIC", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15615,7 +15740,7 @@ class PyCPU:
                 self.set_flags("LOGIC", op1valuederef, op2value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15626,8 +15751,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15685,7 +15810,7 @@ class PyCPU:
                 self.set_register(op2.reg, op1valuederef, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15732,7 +15857,7 @@ class PyCPU:
                 self.set_register(op2.reg, op1valuederef, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15760,7 +15885,7 @@ class PyCPU:
             self.set_register(op2.reg, op1value, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15771,8 +15896,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
@@ -15827,7 +15952,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15869,7 +15994,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15911,7 +16036,7 @@ class PyCPU:
                 self.set_register(op1.reg, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15935,7 +16060,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -15963,7 +16088,7 @@ class PyCPU:
             self.set_register(0, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -16001,7 +16126,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -16043,7 +16168,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -16085,7 +16210,7 @@ class PyCPU:
                 self.set_memory(op1value, result, size)
 
             opcode = instruction.opcode
-            if opcode in self.emu.opcode_handlers:
+            if instruction.hooked and opcode in self.emu.opcode_handlers:
                 if op1valuederef != None and op2valuederef == None:
                     self.emu.opcode_handlers[opcode](self.emu, opcode, self.get_register32("EIP"), op1valuederef, op2value, op3value)
                 elif op2valuederef != None and op1valuederef == None:
@@ -16096,8 +16221,8 @@ class PyCPU:
         else:
             return False
 
-        mnemonic = instruction.mnemonic.upper()
-        if mnemonic in self.emu.mnemonic_handlers:
+        if instruction.hooked and instruction.mnemonic.upper() in self.emu.mnemonic_handlers:
+            mnemonic = instruction.mnemonic.upper()
             if op1valuederef != None and op2valuederef == None:
                 self.emu.mnemonic_handlers[mnemonic](self.emu, mnemonic, self.get_register32("EIP"), op1valuederef, op2value, op3value)
             elif op2valuederef != None and op1valuederef == None:
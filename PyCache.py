@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+import os, imp, marshal, hashlib
+
+from PyInstruction import PyInstruction
+
+'''
+PyCache:
+
+    An on disk cache of decoded instructions and compiled blocks for one
+    image, so later runs of the same binary dont have to decode or
+    compile them again.  There is a file per image named by the image
+    hash PyEmu gives us (for PE files the SHA-256 of the headers and file
+    size) and it holds a single marshaled dictionary:
+    
+        page: (digest, {address: (instruction state, handler name)},
+                       {start: (end, count, code object)})
+    
+    where digest is the SHA-256 of the page contents the entries were
+    made from.  The file is read the first time the CPU asks for
+    something and an entry is only used once the page it lives on has
+    been hashed again and matches.  Anything crossing a page boundary is
+    not saved.
+'''
+class PyCache:
+    DEBUG = 0
+    
+    # Bumped whenever the layout of the saved tuples or the code PyJIT
+    # generates changes
+    VERSION = 2
+    
+    def __init__(self, cpu, directory, image):
+        self.cpu = cpu
+        self.directory = directory
+        self.image = image
+        self.filename = os.path.join(directory, "%s.cache" % image)
+        
+        # The saved pages, None until we read the file
+        self.pages = None
+        
+        # Pages we hashed since they were last written mapped to the entry
+        # matching their contents
+        self.checked = {}
+        
+        # Whether we have anything the file doesnt
+        self.modified = False
+        
+        self.hits = 0
+        self.misses = 0
+    
+    #
+    # load: Reads the cache file for our image.  A missing file or one
+    #       written by a different python leaves us empty.
+    #
+    def load(self):
+        self.pages = {}
+        
+        if not os.path.exists(self.filename):
+            return True
+        
+        try:
+            fd = open(self.filename, "rb")
+            try:
+                version, magic, pages = marshal.load(fd)
+            finally:
+                fd.close()
+        except (IOError, EOFError, ValueError, TypeError):
+            print "[!] Couldnt read code cache %s" % self.filename
+            
+            return False
+        
+        # Code objects only load into the python that made them
+        if version != self.VERSION or magic != imp.get_magic():
+            return True
+        
+        self.pages = pages
+        
+        if self.DEBUG > 0:
+            print "[*] Loaded %d cached pages from %s" % (len(pages), self.filename)
+        
+        return True
+    
+    #
+    # save: Writes the cache file if anything was added since it was read
+    #
+    def save(self):
+        if not self.modified:
+            return True
+        
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                print "[!] Couldnt create code cache directory %s" % self.directory
+                
+                return False
+        
+        temporary = self.filename + ".tmp"
+        
+        try:
+            fd = open(temporary, "wb")
+            try:
+                marshal.dump((self.VERSION, imp.get_magic(), self.pages), fd)
+            finally:
+                fd.close()
+            
+            # Windows wont rename over an existing file
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            
+            os.rename(temporary, self.filename)
+        except (IOError, OSError):
+            print "[!] Couldnt write code cache %s" % self.filename
+            
+            return False
+        
+        self.modified = False
+        
+        return True
+    
+    #
+    # check: Returns the entry for a page matching what is in memory now,
+    #        or None if the page isnt mapped yet
+    #
+    def check(self, page):
+        if page in self.checked:
+            return self.checked[page]
+        
+        memory = self.cpu.emu.memory
+        if page not in memory.pages:
+            return None
+        
+        if self.pages is None:
+            self.load()
+        
+        digest = hashlib.sha256(memory.pages[page].data).digest()
+        
+        # A saved entry for other bytes is replaced once we add to it
+        entry = self.pages.get(page)
+        if not entry or entry[0] != digest:
+            entry = (digest, {}, {})
+        
+        self.checked[page] = entry
+        
+        return entry
+    
+    #
+    # invalidate: Forgets the check on a page that is being written
+    #
+    def invalidate(self, page):
+        if page in self.checked:
+            del self.checked[page]
+        
+        return True
+    
+    #
+    # flush: Forgets every check, called when the CPU stops tracking which
+    #        pages hold code
+    #
+    def flush(self):
+        self.checked = {}
+        
+        return True
+    
+    #
+    # get_instruction: Returns a ready to run PyInstruction for address if
+    #                  we have one saved, otherwise None
+    #
+    def get_instruction(self, address):
+        entry = self.check(address & 0xfffff000)
+        if not entry or address not in entry[1]:
+            self.misses += 1
+            
+            return None
+        
+        state, handler = entry[1][address]
+        
+        instruction = PyInstruction(None)
+        instruction.set_state(state)
+        
+        if handler:
+            instruction.handler = getattr(self.cpu, handler)
+        else:
+            instruction.handler = self.cpu.supported_instructions.get(instruction.mnemonic)
+        
+        self.hits += 1
+        
+        return self.cpu.link(address, instruction)
+    
+    #
+    # add_instruction: Saves a freshly decoded instruction
+    #
+    def add_instruction(self, address, instruction):
+        page = address & 0xfffff000
+        if (address + instruction.length - 1) & 0xfffff000 != page:
+            return False
+        
+        entry = self.check(page)
+        if not entry:
+            return False
+        
+        entry[1][address] = (instruction.get_state(), self.get_handler_name(instruction.handler))
+        
+        self.pages[page] = entry
+        self.modified = True
+        
+        return True
+    
+    #
+    # get_code: Returns the saved code object for a block or None
+    #
+    def get_code(self, block):
+        page = block.start & 0xfffff000
+        if (block.end - 1) & 0xfffff000 != page:
+            return None
+        
+        entry = self.check(page)
+        if not entry or block.start not in entry[2]:
+            return None
+        
+        # Hooks added since can end the block somewhere else
+        end, count, code = entry[2][block.start]
+        if end != block.end or count != block.count:
+            return None
+        
+        return code
+    
+    #
+    # add_code: Saves the code object a block was compiled to
+    #
+    def add_code(self, block, code):
+        page = block.start & 0xfffff000
+        if (block.end - 1) & 0xfffff000 != page:
+            return False
+        
+        entry = self.check(page)
+        if not entry:
+            return False
+        
+        entry[2][block.start] = (block.end, block.count, code)
+        
+        self.pages[page] = entry
+        self.modified = True
+        
+        return True
+    
+    #
+    # get_handler_name: Returns the name of a CPU handler method so it can
+    #                   be bound again, or "" to look it up by mnemonic
+    #
+    def get_handler_name(self, handler):
+        name = getattr(handler, "__name__", "")
+        if name and getattr(self.cpu, name, None) == handler:
+            return name
+        
+        return ""
@@ -10,15 +10,23 @@
 #
 ########################################################################
 
-import sys, os, time, struct, re
+import sys, os, time, struct, re, mmap, copy, hashlib
 
 sys.path.append("lib")
 sys.path.append(r'C:\Program Files\IDA\python')
 
-import pydasm
+try:
+    import pydasm
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
+import pefile
 
 from PyCPU import PyCPU
+from PyCache import PyCache
+from PyPredecode import PyPredecoder
 from PyContext import PyContext
+from PySnapshot import PySnapshot
 from PyMemory import *
 from PyOS import *
 
@@ -77,6 +85,21 @@ class PyEmu:
         self.heap_write_handler = None
         self.heap_access_handler = None
         
+        # Handlers watching a range of memory keyed by (address, size)
+        self.memory_range_handlers = {}
+        
+        # Pages with any memory, stack or heap handler watching them mapped
+        # to the range handlers on that page.  Accesses to any other page
+        # skip the handler chain unless a global handler forces watch_all.
+        self.watched_pages = {}
+        self.watch_all = False
+        
+        # The snapshot the CPU is tracking dirty pages against
+        self.last_snapshot = None
+        
+        # SHA-256 of the image headers and size, names its code cache
+        self.image_hash = None
+        
         # Instantiate a CPU for use in the emulator
         self.cpu = PyCPU(self)
         
@@ -136,6 +159,10 @@ class PyEmu:
         if start:
             self.cpu.set_register32("EIP", start)
         
+        # Translated blocks have their own loop
+        if self.cpu.block_mode:
+            return self.execute_blocks(steps, end)
+        
         # Set a stopping point if supplied so we can break
         if end:
             if steps > 1:
@@ -167,6 +194,145 @@ class PyEmu:
 
         return True
     
+    #
+    # execute_blocks: Runs translated blocks with the same steps and end
+    #                 rules as execute.  Steps still count instructions.
+    #
+    def execute_blocks(self, steps, end):
+        # An end address with the default step count runs until end
+        unlimited = end and steps == 1
+        
+        while unlimited or steps > 0:
+            if end and self.cpu.EIP == end:
+                break
+            
+            if not self.emulating: return False
+            
+            if unlimited:
+                executed = self.cpu.execute_block(end)
+            else:
+                executed = self.cpu.execute_block(end, steps)
+            
+            if not executed:
+                print "[!] Problem executing"
+                
+                return False
+            
+            steps -= executed
+        
+        return True
+    
+    #
+    # set_block_mode: A public method for switching between translated
+    #                 basic blocks and the single step interpreter
+    #
+    def set_block_mode(self, mode):
+        return self.cpu.set_block_mode(mode)
+    
+    #
+    # set_fusion_mode: A public method for switching instruction fusion,
+    #                  off runs every instruction through its own handler
+    #
+    def set_fusion_mode(self, mode):
+        return self.cpu.set_fusion_mode(mode)
+    
+    #
+    # set_jit_threshold: A public method for setting how many times a
+    #                    block runs before it is compiled, zero disables
+    #
+    def set_jit_threshold(self, threshold):
+        return self.cpu.set_jit_threshold(threshold)
+    
+    #
+    # set_code_cache: A public method for keeping decoded instructions and
+    #                 compiled blocks in directory between runs.  The cache
+    #                 is named by image, a hash of the loaded file headers
+    #                 unless given.
+    #
+    def set_code_cache(self, directory, image=None):
+        if not image:
+            image = self.image_hash
+        
+        if not image:
+            print "[!] Need an image hash for the code cache"
+            
+            return False
+        
+        self.cpu.code_cache = PyCache(self.cpu, directory, image)
+        
+        return True
+    
+    #
+    # save_code_cache: A public method for writing the code cache to disk
+    #
+    def save_code_cache(self):
+        if not self.cpu.code_cache:
+            print "[!] No code cache set"
+            
+            return False
+        
+        return self.cpu.code_cache.save()
+    
+    #
+    # predecode: A public method for decoding everything reachable from
+    #            the image roots and any addresses given ahead of time.
+    #            With processes the work is done in the background by a
+    #            pool of that many processes.
+    #
+    def predecode(self, addresses=[], processes=0):
+        for address in addresses:
+            if not isinstance(address, int) and not isinstance(address, long):
+                print "[!] Cant understand address of type %s" % type(address)
+                
+                return False
+        
+        regions = self.get_code_regions()
+        if not regions:
+            print "[!] No code to predecode"
+            
+            return False
+        
+        self.cpu.predecoder = PyPredecoder(self.cpu)
+        
+        return self.cpu.predecoder.start(regions, self.get_code_roots() + list(addresses), processes)
+    
+    #
+    # get_predecoded_blocks: A public method returning the basic blocks
+    #                        found by predecode as {start: end}
+    #
+    def get_predecoded_blocks(self):
+        if not self.cpu.predecoder:
+            print "[!] Nothing has been predecoded"
+            
+            return False
+        
+        return self.cpu.predecoder.get_blocks()
+    
+    #
+    # get_code_regions: Returns the (address, data) regions predecode
+    #                   walks, by default every run of mapped pages
+    #
+    def get_code_regions(self):
+        regions = []
+        
+        for page in sorted(self.memory.pages):
+            if regions and regions[-1][0] + len(regions[-1][1]) * 0x1000 == page:
+                regions[-1][1].append(str(self.memory.pages[page].data))
+            else:
+                regions.append((page, [str(self.memory.pages[page].data)]))
+        
+        return [(address, "".join(data)) for address, data in regions]
+    
+    #
+    # get_code_roots: Returns the addresses predecode starts from, by
+    #                 default just EIP
+    #
+    def get_code_roots(self):
+        if self.cpu.EIP:
+            return [self.cpu.EIP]
+        
+        return []
+    
     #
     # get_register: A public method to retrieve a register for the user
     #    
@@ -488,8 +654,192 @@ class PyEmu:
         
         self.memory.fault = True
         
+        # Drop any decoded instructions we just overwrote
+        if self.cpu.code_pages or self.cpu.block_pages or self.cpu.predecoder:
+            self.cpu.invalidate_code(address, size)
+        
+        self.cpu.mark_dirty(address, size)
+        
         return True
 
+    #
+    # load_image: A public method for copying a whole buffer into memory.
+    #             The data is split on page boundaries and written a page
+    #             at a time, so loading a section is one call instead of
+    #             one set_memory per byte.
+    #
+    def load_image(self, address, data, perms="rwx"):
+        if not isinstance(address, int) and not isinstance(address, long):
+            print "[!] Cant understand address of type %s" % type(address)
+            
+            return False
+        
+        # Accept anything that holds raw bytes
+        if not isinstance(data, str):
+            try:
+                data = str(bytearray(data))
+            except TypeError:
+                print "[!] I dont know what this type is"
+                
+                return False
+        
+        if perms not in ["r", "w", "x", "rw", "rx", "rwx"]:
+            print "[!] Cant understand permissions %s" % repr(perms)
+            
+            return False
+        
+        pagesize = PyMemoryPage.PAGESIZE
+        offset = 0
+        
+        # For right now we lower the fault so the user can set arbitraty memory
+        self.memory.fault = False
+        
+        while offset < len(data):
+            page = (address + offset) & ~(pagesize - 1)
+            start = address + offset - page
+            chunk = min(len(data) - offset, pagesize - start)
+            
+            if page not in self.memory.pages:
+                # New pages get built with their data in one go
+                newpage = PyMemoryPage(page)
+                newpage.set_data("\x00" * start + data[offset:offset + chunk] + "\x00" * (pagesize - start - chunk))
+                
+                self.memory.pages[page] = newpage
+            elif not self.memory.set_memory(address + offset, data[offset:offset + chunk], chunk):
+                print "[!] Failed setting memory @ %x" % (address + offset)
+                
+                return False
+            
+            getattr(self.memory.pages[page], "set_" + perms)()
+            
+            offset += chunk
+        
+        self.memory.fault = True
+        
+        # Drop any decoded instructions we just overwrote
+        if self.cpu.code_pages or self.cpu.block_pages or self.cpu.predecoder:
+            self.cpu.invalidate_code(address, len(data))
+        
+        self.cpu.mark_dirty(address, len(data))
+        
+        return True
+    
+    #
+    # map_region: A public method for mapping zeroed memory from address
+    #             through address + size.  Pages that are already mapped
+    #             keep their data but take the new permissions.
+    #
+    def map_region(self, address, size, perms="rwx"):
+        if not isinstance(address, int) and not isinstance(address, long):
+            print "[!] Cant understand address of type %s" % type(address)
+            
+            return False
+        
+        if perms not in ["r", "w", "x", "rw", "rx", "rwx"]:
+            print "[!] Cant understand permissions %s" % repr(perms)
+            
+            return False
+        
+        pagesize = PyMemoryPage.PAGESIZE
+        
+        for page in xrange(address & ~(pagesize - 1), address + size, pagesize):
+            if page not in self.memory.pages:
+                newpage = PyMemoryPage(page)
+                newpage.set_data("\x00" * pagesize)
+                
+                self.memory.pages[page] = newpage
+            
+            getattr(self.memory.pages[page], "set_" + perms)()
+        
+        return True
+    
+    #
+    # snapshot: A public method that saves the CPU, OS and memory state.
+    #           Memory pages are shared with the snapshot rather than
+    #           copied, so this is cheap to call.
+    #
+    def snapshot(self):
+        snap = PySnapshot()
+        
+        snap.cpu = self.cpu.get_state()
+        snap.os = copy.deepcopy(self.os)
+        
+        for page, entry in self.memory.pages.iteritems():
+            snap.pages[page] = (entry, entry.data)
+        
+        # Start tracking writes against this snapshot
+        self.cpu.dirty_pages = set()
+        self.last_snapshot = snap
+        
+        return snap
+    
+    #
+    # restore: A public method that puts the emulator back to a snapshot.
+    #          Restoring the latest snapshot only touches the pages written
+    #          since it was taken.  Older snapshots compare every page.
+    #
+    def restore(self, snap):
+        if not isinstance(snap, PySnapshot):
+            print "[!] Cant restore from type %s" % type(snap)
+            
+            return False
+        
+        pages = self.memory.pages
+        
+        if snap is self.last_snapshot and self.cpu.dirty_pages != None:
+            dirty = set(self.cpu.dirty_pages)
+        else:
+            dirty = set([page for page in pages if page not in snap.pages or pages[page].data is not snap.pages[page][1]])
+        
+        # Pages mapped or dropped since the snapshot
+        if len(pages) != len(snap.pages):
+            dirty |= set(pages) ^ set(snap.pages)
+        
+        for page in dirty:
+            if page in snap.pages:
+                entry, data = snap.pages[page]
+                entry.set_data(data)
+                
+                pages[page] = entry
+            elif page in pages:
+                del pages[page]
+            
+            # Code we decoded from this page may be gone
+            if self.cpu.code_pages or self.cpu.block_pages or self.cpu.predecoder:
+                self.cpu.invalidate_code(page, 0x1000)
+        
+        self.cpu.flush_tlb()
+        self.cpu.set_state(snap.cpu)
+        self.os = copy.deepcopy(snap.os)
+        
+        self.cpu.dirty_pages = set()
+        self.last_snapshot = snap
+        
+        return True
+    
+    #
+    # set_decode_cache_size: A public method for limiting how many decoded
+    #                        instructions the CPU keeps around.  A size of
+    #                        0 turns the decode cache off.
+    #
+    def set_decode_cache_size(self, size):
+        if not isinstance(size, int) and not isinstance(size, long):
+            print "[!] Cant understand size of type %s" % type(size)
+            
+            return False
+        
+        return self.cpu.set_decode_cache_size(size)
+    
+    #
+    # get_decode_cache_stats: A public method returning the decode cache
+    #                         hits, misses and current number of entries
+    #
+    def get_decode_cache_stats(self):
+        return {"hits": self.cpu.decode_cache_hits,
+                "misses": self.cpu.decode_cache_misses,
+                "entries": len(self.cpu.decode_cache),
+                "size": self.cpu.decode_cache_size}
+    
     #
     # get_selector: A public method for fetching a selector from the LDT
     #
@@ -510,6 +860,9 @@ class PyEmu:
         register = register.upper()
         self.register_handlers[register] = handler
         
+        # Compiled blocks dont call register handlers
+        self.cpu.deoptimize()
+        
         return True
         
     #
@@ -528,6 +881,9 @@ class PyEmu:
         mnemonic = mnemonic.upper()
         self.mnemonic_handlers[mnemonic] = handler
         
+        # Let decoded instructions know they are hooked now
+        self.cpu.rebind_hooks()
+        
         return True
     
     #
@@ -545,6 +901,9 @@ class PyEmu:
         # Store the handler
         self.opcode_handlers[opcode] = handler
         
+        # Let decoded instructions know they are hooked now
+        self.cpu.rebind_hooks()
+        
         return True
         
     #
@@ -562,6 +921,12 @@ class PyEmu:
         
         # Store the handler    
         self.pc_handlers[address] = handler
+        
+        # Blocks only check pc handlers on entry so they must be rebuilt
+        self.cpu.flush_blocks()
+        self.cpu.rebind_hooks()
+        
+        return True
     
     #
     # set_exception_handler: A public method for setting a custom
@@ -622,6 +987,71 @@ class PyEmu:
                 
         # Store the handler
         self.memory_handlers[address] = handler
+        
+        # Keep the page watch index current
+        self.update_watches()
+        
+        return True
+    
+    #
+    # set_memory_range_handler: A public method for setting a custom handler
+    #                           on a range of memory.  The handler is called
+    #                           like a memory handler for any access that
+    #                           touches address through address + size.
+    #
+    def set_memory_range_handler(self, address, size, handler):
+        # We only allow integer addresses and sizes
+        if not isinstance(address, int) and not isinstance(address, long):
+            print "[!] Cant understand address of type %s" % type(address)
+            
+            return False
+        
+        if not isinstance(size, int) and not isinstance(size, long) or size <= 0:
+            print "[!] Cant understand size %s" % repr(size)
+            
+            return False
+        
+        # Store the handler
+        self.memory_range_handlers[(address, size)] = handler
+        
+        # Keep the page watch index current
+        self.update_watches()
+        
+        return True
+    
+    #
+    # update_watches: Rebuilds the index of pages that have any memory,
+    #                 stack or heap handler watching them.  Call this after
+    #                 moving the stack or heap while handlers are set.
+    #
+    def update_watches(self):
+        pages = {}
+        
+        for address in self.memory_handlers:
+            pages[address & 0xfffff000] = []
+        
+        if self.stack_access_handler or self.stack_read_handler or self.stack_write_handler:
+            for page in xrange((self.stack_base - self.stack_size) & 0xfffff000, self.stack_base + 1, 0x1000):
+                pages[page] = []
+        
+        if self.heap_access_handler or self.heap_read_handler or self.heap_write_handler:
+            for page in xrange(self.heap_base & 0xfffff000, self.heap_base + self.heap_size + 1, 0x1000):
+                pages[page] = []
+        
+        for (address, size), handler in self.memory_range_handlers.items():
+            for page in xrange(address & 0xfffff000, address + size, 0x1000):
+                if page not in pages:
+                    pages[page] = []
+                
+                pages[page].append((address, address + size, handler))
+        
+        self.watched_pages = pages
+        self.watch_all = bool(self.memory_access_handler or self.memory_read_handler or self.memory_write_handler)
+        
+        # Compiled blocks dont call memory handlers
+        self.cpu.deoptimize()
+        
+        return True
     
     #
     # set_memory_read_handler: A public memory for setting a custom handler
@@ -631,6 +1061,9 @@ class PyEmu:
         # Store the handler
         self.memory_read_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -641,6 +1074,9 @@ class PyEmu:
         # Store the handler
         self.memory_write_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -651,6 +1087,9 @@ class PyEmu:
         # Store the handler
         self.memory_access_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
 
     #
@@ -661,6 +1100,9 @@ class PyEmu:
         # Store the handler
         self.stack_read_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -671,6 +1113,9 @@ class PyEmu:
         # Store the handler
         self.stack_write_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -681,6 +1126,9 @@ class PyEmu:
         # Store the handler
         self.stack_access_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -691,6 +1139,9 @@ class PyEmu:
         # Store the handler
         self.heap_read_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -701,6 +1152,9 @@ class PyEmu:
         # Store the handler
         self.heap_write_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -711,6 +1165,9 @@ class PyEmu:
         # Store the handler
         self.heap_access_handler = handler
         
+        # Keep the page watch index current
+        self.update_watches()
+        
         return True
     
     #
@@ -845,6 +1302,73 @@ class IDAPyEmu(PyEmu):
         
         return True
 
+'''
+PEImageMemory:
+
+    A PEMemory backed by a memory mapped PE file.  Each section is a
+    region of the image and its pages are only built from the mapping
+    the first time the CPU touches them.
+'''
+class PEImageMemory(PEMemory):
+    def __init__(self, emu):
+        PEMemory.__init__(self, emu)
+        
+        # The mapped file and (start, end, offset, size, perms) regions
+        self.mapping = None
+        self.regions = []
+    
+    #
+    # add_region: Maps size bytes of the file at offset to address.  The
+    #             region covers vsize bytes with the rest zero filled.
+    #
+    def add_region(self, address, vsize, offset, size, perms="rwx"):
+        self.regions.append((address, address + max(vsize, size), offset, size, perms))
+        
+        return True
+    
+    #
+    # get_page: Handles unknown memory requests from the base class.  Pages
+    #           inside an image region are built from the file mapping,
+    #           anything else goes to PEMemory.
+    #
+    def get_page(self, page):
+        pagesize = PyMemoryPage.PAGESIZE
+        
+        regions = [r for r in self.regions if r[0] < page + pagesize and page < r[1]]
+        if not regions:
+            return PEMemory.get_page(self, page)
+        
+        newpage = PyMemoryPage(page)
+        
+        start, end, offset, size, perms = regions[0]
+        if len(regions) == 1 and "w" not in perms and start <= page and page + pagesize <= start + size:
+            # Read only pages can point straight into the mapping
+            newpage.set_data(buffer(self.mapping, offset + page - start, pagesize))
+        else:
+            data = bytearray(pagesize)
+            
+            for start, end, offset, size, perms in regions:
+                low = max(start, page)
+                high = min(start + size, page + pagesize)
+                
+                if low < high:
+                    data[low - page:high - page] = self.mapping[offset + low - start:offset + high - start]
+            
+            newpage.set_data(str(data))
+        
+        # A page shared by sections gets the loosest permissions
+        perms = "r"
+        if [r for r in regions if "w" in r[4]]:
+            perms += "w"
+        if [r for r in regions if "x" in r[4]]:
+            perms += "x"
+        
+        getattr(newpage, "set_" + perms)()
+        
+        self.pages[page] = newpage
+        
+        return True
+
 '''
 PEPyEmu:
 
@@ -853,7 +1377,7 @@ PEPyEmu:
     This is what the user will be instantiating.
 ''' 
 class PEPyEmu(PyEmu):
-    def __init__(self, stack_base=0x0095f000, stack_size=0x1000, heap_base=0x000a0000, heap_size=0x2000, frame_pointer=True):
+    def __init__(self, stack_base=0x0095f000, stack_size=0x1000, heap_base=0x000a0000, heap_size=0x2000, frame_pointer=True, filename=None):
      
         PyEmu.__init__(self)
    
@@ -865,12 +1389,172 @@ class PEPyEmu(PyEmu):
         self.frame_pointer = frame_pointer
 
         # Get a memory manager object for the PE file
-        self.memory = PEMemory(self)
+        self.memory = PEImageMemory(self)
+        
+        # The guest is Windows whatever we are running on
+        self.os = PyWindows()
+        
+        # The parsed executable once load_file has been called
+        self.pe = None
 
         # Load initial thread information
         self.setup_os()
         # Set up context information
         self.setup_context()
+        
+        if filename:
+            self.load_file(filename)
+    
+    #
+    # load_file: Maps a PE file and registers its headers and sections as
+    #            image regions.  Nothing is copied until the CPU touches a
+    #            page.  Imports are bound to stubs and EIP is set to the
+    #            entry point.  With predecode the code reachable from the
+    #            entry point and exports is decoded up front.
+    #
+    def load_file(self, filename, predecode=False, processes=0):
+        try:
+            fd = open(filename, "rb")
+            mapping = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            fd.close()
+        except (IOError, OSError, ValueError):
+            print "[!] Couldnt map %s" % filename
+            
+            return False
+        
+        try:
+            pe = pefile.PE(data=mapping, fast_load=True)
+        except pefile.PEFormatError:
+            print "[!] %s is not a PE file" % filename
+            
+            return False
+        
+        imagebase = pe.OPTIONAL_HEADER.ImageBase
+        headers = min(pe.OPTIONAL_HEADER.SizeOfHeaders, len(mapping))
+        
+        # Name the image by its headers and size, hashing all of it would
+        # page in the whole file.  The code cache checks each page it uses.
+        digest = hashlib.sha256(mapping[:headers])
+        digest.update(str(len(mapping)))
+        self.image_hash = digest.hexdigest()
+        
+        self.memory.mapping = mapping
+        self.memory.regions = []
+        self.memory.add_region(imagebase, headers, 0, headers, "r")
+        
+        for section in pe.sections:
+            perms = "r"
+            if section.Characteristics & 0x80000000:
+                perms += "w"
+            if section.Characteristics & 0x20000000:
+                perms += "x"
+            
+            offset = section.PointerToRawData
+            size = max(0, min(section.SizeOfRawData, len(mapping) - offset))
+            
+            self.memory.add_region(imagebase + section.VirtualAddress, section.Misc_VirtualSize, offset, size, perms)
+        
+        self.pe = pe
+        
+        if not self.load_imports():
+            return False
+        
+        self.cpu.set_register32("EIP", imagebase + pe.OPTIONAL_HEADER.AddressOfEntryPoint)
+        
+        if predecode:
+            return self.predecode(processes=processes)
+        
+        return True
+    
+    #
+    # get_code_regions: Returns the executable sections as they are in
+    #                   memory
+    #
+    def get_code_regions(self):
+        if not self.pe:
+            return PyEmu.get_code_regions(self)
+        
+        imagebase = self.pe.OPTIONAL_HEADER.ImageBase
+        
+        regions = []
+        for section in self.pe.sections:
+            if not section.Characteristics & 0x20000000:
+                continue
+            
+            address = imagebase + section.VirtualAddress
+            size = max(section.Misc_VirtualSize, section.SizeOfRawData)
+            
+            # Build any page the CPU hasnt touched yet
+            data = []
+            for page in xrange(address & 0xfffff000, address + size, 0x1000):
+                if page not in self.memory.pages:
+                    self.memory.get_page(page)
+                
+                data.append(str(self.memory.pages[page].data))
+            
+            regions.append((address & 0xfffff000, "".join(data)))
+        
+        return regions
+    
+    #
+    # get_code_roots: Returns the entry point and every export
+    #
+    def get_code_roots(self):
+        if not self.pe:
+            return PyEmu.get_code_roots(self)
+        
+        imagebase = self.pe.OPTIONAL_HEADER.ImageBase
+        roots = [imagebase + self.pe.OPTIONAL_HEADER.AddressOfEntryPoint]
+        
+        index = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_EXPORT"]
+        if len(self.pe.OPTIONAL_HEADER.DATA_DIRECTORY) <= index:
+            return roots
+        
+        directory = self.pe.OPTIONAL_HEADER.DATA_DIRECTORY[index]
+        if not directory.VirtualAddress:
+            return roots
+        
+        exports = self.pe.parse_export_directory(directory.VirtualAddress, directory.Size)
+        if exports:
+            for symbol in exports.symbols:
+                # Forwarded exports point at a name, not code
+                if symbol.address and not symbol.forwarder:
+                    roots.append(imagebase + symbol.address)
+        
+        return roots
+    
+    #
+    # load_imports: Walks the import directory and binds every import to a
+    #               stub address, no host libraries get loaded
+    #
+    def load_imports(self):
+        index = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_IMPORT"]
+        
+        if len(self.pe.OPTIONAL_HEADER.DATA_DIRECTORY) <= index:
+            return True
+        
+        directory = self.pe.OPTIONAL_HEADER.DATA_DIRECTORY[index]
+        if not directory.VirtualAddress:
+            return True
+        
+        self.pe.DIRECTORY_ENTRY_IMPORT = self.pe.parse_import_directory(directory.VirtualAddress, directory.Size)
+        
+        imports = []
+        for entry in self.pe.DIRECTORY_ENTRY_IMPORT:
+            for symbol in entry.imports:
+                if symbol.name:
+                    function = symbol.name
+                else:
+                    function = "ordinal_%d" % symbol.ordinal
+                
+                imports.append((symbol.address, entry.dll, function))
+        
+        if not self.os.bind_imports(self, imports):
+            print "[!] Couldnt bind imports"
+            
+            return False
+        
+        return True
     
     #
     # setup_os: Adds a new thread based on which OS you are using
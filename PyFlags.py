@@ -34,6 +34,9 @@ class PyFlags:
                            0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0, 1, 1, 0,
                            0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0, 1, 1, 0,
                            1, 0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 0, 0, 1]
+    
+    # Masks by operand size so we dont compute powers of two per instruction
+    masks = {1: 0xff, 2: 0xffff, 4: 0xffffffff}
         
     def __init__(self, mnemonic, op1, op2, result, size):
         assert isinstance(mnemonic, str)
@@ -48,7 +51,7 @@ class PyFlags:
         self.result = result
         self.size = size
         self.bit_count = self.size * 8
-        self.mask = (2 ** (self.bit_count) - 1)
+        self.mask = self.masks[self.size]
         self.sign_mask = (self.mask + 1) / 2
         
     def get_CF(self):
@@ -172,5 +175,19 @@ class PyFlags:
         
         return pf
     
+    #
+    # get_flag: Returns the value of flag by name ("CF", "ZF" ...) or None
+    #           if this operation leaves it alone
+    #
+    def get_flag(self, flag):
+        return getattr(self, "get_" + flag)()
+
+# The arithmetic flags PyFlags knows how to compute
+arithmetic_flags = ("CF", "PF", "AF", "ZF", "SF", "OF")
+
+# For every operation the set of flags it defines.  Worked out from the
+# getters above so there is only one place the rules live.
+defined_flags = dict((mnemonic, frozenset(flag for flag in arithmetic_flags if PyFlags(mnemonic, 1, 1, 1, 1).get_flag(flag) != None))
+                     for mnemonic in ["ADD", "ADC", "SUB", "CMP", "SBB", "NEG", "LOGIC", "SAR", "SHR", "SHRD", "SHL", "SAL", "IMUL", "MUL", "INC", "DEC"])
 
 # End PyFlags
\ No newline at end of file
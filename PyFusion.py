@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+import sys
+
+sys.path.append("lib")
+
+try:
+    import pydasm
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
+
+from PyFlags import PyFlags
+
+parity = PyFlags.parity_lookup_table
+
+'''
+PyFusion:
+
+    Replaces common instruction idioms with a single handler that does
+    the same work.  xor reg, reg gets its own handler wherever it is
+    decoded and inside translated blocks these pairs run as one:
+    
+        cmp/test + jcc       the jump is decided from the operands of the
+                             flag record instead of building a PyFlags
+        push reg; mov r, r   the frame setup, no second dispatch
+        mov reg, x; add reg  address arithmetic, the add is done inline
+    
+    The first instruction of a pair still goes through its normal
+    handler so memory, faults and the flag record are exactly what the
+    unfused instructions would leave.  The other slot of a pair gets a
+    handler that does nothing so the block still counts and checks both
+    instructions.  Nothing is fused when user handlers want to see the
+    instructions, the CPU throws the blocks away when they change.
+'''
+class PyFusion:
+    DEBUG = 0
+    
+    # How each jcc condition code (less the negate bit) is decided from a
+    # flag record's operands, result and sign bit
+    conditions = {"CMP": {0x0: lambda a, b, r, sign: (a ^ b) & (a ^ r) & sign,
+                          0x2: lambda a, b, r, sign: a < b,
+                          0x4: lambda a, b, r, sign: a == b,
+                          0x6: lambda a, b, r, sign: a <= b,
+                          0x8: lambda a, b, r, sign: r & sign,
+                          0xa: lambda a, b, r, sign: parity[r & 0xff],
+                          0xc: lambda a, b, r, sign: (a ^ sign) < (b ^ sign),
+                          0xe: lambda a, b, r, sign: (a ^ sign) <= (b ^ sign)},
+                  "LOGIC": {0x0: lambda a, b, r, sign: False,
+                            0x2: lambda a, b, r, sign: False,
+                            0x4: lambda a, b, r, sign: r == 0,
+                            0x6: lambda a, b, r, sign: r == 0,
+                            0x8: lambda a, b, r, sign: r & sign,
+                            0xa: lambda a, b, r, sign: parity[r & 0xff],
+                            0xc: lambda a, b, r, sign: r & sign,
+                            0xe: lambda a, b, r, sign: r == 0 or r & sign}}
+    
+    records = {"cmp": "CMP", "test": "LOGIC"}
+    
+    signs = {1: 0x80, 2: 0x8000, 4: 0x80000000}
+    
+    def __init__(self, cpu):
+        self.cpu = cpu
+        
+        # Number of instructions and pairs we have fused
+        self.fused = 0
+    
+    #
+    # plain: Whether an instruction has no prefixes and 32 bit operands
+    #
+    def plain(self, instruction):
+        return not (instruction.prefix or instruction.operand_so() or instruction.address_so() or instruction.group2())
+    
+    #
+    # fuse_instruction: Gives a freshly decoded instruction a specialized
+    #                   handler if it is an idiom we know
+    #
+    def fuse_instruction(self, instruction):
+        if not instruction.handler:
+            return False
+        
+        if instruction.mnemonic == "xor" and instruction.opcode in (0x31, 0x33) and self.plain(instruction):
+            op1 = instruction.op1
+            op2 = instruction.op2
+            
+            if op1.type == pydasm.OPERAND_TYPE_REGISTER and op2.type == pydasm.OPERAND_TYPE_REGISTER and op1.reg == op2.reg:
+                instruction.handler = self.xor_zero(instruction.handler, op1.reg)
+                
+                self.fused += 1
+        
+        return True
+    
+    #
+    # fuse_block: Returns the handlers to run a translated block with,
+    #             fused pairs take both of their slots
+    #
+    def fuse_block(self, block, instructions):
+        handlers = [instruction.handler for address, instruction in instructions]
+        
+        # Fused handlers dont go through get_register
+        if self.cpu.emu.register_handlers:
+            return handlers
+        
+        index = 0
+        while index < len(instructions) - 1:
+            first = instructions[index]
+            second = instructions[index + 1]
+            
+            fused = None
+            if not first[1].hooked and not second[1].hooked:
+                fused = self.match(block, first, second)
+            
+            if not fused:
+                index += 1
+                
+                continue
+            
+            handler, last = fused
+            if last:
+                handlers[index] = self.skip
+                handlers[index + 1] = handler
+            else:
+                handlers[index] = handler
+                handlers[index + 1] = self.skip
+            
+            self.fused += 1
+            
+            index += 2
+        
+        return handlers
+    
+    #
+    # match: Returns (handler, last) for a pair we can fuse, last saying
+    #        the handler goes in the second slot, or None
+    #
+    def match(self, block, first, second):
+        firstaddress, firstinstruction = first
+        secondaddress, secondinstruction = second
+        
+        if not self.plain(firstinstruction) or not self.plain(secondinstruction):
+            return None
+        
+        mnemonic = firstinstruction.mnemonic
+        
+        if mnemonic in self.records and self.is_jcc(secondinstruction):
+            return (self.compare_branch(first, second), True)
+        
+        if mnemonic == "push" and 0x50 <= firstinstruction.opcode <= 0x57 and self.is_mov_register(secondinstruction):
+            return (self.push_mov(block, first, second), False)
+        
+        if mnemonic == "mov" and firstinstruction.op1.type == pydasm.OPERAND_TYPE_REGISTER and firstinstruction.opcode in (0x89, 0x8b, 0xc7) + tuple(range(0xb8, 0xc0)):
+            source = self.get_add_source(secondinstruction, firstinstruction.op1.reg)
+            if source:
+                return (self.mov_add(first, source), False)
+        
+        return None
+    
+    #
+    # is_jcc: Whether an instruction is a relative conditional jump
+    #
+    def is_jcc(self, instruction):
+        if instruction.mnemonic[0] != "j" or instruction.mnemonic == "jmp":
+            return False
+        
+        return instruction.opcode & 0xf0 in (0x70, 0x80) and instruction.op1.type == pydasm.OPERAND_TYPE_IMMEDIATE
+    
+    #
+    # is_mov_register: Whether an instruction is a 32 bit mov between two
+    #                  registers
+    #
+    def is_mov_register(self, instruction):
+        return (instruction.mnemonic == "mov" and instruction.opcode in (0x89, 0x8b) and
+                instruction.op1.type == pydasm.OPERAND_TYPE_REGISTER and
+                instruction.op2.type == pydasm.OPERAND_TYPE_REGISTER)
+    
+    #
+    # get_add_source: For an add to register returns ("register", reg) or
+    #                 ("immediate", value) for what is added, else None
+    #
+    def get_add_source(self, instruction, register):
+        if instruction.mnemonic != "add" or not self.plain(instruction):
+            return None
+        
+        op1 = instruction.op1
+        op2 = instruction.op2
+        
+        if op1.type != pydasm.OPERAND_TYPE_REGISTER or op1.reg != register:
+            return None
+        
+        if instruction.opcode in (0x01, 0x03) and op2.type == pydasm.OPERAND_TYPE_REGISTER:
+            return ("register", op2.reg)
+        
+        if instruction.opcode == 0x05 or (instruction.opcode in (0x81, 0x83) and instruction.extindex == 0):
+            return ("immediate", op2.immediate & 0xffffffff)
+        
+        return None
+    
+    #
+    # skip: The handler for the slot a fused pair doesnt run in
+    #
+    def skip(self, instruction):
+        return True
+    
+    #
+    # xor_zero: Clears a register the way xor reg, reg does
+    #
+    def xor_zero(self, handler, register):
+        cpu = self.cpu
+        registers = cpu.registers
+        set_flags = cpu.set_flags
+        
+        def xor_zero(instruction):
+            if instruction.hooked or cpu.emu.register_handlers:
+                return handler(instruction)
+            
+            value = registers[register]
+            
+            set_flags("LOGIC", value, value, 0, 4)
+            
+            registers[register] = 0
+            
+            return True
+        
+        return xor_zero
+    
+    #
+    # compare_branch: Runs a cmp or test and decides the jcc after it from
+    #                 the flag record
+    #
+    def compare_branch(self, first, second):
+        cpu = self.cpu
+        signs = self.signs
+        
+        firstaddress, firstinstruction = first
+        secondaddress, secondinstruction = second
+        
+        firsthandler = firstinstruction.handler
+        secondhandler = secondinstruction.handler
+        
+        record = self.records[firstinstruction.mnemonic]
+        code = secondinstruction.opcode & 0xf
+        condition = self.conditions[record][code & 0xe]
+        negate = bool(code & 1)
+        
+        target = (secondaddress + secondinstruction.length + secondinstruction.op1.immediate) & 0xffffffff
+        
+        def compare_branch(instruction):
+            cpu.EIP = firstaddress
+            if not firsthandler(firstinstruction):
+                return False
+            
+            cpu.EIP = secondaddress
+            
+            # Anything but the record we expect goes the long way
+            flags = cpu.flags_record
+            if not flags or flags[0] != record:
+                return secondhandler(secondinstruction)
+            
+            if bool(condition(flags[1], flags[2], flags[3], signs[flags[4]])) != negate:
+                cpu.EIP = target
+            
+            return True
+        
+        return compare_branch
+    
+    #
+    # push_mov: Runs a push and then a mov between registers
+    #
+    def push_mov(self, block, first, second):
+        registers = self.cpu.registers
+        
+        firstaddress, firstinstruction = first
+        secondaddress, secondinstruction = second
+        
+        firsthandler = firstinstruction.handler
+        destination = secondinstruction.op1.reg
+        source = secondinstruction.op2.reg
+        
+        def push_mov(instruction):
+            if not firsthandler(firstinstruction):
+                return False
+            
+            # The push wrote over our code, the block stops before the mov
+            if not block.valid:
+                return True
+            
+            registers[destination] = registers[source]
+            
+            return True
+        
+        return push_mov
+    
+    #
+    # mov_add: Runs a mov to a register and then adds to it
+    #
+    def mov_add(self, first, source):
+        registers = self.cpu.registers
+        set_flags = self.cpu.set_flags
+        
+        firstaddress, firstinstruction = first
+        
+        firsthandler = firstinstruction.handler
+        register = firstinstruction.op1.reg
+        kind, value = source
+        
+        def mov_add(instruction):
+            if not firsthandler(firstinstruction):
+                return False
+            
+            a = registers[register]
+            if kind == "register":
+                b = registers[value]
+            else:
+                b = value
+            
+            result = a + b
+            
+            set_flags("ADD", a, b, result, 4)
+            
+            registers[register] = result & 0xffffffff
+            
+            return True
+        
+        return mov_add
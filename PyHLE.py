@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+from PyMemory import *
+
+'''
+PyHLE:
+
+    High level emulation of the common C runtime memory and string
+    routines.  Instead of stepping through the byte at a time loops in
+    memcpy or strlen we read and write the buffers a page at a time from
+    python, set EAX and return to the caller.
+    
+    The routines are hooked through the normal library mechanism.  Calling
+    install() hands every matching entry already in emu.os.libraries (the
+    imports of a loaded PE) to us, and add_function() lets the user declare
+    the address of a statically linked copy.
+'''
+class PyHLE:
+    DEBUG = 0
+    
+    # name: (method, argument count, stdcall)
+    routines = {"memcpy":         ("memcpy", 3, False),
+                "memmove":        ("memcpy", 3, False),
+                "memset":         ("memset", 3, False),
+                "memcmp":         ("memcmp", 3, False),
+                "memchr":         ("memchr", 3, False),
+                "strlen":         ("strlen", 1, False),
+                "strcmp":         ("strcmp", 2, False),
+                "strncmp":        ("strncmp", 3, False),
+                "strcpy":         ("strcpy", 2, False),
+                "strncpy":        ("strncpy", 3, False),
+                "strcat":         ("strcat", 2, False),
+                "strchr":         ("strchr", 2, False),
+                "strrchr":        ("strrchr", 2, False),
+                "lstrlenA":       ("strlen", 1, True),
+                "lstrcmpA":       ("strcmp", 2, True),
+                "lstrcpyA":       ("strcpy", 2, True),
+                "lstrcatA":       ("strcat", 2, True),
+                "RtlMoveMemory":  ("memcpy", 3, True),
+                "RtlCopyMemory":  ("memcpy", 3, True),
+                "RtlZeroMemory":  ("zeromemory", 2, True),
+                "RtlFillMemory":  ("fillmemory", 3, True)}
+    
+    def __init__(self, emu):
+        self.emu = emu
+        
+        # Number of routines we have stood in for
+        self.calls = 0
+    
+    #
+    # install: Takes over every library the os knows about that we have a
+    #          routine for.  Returns the number of libraries hooked.
+    #
+    def install(self):
+        count = 0
+        
+        for library in self.emu.os.libraries.values():
+            if library['name'] in self.routines:
+                self.emu.set_library_handler(library['name'], self.handler)
+                
+                count += 1
+        
+        return count
+    
+    #
+    # add_function: Declares a routine at a known address, for copies
+    #               linked into the binary instead of imported
+    #
+    def add_function(self, address, name, dll="msvcrt"):
+        if name not in self.routines:
+            print "[!] No high level routine for %s" % name
+            
+            return False
+        
+        # Only the windows os keeps a library table, anywhere else we hook
+        # the address directly
+        if not hasattr(self.emu.os, "set_library"):
+            return self.emu.set_pc_handler(address, lambda emu, address: self.handler(name, address, dll))
+        
+        self.emu.os.set_library(address, dll, name)
+        self.emu.set_library_handler(name, self.handler)
+        
+        # Cached instructions need to know this address is hooked now
+        self.emu.cpu.rebind_hooks()
+        
+        return True
+    
+    #
+    # handler: The library handler, pulls the arguments off the stack,
+    #          runs the routine and returns to the caller
+    #
+    def handler(self, name, address, dll):
+        emu = self.emu
+        
+        method, count, stdcall = self.routines[name]
+        
+        stack = emu.get_register("ESP")
+        
+        returnaddress = emu.get_memory(stack, 4)
+        
+        arguments = []
+        for x in range(count):
+            arguments.append(emu.get_memory(stack + 4 + (x * 4), 4))
+        
+        if self.DEBUG > 0:
+            print "[*] HLE %s(%s)" % (name, ", ".join(["0x%08x" % argument for argument in arguments]))
+        
+        result = getattr(self, method)(*arguments)
+        if result is False:
+            print "[!] HLE %s failed" % name
+            
+            return False
+        
+        emu.set_register("EAX", result & 0xffffffff)
+        
+        # The caller cleans up cdecl arguments
+        stack += 4
+        if stdcall:
+            stack += count * 4
+        
+        emu.set_register("ESP", stack)
+        emu.set_register("EIP", returnaddress)
+        
+        self.calls += 1
+        
+        return True
+    
+    #
+    # get_bytes: Reads a buffer as a string in one call
+    #
+    def get_bytes(self, address, size):
+        if size <= 0:
+            return ""
+        
+        # The memory manager hands back ints for the small sizes
+        if size <= 4:
+            data = ""
+            for x in range(size):
+                byte = self.emu.get_memory(address + x, 1)
+                if byte is False:
+                    return False
+                
+                data += chr(byte)
+            
+            return data
+        
+        return self.emu.get_memory(address, size)
+    
+    #
+    # set_bytes: Writes a string buffer in one call
+    #
+    def set_bytes(self, address, data):
+        if not data:
+            return True
+        
+        return self.emu.set_memory(address, data)
+    
+    #
+    # get_string: Reads a NULL terminated string a page at a time, stopping
+    #             after limit bytes if given
+    #
+    def get_string(self, address, limit=None):
+        data = ""
+        
+        while limit is None or len(data) < limit:
+            size = PyMemoryPage.PAGESIZE - (address & (PyMemoryPage.PAGESIZE - 1))
+            if limit is not None:
+                size = min(size, limit - len(data))
+            
+            chunk = self.get_bytes(address, size)
+            if chunk is False:
+                return False
+            
+            index = chunk.find("\x00")
+            if index != -1:
+                return data + chunk[:index]
+            
+            data += chunk
+            address += size
+        
+        return data
+    
+    #
+    # compare: Returns the C style result of comparing two strings
+    #
+    def compare(self, first, second):
+        if first is False or second is False:
+            return False
+        
+        return cmp(first, second)
+    
+    def memcpy(self, destination, source, size):
+        data = self.get_bytes(source, size)
+        if data is False or not self.set_bytes(destination, data):
+            return False
+        
+        return destination
+    
+    def memset(self, destination, value, size):
+        if not self.set_bytes(destination, chr(value & 0xff) * size):
+            return False
+        
+        return destination
+    
+    def memcmp(self, first, second, size):
+        return self.compare(self.get_bytes(first, size), self.get_bytes(second, size))
+    
+    def memchr(self, address, value, size):
+        data = self.get_bytes(address, size)
+        if data is False:
+            return False
+        
+        index = data.find(chr(value & 0xff))
+        if index == -1:
+            return 0
+        
+        return address + index
+    
+    def strlen(self, address):
+        # lstrlenA treats NULL as an empty string
+        if not address:
+            return 0
+        
+        data = self.get_string(address)
+        if data is False:
+            return False
+        
+        return len(data)
+    
+    def strcmp(self, first, second):
+        return self.compare(self.get_string(first), self.get_string(second))
+    
+    def strncmp(self, first, second, size):
+        return self.compare(self.get_string(first, size), self.get_string(second, size))
+    
+    def strcpy(self, destination, source):
+        data = self.get_string(source)
+        if data is False or not self.set_bytes(destination, data + "\x00"):
+            return False
+        
+        return destination
+    
+    def strncpy(self, destination, source, size):
+        data = self.get_string(source, size)
+        if data is False or not self.set_bytes(destination, data + "\x00" * (size - len(data))):
+            return False
+        
+        return destination
+    
+    def strcat(self, destination, source):
+        length = self.strlen(destination)
+        if length is False or self.strcpy(destination + length, source) is False:
+            return False
+        
+        return destination
+    
+    def strchr(self, address, value):
+        data = self.get_string(address)
+        if data is False:
+            return False
+        
+        # The terminator counts as part of the string
+        index = (data + "\x00").find(chr(value & 0xff))
+        if index == -1:
+            return 0
+        
+        return address + index
+    
+    def strrchr(self, address, value):
+        data = self.get_string(address)
+        if data is False:
+            return False
+        
+        index = (data + "\x00").rfind(chr(value & 0xff))
+        if index == -1:
+            return 0
+        
+        return address + index
+    
+    def zeromemory(self, destination, size):
+        return self.memset(destination, 0, size)
+    
+    def fillmemory(self, destination, size, value):
+        return self.memset(destination, value, size)
@@ -14,7 +14,11 @@ import sys, os, time, struct, re
 
 sys.path.append("lib")
 
-import pydasm
+try:
+    import pydasm
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
 
 '''
 PyOperand:
@@ -39,8 +43,15 @@ class PyOperand:
         self.immediate = 0x0
         self.flags = 0x0
         
-        # Set up the operand information
-        self.set_operand(operand)
+        # The effective address calculator and the registers it reads,
+        # compiled by the CPU the first time the operand is decoded
+        self.address = None
+        self.address_registers = ()
+        
+        # Set up the operand information, a cached operand is filled in
+        # with set_state instead
+        if operand:
+            self.set_operand(operand)
     
     #
     # set_operand: Responsible for initializing the operands values from pydasm
@@ -60,6 +71,24 @@ class PyOperand:
         self.displacement = operand.displacement
         self.immediate = operand.immediate
         self.flags = operand.flags
+    
+    #
+    # get_state: Returns the decoded operand as a tuple that can be marshaled
+    #
+    def get_state(self):
+        return (self.type, self.reg, self.basereg, self.indexreg, self.scale,
+                self.dispbytes, self.dispoffset, self.immbytes, self.immoffset,
+                self.sectionbytes, self.section, self.displacement,
+                self.immediate, self.flags)
+    
+    #
+    # set_state: Restores an operand from a get_state tuple
+    #
+    def set_state(self, state):
+        (self.type, self.reg, self.basereg, self.indexreg, self.scale,
+         self.dispbytes, self.dispoffset, self.immbytes, self.immoffset,
+         self.sectionbytes, self.section, self.displacement,
+         self.immediate, self.flags) = state
 
 '''
 PyInstruction:
@@ -85,12 +114,23 @@ class PyInstruction:
         
         self.disasm = ""
         self.mnemonic = ""
+        self.prefix = ""
         self.op1 = ""
         self.op2 = ""
         self.op3 = ""
+        
+        # The CPU method that executes us, bound at decode time
+        self.handler = None
+        
+        # Whether user handlers want to see us or our address.  The CPU
+        # clears these at decode time when nobody is hooked.
+        self.hooked = True
+        self.pc_hooked = True
 
-        # Set up our instruction values
-        self.set_instruction(instruction)
+        # Set up our instruction values, a cached instruction is filled in
+        # with set_state instead
+        if instruction:
+            self.set_instruction(instruction)
     
     def group1(self):
         return bool(self.flags & 0xff000000)
@@ -214,4 +254,90 @@ class PyInstruction:
         # Disassembly string of instruction
         self.disasm = pydasm.get_instruction_string(instruction, pydasm.FORMAT_INTEL, 0x0).rstrip(" ")
         self.mnemonic = pydasm.get_mnemonic_string(instruction, pydasm.FORMAT_INTEL).rstrip(" ")
-   
\ No newline at end of file
+    
+    #
+    # split_prefix: pydasm leaves any rep or lock prefix in the mnemonic
+    #               string, this moves it out to prefix
+    #
+    def split_prefix(self):
+        mnemonic = self.mnemonic.split()
+        if mnemonic[0] in ["rep", "repe", "repne", "lock"]:
+            self.prefix = mnemonic[0]
+            self.mnemonic = mnemonic[1]
+        else:
+            self.mnemonic = mnemonic[0]
+    
+    #
+    # get_state: Returns the decoded instruction as a tuple of plain values
+    #            that can be marshaled.  Handlers and hooks are left to the
+    #            CPU.
+    #
+    def get_state(self):
+        operands = []
+        for op in [self.op1, self.op2, self.op3]:
+            if op:
+                operands.append(op.get_state())
+            else:
+                operands.append(None)
+        
+        return (self.length, self.type, self.mode, self.opcode, self.modrm,
+                self.sib, self.extindex, self.fpuindex, self.dispbytes,
+                self.immbytes, self.sectionbytes, self.flags, self.disasm,
+                self.mnemonic, self.prefix, tuple(operands))
+    
+    #
+    # set_state: Restores an instruction from a get_state tuple
+    #
+    def set_state(self, state):
+        (self.length, self.type, self.mode, self.opcode, self.modrm,
+         self.sib, self.extindex, self.fpuindex, self.dispbytes,
+         self.immbytes, self.sectionbytes, self.flags, self.disasm,
+         self.mnemonic, self.prefix, operands) = state
+        
+        self.op1, self.op2, self.op3 = "", "", ""
+        
+        if operands[0]:
+            self.op1 = PyOperand(None)
+            self.op1.set_state(operands[0])
+        
+        if operands[1]:
+            self.op2 = PyOperand(None)
+            self.op2.set_state(operands[1])
+        
+        if operands[2]:
+            self.op3 = PyOperand(None)
+            self.op3.set_state(operands[2])
+   
+
+'''
+PyBlock:
+    
+    A straight line run of decoded instructions ending in a control
+    transfer.  The CPU translates each block into a single callable so
+    hot loops run block at a time instead of instruction at a time.
+'''
+class PyBlock:
+    def __init__(self, start, end, instructions):
+        # Address of the first instruction and the address after the last
+        self.start = start
+        self.end = end
+        
+        # A list of (address, PyInstruction) tuples in execution order
+        self.instructions = instructions
+        self.count = len(instructions)
+        
+        # Cleared when a write lands on one of our code pages
+        self.valid = True
+        
+        # The translated callable, filled in by the CPU
+        self.run = None
+        
+        # The compiled code object behind run once we are compiled, kept
+        # so the code cache can save it
+        self.code = None
+        
+        # The interpreted callable we go back to when compiled code has to
+        # be thrown away, how often we have run and if we tried compiling
+        self.interpreted = None
+        self.hits = 0
+        self.compiled = False
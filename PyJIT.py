@@ -0,0 +1,670 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+import sys
+
+sys.path.append("lib")
+
+try:
+    import pydasm
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
+
+from PyFlags import PyFlags, defined_flags
+
+'''
+PyJIT:
+
+    Turns hot translated blocks into python source and compiles them.
+    Guest registers live in local variables for the length of the block,
+    memory goes through the CPU get_memory/set_memory fast paths and a
+    flag record is only stored when something after it could read it.
+    Conditional jumps and setcc test the operands of the instruction that
+    set the flags directly when they can.
+    
+    Instructions we dont generate code for call their normal handler so
+    every block can be compiled.  A compiled block gives up (returns to
+    the caller with the state of the next instruction) when one of its
+    writes lands on its own code, and the CPU puts the interpreted block
+    back whenever hooks or memory handlers change.  Nothing is compiled
+    while a memory, stack or heap handler is set.
+'''
+class PyJIT:
+    DEBUG = 0
+    
+    names = ["EAX", "ECX", "EDX", "EBX", "ESP", "EBP", "ESI", "EDI"]
+    
+    # Two operand ALU instructions, their flag record and python operator
+    arithmetic = {"add": ("ADD", "+"),
+                  "sub": ("SUB", "-"),
+                  "cmp": ("CMP", "-"),
+                  "and": ("LOGIC", "&"),
+                  "or":  ("LOGIC", "|"),
+                  "xor": ("LOGIC", "^"),
+                  "test": ("LOGIC", "&")}
+    
+    arithmetic_opcodes = frozenset(range(0x00, 0x06) + range(0x08, 0x0e) +
+                                   range(0x20, 0x26) + range(0x28, 0x2e) +
+                                   range(0x30, 0x36) + range(0x38, 0x3e) +
+                                   range(0x80, 0x86) + [0xa8, 0xa9, 0xf6, 0xf7])
+    
+    # Byte forms of the one byte opcodes we handle
+    byte_opcodes = frozenset([0x00, 0x02, 0x04, 0x08, 0x0a, 0x0c, 0x20, 0x22,
+                              0x24, 0x28, 0x2a, 0x2c, 0x30, 0x32, 0x34, 0x38,
+                              0x3a, 0x3c, 0x80, 0x82, 0x84, 0x86, 0x88, 0x8a,
+                              0xa8, 0xc0, 0xc6, 0xf6, 0xfe] + range(0xb0, 0xb8))
+    
+    shifts = {"shl": "SHL", "sal": "SHL", "shr": "SHR", "sar": "SAR"}
+    
+    masks = {1: 0xff, 2: 0xffff, 4: 0xffffffff}
+    
+    def __init__(self, cpu):
+        self.cpu = cpu
+        
+        # Number of blocks we have compiled
+        self.compiled = 0
+        
+        # Per block code generation state
+        self.lines = []
+        self.used = set()
+        self.written = set()
+        self.addresses = set()
+        self.pending = None
+    
+    #
+    # compile_block: Generates and compiles python for a PyBlock, or takes
+    #                the code from the code cache when it has it.  On
+    #                success block.run is replaced and True is returned.
+    #
+    def compile_block(self, block):
+        cpu = self.cpu
+        
+        # Compiled code reads registers without calling register handlers
+        # and skips opcode/mnemonic handlers
+        if cpu.emu.register_handlers:
+            return False
+        
+        # Registers and EIP stay in locals across memory accesses, so a
+        # memory, stack or heap handler would see stale state
+        if cpu.emu.watch_all or cpu.emu.watched_pages:
+            return False
+        
+        for address, instruction in block.instructions:
+            if instruction.hooked:
+                return False
+        
+        code = None
+        if cpu.code_cache:
+            code = cpu.code_cache.get_code(block)
+        
+        if not code:
+            code = self.generate(block)
+            
+            if cpu.code_cache:
+                cpu.code_cache.add_code(block, code)
+        
+        return self.load_block(block, code)
+    
+    #
+    # load_block: Runs a compiled code object to define the block function
+    #             and installs it as block.run
+    #
+    def load_block(self, block, code):
+        cpu = self.cpu
+        
+        namespace = {"self": cpu,
+                     "registers": cpu.registers,
+                     "block": block,
+                     "set_flags": cpu.set_flags,
+                     "get_memory": cpu.get_memory,
+                     "set_memory": cpu.set_memory,
+                     "parity": PyFlags.parity_lookup_table}
+        
+        # Every instruction can be called through its handler
+        for index, (address, instruction) in enumerate(block.instructions):
+            namespace["h%d" % index] = instruction.handler
+            namespace["i%d" % index] = instruction
+        
+        exec code in namespace
+        
+        block.run = namespace["run"]
+        block.code = code
+        
+        self.compiled += 1
+        
+        return True
+    
+    #
+    # generate: Generates the python for a PyBlock and returns it compiled
+    #           to a code object
+    #
+    def generate(self, block):
+        self.lines = []
+        self.used = set()
+        self.written = set()
+        self.addresses = set()
+        self.pending = None
+        
+        kinds = [self.classify(instruction) for address, instruction in block.instructions]
+        leaves = [self.may_leave(kind, instruction) for kind, (address, instruction) in zip(kinds, block.instructions)]
+        
+        finished = False
+        for index, (address, instruction) in enumerate(block.instructions):
+            nextaddress = (address + instruction.length) & 0xffffffff
+            last = index == len(block.instructions) - 1
+            
+            if kinds[index]:
+                finished = self.emit(index, address, nextaddress, instruction, kinds[index], self.flags_live(kinds, leaves, index))
+            else:
+                finished = self.emit_handler(index, address, nextaddress, instruction, last)
+        
+        # The block stopped short of a branch so we fall through
+        if not finished:
+            self.emit_exit(block.end, len(block.instructions))
+        
+        # Registers are loaded on entry and after any handler call
+        loads = ["%s = registers[%d]" % (self.names[register], register) for register in sorted(self.used)]
+        
+        body = list(loads)
+        for line in self.lines:
+            if line == "%RELOAD%":
+                body.extend(loads)
+            else:
+                body.append(line)
+        
+        source = "def run():\n" + "".join(["    %s\n" % line for line in body])
+        
+        if self.DEBUG > 0:
+            print "[*] Compiled block @ 0x%08x\n%s" % (block.start, source)
+        
+        return compile(source, "<block 0x%08x>" % block.start, "exec")
+    
+    #
+    # classify: Decides if we generate code for an instruction.  Returns a
+    #           tuple describing it or None to call its handler.
+    #
+    def classify(self, instruction):
+        # Anything prefixed, segment overridden or not 32 bit is left to
+        # the handlers
+        if instruction.prefix or instruction.operand_so() or instruction.address_so() or instruction.group2():
+            return None
+        
+        mnemonic = instruction.mnemonic.lower()
+        opcode = instruction.opcode
+        
+        op1 = instruction.op1
+        op2 = instruction.op2
+        
+        if opcode in self.byte_opcodes:
+            size = 1
+        else:
+            size = 4
+        
+        if mnemonic == "mov":
+            if opcode in (0x88, 0x89, 0x8a, 0x8b, 0xc6, 0xc7) or 0xb0 <= opcode <= 0xbf:
+                return ("mov", size)
+        elif mnemonic in ("movzx", "movsx"):
+            if opcode in (0xb6, 0xb7, 0xbe, 0xbf) and op1.type == pydasm.OPERAND_TYPE_REGISTER:
+                if opcode in (0xb6, 0xbe):
+                    return ("extend", 1, mnemonic == "movsx")
+                
+                return ("extend", 2, mnemonic == "movsx")
+        elif mnemonic == "lea":
+            if op2.type == pydasm.OPERAND_TYPE_MEMORY:
+                return ("lea",)
+        elif mnemonic in self.arithmetic:
+            if opcode in self.arithmetic_opcodes:
+                return ("arithmetic", mnemonic, size)
+        elif mnemonic in ("inc", "dec"):
+            if 0x40 <= opcode <= 0x4f or opcode in (0xfe, 0xff):
+                return ("step", mnemonic.upper(), size)
+        elif mnemonic in self.shifts:
+            # Only the immediate count forms
+            if opcode in (0xc0, 0xc1):
+                return ("shift", self.shifts[mnemonic], size)
+        elif mnemonic == "push":
+            if 0x50 <= opcode <= 0x57 or opcode in (0x68, 0x6a):
+                return ("push",)
+        elif mnemonic == "pop":
+            if 0x58 <= opcode <= 0x5f:
+                return ("pop",)
+        elif mnemonic == "nop":
+            if opcode == 0x90:
+                return ("nop",)
+        elif mnemonic == "jmp":
+            if opcode in (0xe9, 0xeb):
+                return ("jmp",)
+        elif mnemonic.startswith("set"):
+            if 0x90 <= opcode <= 0x9f and op1.type == pydasm.OPERAND_TYPE_REGISTER:
+                return ("setcc", opcode & 0xf)
+        elif mnemonic.startswith("j"):
+            # Short and near conditional jumps (not jecxz and friends)
+            if 0x70 <= opcode <= 0x7f or 0x80 <= opcode <= 0x8f:
+                return ("jcc", opcode & 0xf)
+        
+        return None
+    
+    #
+    # flags_live: Decides if the flags an instruction produces can be read.
+    #             They are dead when the next instruction that touches
+    #             flags in this block sets at least the same ones, unless
+    #             the block can be left before that instruction runs.
+    #
+    def flags_live(self, kinds, leaves, index):
+        produced = self.produces(kinds[index])
+        if produced == None:
+            return False
+        
+        if leaves[index]:
+            return True
+        
+        for kind, leave in zip(kinds[index + 1:], leaves[index + 1:]):
+            # Producers that can leave store their own flags first
+            if leave and self.produces(kind) == None:
+                return True
+            
+            if kind and kind[0] in ("mov", "extend", "lea", "push", "pop", "nop", "jmp"):
+                continue
+            
+            later = self.produces(kind)
+            
+            return later == None or not produced <= later
+        
+        return True
+    
+    #
+    # may_leave: Whether the block can be left right after an instruction.
+    #            Memory writes and handler calls check block.valid.
+    #
+    def may_leave(self, kind, instruction):
+        if not kind or kind[0] == "push":
+            return True
+        
+        if kind[0] == "arithmetic" and kind[1] in ("cmp", "test"):
+            return False
+        
+        if kind[0] in ("mov", "arithmetic", "step", "shift"):
+            return instruction.op1.type == pydasm.OPERAND_TYPE_MEMORY
+        
+        return False
+    
+    #
+    # produces: Returns the set of flags a classified instruction defines
+    #           or None if it does not write flags itself
+    #
+    def produces(self, kind):
+        if not kind:
+            return None
+        
+        if kind[0] == "arithmetic":
+            return defined_flags[self.arithmetic[kind[1]][0]]
+        elif kind[0] in ("step", "shift"):
+            return defined_flags[kind[1]]
+        
+        return None
+    
+    #
+    # emit: Generates the code for a classified instruction.  Returns True
+    #       if the instruction ended the block.
+    #
+    def emit(self, index, address, nextaddress, instruction, kind, live):
+        op1 = instruction.op1
+        op2 = instruction.op2
+        
+        temp = "t%d" % index
+        
+        if kind[0] == "mov":
+            size = kind[1]
+            
+            value = self.read_operand(op2, size, instruction, temp + "s")
+            self.write_operand(op1, size, value, instruction, index, nextaddress, temp + "d")
+        
+        elif kind[0] == "extend":
+            size, signed = kind[1], kind[2]
+            
+            value = self.read_operand(op2, size, instruction, temp + "s")
+            if signed:
+                sign = 1 << (size * 8 - 1)
+                value = "(((%s ^ 0x%x) - 0x%x) & 0xffffffff)" % (value, sign, sign)
+            
+            self.write_register(op1.reg, 4, value)
+        
+        elif kind[0] == "lea":
+            self.write_register(op1.reg, 4, self.address(instruction, op2))
+        
+        elif kind[0] == "arithmetic":
+            record, operator = self.arithmetic[kind[1]]
+            size = kind[2]
+            mask = self.masks[size]
+            
+            first = self.read_operand(op1, size, instruction, temp + "d")
+            second = self.read_operand(op2, size, instruction, temp + "s")
+            
+            self.lines.append("%sa = %s" % (temp, first))
+            self.lines.append("%sb = %s" % (temp, second))
+            
+            if record == "LOGIC":
+                self.lines.append("%sr = %sa %s %sb" % (temp, temp, operator, temp))
+            else:
+                self.lines.append("%sr = (%sa %s %sb) & 0x%x" % (temp, temp, operator, temp, mask))
+            
+            if live:
+                self.lines.append("set_flags(\"%s\", %sa, %sb, %sr, %d)" % (record, temp, temp, temp, size))
+            
+            self.pending = (record, temp + "a", temp + "b", temp + "r", size)
+            
+            if kind[1] not in ("cmp", "test"):
+                self.write_operand(op1, size, temp + "r", instruction, index, nextaddress, temp + "d")
+        
+        elif kind[0] == "step":
+            record, size = kind[1], kind[2]
+            mask = self.masks[size]
+            
+            self.lines.append("%sa = %s" % (temp, self.read_operand(op1, size, instruction, temp + "d")))
+            
+            if record == "INC":
+                self.lines.append("%sr = (%sa + 1) & 0x%x" % (temp, temp, mask))
+            else:
+                self.lines.append("%sr = (%sa - 1) & 0x%x" % (temp, temp, mask))
+            
+            if live:
+                self.lines.append("set_flags(\"%s\", %sa, 1, %sr, %d)" % (record, temp, temp, size))
+            
+            self.pending = (record, temp + "a", "1", temp + "r", size)
+            
+            self.write_operand(op1, size, temp + "r", instruction, index, nextaddress, temp + "d")
+        
+        elif kind[0] == "shift":
+            record, size = kind[1], kind[2]
+            mask = self.masks[size]
+            sign = 1 << (size * 8 - 1)
+            
+            # The handlers keep the unmasked count for the flags
+            count = op2.immediate & mask
+            shift = count & 0x1f
+            
+            self.lines.append("%sa = %s" % (temp, self.read_operand(op1, size, instruction, temp + "d")))
+            
+            if record == "SHL":
+                self.lines.append("%sr = (%sa << %d) & 0x%x" % (temp, temp, shift, mask))
+            elif record == "SHR":
+                self.lines.append("%sr = %sa >> %d" % (temp, temp, shift))
+            else:
+                self.lines.append("%sr = (((%sa ^ 0x%x) - 0x%x) >> %d) & 0x%x" % (temp, temp, sign, sign, shift, mask))
+            
+            if live:
+                self.lines.append("set_flags(\"%s\", %sa, %d, %sr, %d)" % (record, temp, count, temp, size))
+            
+            self.pending = (record, temp + "a", str(count), temp + "r", size)
+            
+            self.write_operand(op1, size, temp + "r", instruction, index, nextaddress, temp + "d")
+        
+        elif kind[0] == "push":
+            if 0x50 <= instruction.opcode <= 0x57:
+                value = self.read_register(instruction.opcode - 0x50, 4)
+            else:
+                value = self.immediate(op1, 4)
+            
+            self.used.add(4)
+            self.written.add(4)
+            
+            self.lines.append("%sv = %s" % (temp, value))
+            self.lines.append("ESP = (ESP - 4) & 0xffffffff")
+            self.lines.append("set_memory(ESP, %sv, 4)" % temp)
+            self.emit_check(index, nextaddress)
+        
+        elif kind[0] == "pop":
+            self.used.add(4)
+            self.written.add(4)
+            
+            self.lines.append("%sv = get_memory(ESP, 4)" % temp)
+            self.lines.append("ESP = (ESP + 4) & 0xffffffff")
+            self.write_register(instruction.opcode - 0x58, 4, temp + "v")
+        
+        elif kind[0] == "nop":
+            pass
+        
+        elif kind[0] == "setcc":
+            self.write_register(op1.reg, 1, "(%s and 1 or 0)" % self.condition(kind[1]))
+        
+        elif kind[0] == "jmp":
+            self.emit_exit((nextaddress + op1.immediate) & 0xffffffff, index + 1)
+            
+            return True
+        
+        elif kind[0] == "jcc":
+            target = (nextaddress + op1.immediate) & 0xffffffff
+            
+            self.emit_store()
+            self.lines.append("if %s:" % self.condition(kind[1]))
+            self.lines.append("    self.EIP = 0x%08x" % target)
+            self.lines.append("else:")
+            self.lines.append("    self.EIP = 0x%08x" % nextaddress)
+            self.lines.append("return %d" % (index + 1))
+            
+            return True
+        
+        return False
+    
+    #
+    # emit_handler: Calls the normal handler for an instruction we dont
+    #               generate code for.  Registers are stored before and
+    #               reloaded after since the handler uses the CPU state.
+    #
+    def emit_handler(self, index, address, nextaddress, instruction, last):
+        self.emit_store()
+        
+        self.lines.append("self.EIP = 0x%08x" % address)
+        self.lines.append("if not h%d(i%d):" % (index, index))
+        self.lines.append("    return 0")
+        
+        self.pending = None
+        
+        if last:
+            self.lines.append("if self.EIP == 0x%08x:" % address)
+            self.lines.append("    self.EIP = 0x%08x" % nextaddress)
+            self.lines.append("return %d" % (index + 1))
+            
+            return True
+        
+        self.lines.append("%RELOAD%")
+        self.lines.append("if not block.valid:")
+        self.lines.append("    self.EIP = 0x%08x" % nextaddress)
+        self.lines.append("    return %d" % (index + 1))
+        
+        return False
+    
+    #
+    # emit_store: Writes every register we changed back to the CPU
+    #
+    def emit_store(self, indent=""):
+        for register in sorted(self.written):
+            self.lines.append("%sregisters[%d] = %s" % (indent, register, self.names[register]))
+    
+    #
+    # emit_exit: Leaves the block at address having run count instructions
+    #
+    def emit_exit(self, address, count, indent=""):
+        self.emit_store(indent)
+        
+        self.lines.append("%sself.EIP = 0x%08x" % (indent, address))
+        self.lines.append("%sreturn %d" % (indent, count))
+    
+    #
+    # emit_check: After a memory write, leave if we wrote over our own code
+    #
+    def emit_check(self, index, nextaddress):
+        self.lines.append("if not block.valid:")
+        self.emit_exit(nextaddress, index + 1, "    ")
+    
+    #
+    # condition: Returns an expression for a jcc/setcc condition code.  If
+    #            we know which instruction set the flags we compare its
+    #            operands, otherwise we ask the CPU for the flags.
+    #
+    def condition(self, code):
+        expression = None
+        
+        if self.pending:
+            record, a, b, r, size = self.pending
+            sign = 1 << (size * 8 - 1)
+            
+            if record in ("SUB", "CMP"):
+                expression = {0x0: "(%s ^ %s) & (%s ^ %s) & 0x%x" % (a, b, a, r, sign),
+                              0x2: "%s < %s" % (a, b),
+                              0x4: "%s == %s" % (a, b),
+                              0x6: "%s <= %s" % (a, b),
+                              0x8: "%s & 0x%x" % (r, sign),
+                              0xa: "parity[%s & 0xff]" % r,
+                              0xc: "(%s ^ 0x%x) < (%s ^ 0x%x)" % (a, sign, b, sign),
+                              0xe: "(%s ^ 0x%x) <= (%s ^ 0x%x)" % (a, sign, b, sign)}[code & 0xe]
+            elif record == "LOGIC":
+                expression = {0x0: "False",
+                              0x2: "False",
+                              0x4: "%s == 0" % r,
+                              0x6: "%s == 0" % r,
+                              0x8: "%s & 0x%x" % (r, sign),
+                              0xa: "parity[%s & 0xff]" % r,
+                              0xc: "%s & 0x%x" % (r, sign),
+                              0xe: "%s == 0 or %s & 0x%x" % (r, r, sign)}[code & 0xe]
+            elif code & 0xe in (0x4, 0x8):
+                # Everything we record sets ZF and SF from the result
+                expression = {0x4: "%s == 0" % r,
+                              0x8: "%s & 0x%x" % (r, sign)}[code & 0xe]
+        
+        if not expression:
+            expression = {0x0: "self.OF",
+                          0x2: "self.CF",
+                          0x4: "self.ZF",
+                          0x6: "self.CF or self.ZF",
+                          0x8: "self.SF",
+                          0xa: "self.PF",
+                          0xc: "self.SF != self.OF",
+                          0xe: "self.ZF or self.SF != self.OF"}[code & 0xe]
+        
+        # Odd condition codes are the negated form
+        if code & 1:
+            return "not (%s)" % expression
+        
+        return "(%s)" % expression
+    
+    #
+    # address: Returns an expression for a memory operand address
+    #
+    def address(self, instruction, op):
+        parts = []
+        
+        if 0 <= op.basereg < 8:
+            self.used.add(op.basereg)
+            parts.append(self.names[op.basereg])
+        
+        if 0 <= op.indexreg < 8:
+            self.used.add(op.indexreg)
+            
+            scale = 1 << (instruction.get_scale() or 0)
+            if scale == 1:
+                parts.append(self.names[op.indexreg])
+            else:
+                parts.append("%s * %d" % (self.names[op.indexreg], scale))
+        
+        # Sign extend the displacement from its encoded width
+        displacement = op.displacement
+        if op.dispbytes in self.masks:
+            displacement &= self.masks[op.dispbytes]
+            if displacement & (1 << (op.dispbytes * 8 - 1)):
+                displacement -= 1 << (op.dispbytes * 8)
+        
+        if not parts:
+            return "0x%x" % (displacement & 0xffffffff)
+        
+        if displacement:
+            parts.append("0x%x" % (displacement & 0xffffffff))
+        
+        return "((%s) & 0xffffffff)" % " + ".join(parts)
+    
+    #
+    # immediate: Returns an immediate sign extended from its encoded width
+    #
+    def immediate(self, op, size):
+        value = op.immediate
+        if op.immbytes in (1, 2):
+            value &= self.masks[op.immbytes]
+            if value & (1 << (op.immbytes * 8 - 1)):
+                value -= 1 << (op.immbytes * 8)
+        
+        return "0x%x" % (value & self.masks[size])
+    
+    #
+    # read_register: Returns an expression for a register of a given size
+    #
+    def read_register(self, register, size):
+        if size == 1 and register >= 4:
+            self.used.add(register - 4)
+            
+            return "((%s >> 8) & 0xff)" % self.names[register - 4]
+        
+        self.used.add(register)
+        
+        if size == 4:
+            return self.names[register]
+        
+        return "(%s & 0x%x)" % (self.names[register], self.masks[size])
+    
+    #
+    # write_register: Emits a store of an expression into a register
+    #
+    def write_register(self, register, size, value):
+        if size == 1 and register >= 4:
+            register -= 4
+            
+            line = "%s = (%s & 0xffff00ff) | (%s << 8)" % (self.names[register], self.names[register], value)
+        elif size == 4:
+            line = "%s = %s" % (self.names[register], value)
+        else:
+            line = "%s = (%s & 0x%x) | %s" % (self.names[register], self.names[register], 0xffffffff ^ self.masks[size], value)
+        
+        self.used.add(register)
+        self.written.add(register)
+        
+        self.lines.append(line)
+    
+    #
+    # read_operand: Returns an expression for the value of an operand,
+    #               memory is read into a temporary first
+    #
+    def read_operand(self, op, size, instruction, temp):
+        if op.type == pydasm.OPERAND_TYPE_REGISTER:
+            return self.read_register(op.reg, size)
+        elif op.type == pydasm.OPERAND_TYPE_IMMEDIATE:
+            return self.immediate(op, size)
+        
+        self.lines.append("%sm = %s" % (temp, self.address(instruction, op)))
+        self.lines.append("%sv = get_memory(%sm, %d)" % (temp, temp, size))
+        
+        self.addresses.add(temp)
+        
+        return temp + "v"
+    
+    #
+    # write_operand: Emits a store of an expression into an operand.  A
+    #                memory operand read earlier reuses its address.
+    #
+    def write_operand(self, op, size, value, instruction, index, nextaddress, temp):
+        if op.type == pydasm.OPERAND_TYPE_REGISTER:
+            return self.write_register(op.reg, size, value)
+        
+        if temp not in self.addresses:
+            self.lines.append("%sm = %s" % (temp, self.address(instruction, op)))
+        
+        self.lines.append("set_memory(%sm, %s, %d)" % (temp, value, size))
+        self.emit_check(index, nextaddress)
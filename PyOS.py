@@ -16,6 +16,12 @@ sys.path.append("lib")
 
 from ctypes import *
 
+# windll only exists on Windows hosts, everywhere else imports get stubs
+try:
+    windll
+except NameError:
+    windll = None
+
 '''
 PyWindows:
     
@@ -27,6 +33,10 @@ PyWindows:
 class PyWindows:
     DEBUG = 0
     
+    # Reserved region we hand out synthetic import addresses from
+    STUBBASE = 0x70000000
+    STUBSIZE = 4
+    
     def __init__(self):
         # We initialize a PEB structure
         self.PEB = self.__PEB()
@@ -34,6 +44,18 @@ class PyWindows:
         
         # This holds any libraries we may be interested in
         self.libraries = {}
+        
+        # Lookups by function name and by (dll, function)
+        self.library_names = {}
+        self.library_keys = {}
+        
+        # Every library address is in [library_start, library_end) so the
+        # cpu can rule most addresses out with one comparison
+        self.library_start = 0
+        self.library_end = 0
+        
+        # The next free stub address
+        self.next_stub = self.STUBBASE
 
     #
     # initialize: called from the emulator to set up the environment
@@ -78,10 +100,15 @@ class PyWindows:
     #              call any user handlers when we call into this function
     #
     def add_library(self, dllname, function):
-        for library in self.libraries:
-            if function == self.libraries[library]['name']:
-                return True
+        if function in self.library_names:
+            return True
 
+        # Without a host loader we just give it a stub
+        if not windll:
+            self.add_stub(dllname, function)
+            
+            return True
+        
         handle  = windll.kernel32.LoadLibraryA(dllname)
         address = windll.kernel32.GetProcAddress(handle, function)
         windll.kernel32.FreeLibrary(handle)
@@ -89,17 +116,106 @@ class PyWindows:
         #if self.DEBUG >= 1:
         print "[*] Adding library %s address 0x%08x" % (function, address)
         
+        self.set_library(address, dllname, function)
+        
+        return True
+    
+    #
+    # set_library: Stores a library at an address and keeps the lookup
+    #              indexes and address range up to date
+    #
+    def set_library(self, address, dllname, function):
         self.libraries[address] = {'dll': dllname, 'address': address, 'name': function}
         
+        if function not in self.library_names:
+            self.library_names[function] = address
+        
+        key = (dllname.lower(), function)
+        if key not in self.library_keys:
+            self.library_keys[key] = address
+        
+        if self.library_start == self.library_end:
+            self.library_start = address
+            self.library_end = address + 1
+        else:
+            self.library_start = min(self.library_start, address)
+            self.library_end = max(self.library_end, address + 1)
+        
         return True
     
+    #
+    # get_library: Returns the library entry at an address or None
+    #
+    def get_library(self, address):
+        if not self.library_start <= address < self.library_end:
+            return None
+        
+        return self.libraries.get(address)
+    
+    #
+    # add_stub: Gives an import a synthetic address in the stub region and
+    #           returns it.  Nothing lives there, the cpu sees the address
+    #           in libraries and calls the library handler instead.
+    #
+    def add_stub(self, dllname, function):
+        key = (dllname.lower(), function)
+        if key in self.library_keys:
+            return self.library_keys[key]
+        
+        address = self.next_stub
+        self.next_stub += self.STUBSIZE
+        
+        if self.DEBUG >= 1:
+            print "[*] Adding library %s!%s stub 0x%08x" % (dllname, function, address)
+        
+        self.set_library(address, dllname, function)
+        
+        return address
+    
+    #
+    # bind_imports: Points an import address table at stubs.  imports is a
+    #               list of (iat address, dll, function) and the table is
+    #               patched with a single write over its whole span.
+    #
+    def bind_imports(self, emu, imports):
+        if not imports:
+            return True
+        
+        table = []
+        for iataddress, dllname, function in imports:
+            table.append((iataddress, self.add_stub(dllname, function)))
+        
+        table.sort()
+        
+        # Make the stubs readable in case anything looks at them
+        if not emu.map_region(self.STUBBASE, self.next_stub - self.STUBBASE, "rx"):
+            return False
+        
+        start = table[0][0]
+        size = table[-1][0] + 4 - start
+        
+        if size == 4:
+            return emu.set_memory(start, table[0][1], 4)
+        
+        # Keep whatever sits between the thunks (the NULL terminators)
+        data = emu.get_memory(start, size)
+        if not data:
+            print "[!] Couldnt read import table @ %x" % start
+            
+            return False
+        
+        data = bytearray(data)
+        for iataddress, stub in table:
+            struct.pack_into("<L", data, iataddress - start, stub)
+        
+        return emu.set_memory(start, str(data))
+    
     #
     # get_library_address: Returns the address for the specified library
     #
     def get_library_address(self, function):
-        for key in self.libraries.keys():
-            if function == self.libraries[key]['name']:
-                return key
+        if function in self.library_names:
+            return self.library_names[function]
         
         return False
             
@@ -387,7 +503,17 @@ class PyLinux:
     DEBUG = 0
     
     def __init__(self):
-        pass
+        # We dont bind imports here, the CPU still looks addresses up
+        self.libraries = {}
+        
+        # An empty library range so the block loop never takes the slow path
+        self.library_start = self.library_end = 0
+    
+    #
+    # get_library: There are no library stubs so nothing is found
+    #
+    def get_library(self, address):
+        return None
 
     #
     # initialize: called from the emulator to set up the environment this
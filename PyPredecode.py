@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+import sys, bisect, multiprocessing
+
+sys.path.append("lib")
+
+try:
+    import pydasm
+    
+    # pydasm only decodes from the start of a string
+    decode_in_place = False
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
+    
+    decode_in_place = True
+
+from PyInstruction import PyInstruction
+
+# Mnemonics that never fall through to the next instruction
+no_fallthrough = ["jmp", "ret", "retn", "iret", "iretd", "hlt", "ud2"]
+
+#
+# ends_block: Whether an instruction ends a basic block.  The CPU uses
+#             this too when translating blocks so the boundaries agree.
+#
+def ends_block(mnemonic):
+    return mnemonic[0] == "j" or mnemonic.startswith("loop") or mnemonic in ["call", "ret", "retn", "int", "int3"]
+
+#
+# get_target: Returns where a relative jump, call or loop at address goes
+#             or None when the target isnt known until run time
+#
+def get_target(address, instruction):
+    op1 = instruction.op1
+    if not op1 or op1.type != pydasm.OPERAND_TYPE_IMMEDIATE or op1.sectionbytes:
+        return None
+    
+    mnemonic = instruction.mnemonic
+    if mnemonic[0] != "j" and mnemonic != "call" and not mnemonic.startswith("loop"):
+        return None
+    
+    return (address + instruction.length + op1.immediate) & 0xffffffff
+
+#
+# predecode: Follows every path reachable from roots through the code in
+#            regions, a list of (address, data) tuples.  Returns the
+#            decoded instructions as {address: state}, the addresses
+#            starting a block and the addresses of instructions ending
+#            one.  This only deals in plain values so it can run in
+#            another process.
+#
+def predecode(regions, roots):
+    regions = sorted(regions)
+    starts = [start for start, data in regions]
+    
+    instructions = {}
+    leaders = set()
+    ends = set()
+    
+    worklist = list(roots)
+    leaders.update(roots)
+    
+    while worklist:
+        address = worklist.pop()
+        
+        index = bisect.bisect_right(starts, address) - 1
+        if index < 0:
+            continue
+        
+        start, data = regions[index]
+        
+        # Decode straight line until we run into a path we already took
+        while address not in instructions:
+            offset = address - start
+            if offset >= len(data):
+                break
+            
+            if decode_in_place:
+                instruction = pydasm.get_instruction(data, pydasm.MODE_32, offset)
+            else:
+                instruction = pydasm.get_instruction(data[offset:offset + 32], pydasm.MODE_32)
+            
+            if not instruction:
+                break
+            
+            pyinstruction = PyInstruction(instruction)
+            pyinstruction.split_prefix()
+            
+            instructions[address] = pyinstruction.get_state()
+            
+            nextaddress = address + pyinstruction.length
+            mnemonic = pyinstruction.mnemonic
+            
+            if ends_block(mnemonic):
+                ends.add(address)
+                
+                target = get_target(address, pyinstruction)
+                if target is not None:
+                    leaders.add(target)
+                    worklist.append(target)
+                
+                if mnemonic in no_fallthrough:
+                    break
+                
+                leaders.add(nextaddress)
+            
+            address = nextaddress
+    
+    return (instructions, leaders, ends)
+
+#
+# predecode_task: Runs predecode on a (regions, roots) tuple for the
+#                 process pool
+#
+def predecode_task(task):
+    return predecode(*task)
+
+#
+# find_blocks: Splits decoded instructions into basic blocks returning
+#              {start: end} where end is the address after the last
+#              instruction
+#
+def find_blocks(instructions, leaders, ends):
+    blocks = {}
+    start = None
+    end = None
+    
+    for address in sorted(instructions):
+        if start is not None and (address != end or address in leaders):
+            blocks[start] = end
+            start = None
+        
+        if start is None:
+            start = address
+        
+        end = address + instructions[address][0]
+        
+        if address in ends:
+            blocks[start] = end
+            start = None
+    
+    if start is not None:
+        blocks[start] = end
+    
+    return blocks
+
+'''
+PyPredecoder:
+
+    Instructions and basic blocks decoded ahead of time from the loaded
+    image by following every path from the entry point, exports and any
+    address the user gives us.  The CPU asks us before it decodes
+    anything itself.  The work can be handed to a pool of processes so
+    emulation can start while big images are still being walked, until
+    the results come back we just dont have anything.
+    
+    Instructions are kept as PyInstruction state tuples by page so a
+    write to a page drops everything decoded from it.  Anything crossing
+    a page boundary is left for the CPU to decode.
+'''
+class PyPredecoder:
+    DEBUG = 0
+    
+    def __init__(self, cpu):
+        self.cpu = cpu
+        
+        # Maps a page to the {address: state} decoded from it
+        self.pages = {}
+        
+        # Maps a block start to its end and a page to the blocks on it
+        self.blocks = {}
+        self.block_pages = {}
+        
+        # The process pool and its results while it is running, pages
+        # written in the meantime have their results thrown away
+        self.pool = None
+        self.pending = None
+        self.stale = set()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    #
+    # start: Predecodes everything reachable from roots in regions.  With
+    #        no processes this is done before we return, otherwise the
+    #        roots are split over a pool running in the background.
+    #
+    def start(self, regions, roots, processes=0):
+        roots = list(set(roots))
+        
+        if not processes:
+            return self.merge([predecode(regions, roots)])
+        
+        tasks = []
+        for x in range(processes):
+            if roots[x::processes]:
+                tasks.append((regions, roots[x::processes]))
+        
+        if not tasks:
+            return True
+        
+        try:
+            self.pool = multiprocessing.Pool(len(tasks))
+        except OSError:
+            print "[!] Couldnt start the predecode processes"
+            
+            return self.merge([predecode(regions, roots)])
+        
+        self.pending = self.pool.map_async(predecode_task, tasks)
+        self.pool.close()
+        
+        return True
+    
+    #
+    # poll: Picks up the pool results if they are in
+    #
+    def poll(self):
+        if self.pending and self.pending.ready():
+            return self.wait()
+        
+        return True
+    
+    #
+    # wait: Blocks until the pool is done and picks up its results
+    #
+    def wait(self):
+        if not self.pending:
+            return True
+        
+        try:
+            results = self.pending.get()
+        except Exception, e:
+            print "[!] Predecoding failed: %s" % e
+            
+            results = []
+        
+        self.pool.join()
+        self.pool = None
+        self.pending = None
+        
+        return self.merge(results)
+    
+    #
+    # merge: Files the results of predecode runs away by page
+    #
+    def merge(self, results):
+        instructions = {}
+        leaders = set()
+        ends = set()
+        
+        for found, starts, stops in results:
+            instructions.update(found)
+            leaders.update(starts)
+            ends.update(stops)
+        
+        for address, state in instructions.iteritems():
+            page = address & 0xfffff000
+            if page in self.stale or (address + state[0] - 1) & 0xfffff000 != page:
+                continue
+            
+            if page not in self.pages:
+                self.pages[page] = {}
+            
+            self.pages[page][address] = state
+        
+        for start, end in find_blocks(instructions, leaders, ends).iteritems():
+            pages = range(start & 0xfffff000, end, 0x1000)
+            if self.stale.intersection(pages):
+                continue
+            
+            self.blocks[start] = end
+            for page in pages:
+                if page not in self.block_pages:
+                    self.block_pages[page] = []
+                
+                self.block_pages[page].append(start)
+        
+        self.stale = set()
+        
+        if self.DEBUG > 0:
+            print "[*] Predecoded %d instructions in %d blocks" % (len(instructions), len(self.blocks))
+        
+        return True
+    
+    #
+    # invalidate: Forgets everything decoded from a page that is being
+    #             written
+    #
+    def invalidate(self, page):
+        if self.pending:
+            self.stale.add(page)
+        
+        if page in self.pages:
+            del self.pages[page]
+        
+        if page in self.block_pages:
+            for start in self.block_pages[page]:
+                if start in self.blocks:
+                    del self.blocks[start]
+            
+            del self.block_pages[page]
+        
+        return True
+    
+    #
+    # get_instruction: Returns a ready to run PyInstruction for address if
+    #                  we decoded one, otherwise None
+    #
+    def get_instruction(self, address):
+        if self.pending:
+            self.poll()
+        
+        entry = self.pages.get(address & 0xfffff000)
+        if not entry or address not in entry:
+            self.misses += 1
+            
+            return None
+        
+        instruction = PyInstruction(None)
+        instruction.set_state(entry[address])
+        instruction.handler = self.cpu.get_handler(instruction, self.cpu.read_code(address, instruction.length))
+        
+        self.hits += 1
+        
+        return self.cpu.link(address, instruction)
+    
+    #
+    # get_blocks: Returns every predecoded basic block as {start: end},
+    #             waiting for the pool if it is still running
+    #
+    def get_blocks(self):
+        self.wait()
+        
+        return dict(self.blocks)
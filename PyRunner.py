@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+import os, multiprocessing
+
+# The runner the pool workers use.  Workers are forked after this is set
+# so they inherit the emulator, the loaded image and the start snapshot.
+runner = None
+
+#
+# run_input: Pool entry point, runs one input vector in a worker
+#
+def run_input(vector):
+    return runner.run_one(vector)
+
+'''
+PyRunner:
+
+    Runs one prepared emulator over many input vectors using a process
+    pool.  The emulator state is snapshotted once in the parent and every
+    input starts from that snapshot.  An input vector is a dictionary
+    with any of these keys:
+    
+        "registers": { "EAX": 0x41414141, ... }
+        "arguments": { 0x8: 0x10, ... }      (offsets for set_stack_argument)
+        "memory":    { 0x00401000: "ABCD", 0x00402000: 0x1, ... }
+    
+    Each run goes from start until EIP reaches stop (or stop(emu) returns
+    True when stop is callable) and the value of result(emu) is handed
+    back.  Results come back in the order of the inputs.
+'''
+class PyRunner:
+    def __init__(self, emu, start, stop, result=None, steps=0, processes=None):
+        self.emu = emu
+        self.start = start
+        self.stop = stop
+        self.steps = steps
+        
+        # By default we hand back the return value of the function
+        if result:
+            self.result = result
+        else:
+            self.result = lambda emu: emu.get_register("EAX")
+        
+        # Default to every core we have
+        if processes:
+            self.processes = processes
+        else:
+            self.processes = multiprocessing.cpu_count()
+        
+        self.snapshot = None
+    
+    #
+    # run: Runs every input vector and yields the results in order.  We
+    #      need fork for the workers to inherit the emulator, without it
+    #      (or with one process) we run the inputs here.
+    #
+    def run(self, inputs, chunksize=16):
+        global runner
+        
+        self.snapshot = self.emu.snapshot()
+        
+        if self.processes <= 1 or not hasattr(os, "fork"):
+            for vector in inputs:
+                yield self.run_one(vector)
+            
+            return
+        
+        runner = self
+        
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in pool.imap(run_input, inputs, chunksize):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+            
+            runner = None
+    
+    #
+    # run_one: Restores the start snapshot, applies one input vector and
+    #          emulates to the stop condition.  Returns False if emulation
+    #          failed.
+    #
+    def run_one(self, vector):
+        emu = self.emu
+        
+        emu.restore(self.snapshot)
+        
+        if "registers" in vector:
+            for register, value in vector["registers"].items():
+                emu.set_register(register, value)
+        
+        if "arguments" in vector:
+            for offset, value in vector["arguments"].items():
+                emu.set_stack_argument(offset, value)
+        
+        if "memory" in vector:
+            for address, value in vector["memory"].items():
+                emu.set_memory(address, value)
+        
+        emu.set_register("EIP", self.start)
+        
+        if callable(self.stop):
+            steps = 0
+            
+            while not self.stop(emu):
+                if self.steps and steps >= self.steps:
+                    break
+                
+                if not emu.execute():
+                    return False
+                
+                steps += 1
+        else:
+            if self.steps:
+                result = emu.execute(steps=self.steps, end=self.stop)
+            else:
+                result = emu.execute(end=self.stop)
+            
+            if not result:
+                return False
+        
+        return self.result(emu)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+'''
+PySnapshot:
+
+    Holds what PyEmu needs to go back to an earlier point in emulation.
+    The memory pages keep a reference to the page data at snapshot time.
+    Page data is never modified in place, so the live memory and the
+    snapshot share every page until one of them is written.
+'''
+class PySnapshot:
+    def __init__(self):
+        # The state returned by PyCPU.get_state
+        self.cpu = None
+        
+        # A private copy of the PyOS object
+        self.os = None
+        
+        # Maps a page address to its (PyMemoryPage, data) at snapshot time
+        self.pages = {}
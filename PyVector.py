@@ -0,0 +1,755 @@
+#!/usr/bin/env python
+
+########################################################################
+#
+# PyEmu: scriptable x86 emulator
+#
+# Cody Pierce - cpierce@tippingpoint.com - 2007
+#
+# License: None
+#
+########################################################################
+
+try:
+    import pydasm
+except ImportError:
+    # Fall back to the pure python decoder in lib/ia32
+    from ia32 import dasm as pydasm
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from PyFlags import PyFlags
+
+# Register order matches PyCPU.registers
+register_names = ["EAX", "ECX", "EDX", "EBX", "ESP", "EBP", "ESI", "EDI"]
+flag_names = ["CF", "PF", "AF", "ZF", "SF", "OF"]
+
+# Byte sized forms of the instructions we vectorize, everything else is
+# a full dword (we leave operand size prefixed code to the scalar cpu)
+byte_opcodes = frozenset([0x00, 0x02, 0x04, 0x08, 0x0a, 0x0c, 0x20, 0x22,
+                          0x24, 0x28, 0x2a, 0x2c, 0x30, 0x32, 0x34, 0x38,
+                          0x3a, 0x3c, 0x80, 0x82, 0x84, 0x86, 0x88, 0x8a,
+                          0xa8, 0xc0, 0xc6, 0xd0, 0xd2, 0xfe] + range(0xb0, 0xb8))
+
+arithmetic = {"add": "ADD", "sub": "SUB", "cmp": "CMP", "and": "AND",
+              "or": "OR", "xor": "XOR", "test": "TEST"}
+
+shifts = frozenset(["shl", "sal", "shr", "sar", "rol", "ror"])
+
+#
+# PyVectorEscape: Raised when a group of lanes cannot be handled with
+#                 vector operations.  Nothing has been written yet when
+#                 this is raised so the lanes can finish on the scalar cpu.
+#
+class PyVectorEscape(Exception):
+    pass
+
+'''
+PyVector:
+
+    Runs one prepared emulator over many inputs at once.  Every register
+    and flag is a numpy array with one lane per input and the common
+    integer instructions (ADD, SUB, CMP, logic, shifts and rotates, IMUL,
+    MOV, MOVZX, LEA, SETcc, INC/DEC, PUSH/POP and control flow) are done
+    on all lanes together using the same formulas as PyCPU and PyFlags.
+    
+    Lanes that take different sides of a branch are split into separate
+    groups and merged back together when they reach the same address.
+    Memory written by the lanes is kept in a per lane byte overlay on top
+    of the emulator memory.  Anything we can not do on every lane at once
+    (an unsupported instruction, a memory access to a different address
+    in each lane) sends those lanes to the scalar cpu one at a time
+    starting from the state they had reached.  So does anything a user
+    handler wants to see: hooked instructions and addresses, any register
+    handler and memory a memory, stack or heap handler is watching.
+    
+    run() takes the same "registers", "arguments" and "memory" keys as
+    PyRunner except the register and argument values are sequences with
+    one value per lane.  Memory is shared by every lane.
+'''
+class PyVector:
+    def __init__(self, emu, start, stop, result="EAX", steps=0):
+        self.emu = emu
+        self.start = start
+        self.stop = stop
+        self.result = result.upper()
+        self.steps = steps
+        
+        self.lanes = 0
+        self.registers = None
+        self.flags = {}
+        self.memory = {}
+        self.results = []
+        
+        # Lanes finished on the scalar cpu
+        self.escapes = 0
+        
+        self.snapshot = None
+        
+        # The instruction being stepped, the scale lives in its SIB byte
+        self.instruction = None
+        
+        if numpy:
+            self.parity = numpy.array(PyFlags.parity_lookup_table, dtype=numpy.bool_)
+    
+    #
+    # run: Runs every lane from start to stop and returns a list with the
+    #      result register of each lane (False for lanes that failed)
+    #
+    def run(self, inputs):
+        if not numpy:
+            print "[!] PyVector needs numpy"
+            
+            return False
+        
+        emu = self.emu
+        
+        lanes = 0
+        for values in inputs.get("registers", {}).values() + inputs.get("arguments", {}).values():
+            lanes = max(lanes, len(values))
+        
+        if not lanes:
+            print "[!] No lanes to run"
+            
+            return False
+        
+        for name, values in inputs.get("registers", {}).items() + inputs.get("arguments", {}).items():
+            if len(values) != lanes:
+                print "[!] %s has %d values for %d lanes" % (name, len(values), lanes)
+                
+                return False
+        
+        # Shared memory goes in before we take the starting point
+        for address, value in inputs.get("memory", {}).items():
+            if not emu.set_memory(address, value):
+                return False
+        
+        emu.set_register("EIP", self.start)
+        
+        self.snapshot = emu.snapshot()
+        
+        # Put the emulator back however we leave, a lane can fail half way
+        # through on the scalar cpu
+        try:
+            self.lanes = lanes
+            self.memory = {}
+            self.results = [False] * lanes
+            self.escapes = 0
+            
+            # Everything starts out as the current scalar state
+            self.registers = numpy.empty((8, lanes), dtype=numpy.uint64)
+            for register in range(8):
+                self.registers[register] = emu.cpu.registers[register]
+            
+            for flag in flag_names:
+                self.flags[flag] = numpy.zeros(lanes, dtype=numpy.bool_) | bool(getattr(emu.cpu, flag))
+            
+            for register, values in inputs.get("registers", {}).items():
+                register = register.upper()
+                if register not in register_names:
+                    print "[!] Can only set 32 bit registers per lane not %s" % register
+                    
+                    return False
+                
+                self.registers[register_names.index(register)] = numpy.array(values, dtype=numpy.uint64) & 0xffffffff
+            
+            everyone = numpy.arange(lanes)
+            
+            for offset, values in inputs.get("arguments", {}).items():
+                if emu.frame_pointer:
+                    address = emu.cpu.get_register32("EBP") + offset
+                else:
+                    address = emu.cpu.get_register32("ESP") + offset
+                
+                self.write_memory(address, numpy.array(values, dtype=numpy.uint64) & 0xffffffff, 4, everyone)
+            
+            # Groups of lanes waiting at an address, we always run the lowest
+            # address next so lanes leaving a loop wait for the stragglers
+            groups = {self.start: everyone}
+            executed = 0
+            
+            while groups:
+                address = min(groups)
+                group = groups.pop(address)
+                
+                if address == self.stop:
+                    values = self.get_register(register_names.index(self.result), 4, group)
+                    for lane, value in zip(group, values):
+                        self.results[lane] = int(value)
+                    
+                    continue
+                
+                if self.steps and executed >= self.steps:
+                    print "[!] Ran out of steps with %d lanes @ %x" % (len(group), address)
+                    
+                    continue
+                
+                executed += 1
+                
+                instruction = emu.cpu.fetch(address)
+                try:
+                    if not instruction:
+                        raise PyVectorEscape()
+                    
+                    targets = self.step(address, instruction, group)
+                except PyVectorEscape:
+                    self.escape(address, group)
+                    
+                    continue
+                
+                for target, lanes in targets:
+                    if not len(lanes):
+                        continue
+                    
+                    if target in groups:
+                        groups[target] = numpy.concatenate((groups[target], lanes))
+                    else:
+                        groups[target] = lanes
+        finally:
+            emu.restore(self.snapshot)
+        
+        return self.results
+    
+    #
+    # escape: Finishes a group of lanes on the scalar cpu one lane at a time
+    #
+    def escape(self, address, group):
+        emu = self.emu
+        
+        for lane in group:
+            emu.restore(self.snapshot)
+            
+            for location, values in self.memory.items():
+                emu.set_memory(location, int(values[lane]), 1)
+            
+            for register in range(8):
+                emu.cpu.registers[register] = int(self.registers[register][lane])
+            
+            for flag in flag_names:
+                setattr(emu.cpu, flag, int(self.flags[flag][lane]))
+            
+            emu.set_register("EIP", address)
+            
+            if self.steps:
+                result = emu.execute(steps=self.steps, end=self.stop)
+            else:
+                result = emu.execute(end=self.stop)
+            
+            if result:
+                self.results[lane] = emu.get_register(self.result)
+            
+            self.escapes += 1
+        
+        return True
+    
+    #
+    # step: Executes one instruction on a group of lanes and returns a list
+    #       of (address, lanes) pairs saying where each lane goes next
+    #
+    def step(self, address, instruction, group):
+        if instruction.prefix or instruction.operand_so() or instruction.address_so():
+            raise PyVectorEscape()
+        
+        # Hooked instructions and anything a register handler could see
+        # go to the scalar cpu which calls the handlers
+        if self.emu.register_handlers or instruction.hooked or instruction.pc_hooked or address in self.emu.pc_handlers:
+            raise PyVectorEscape()
+        
+        self.instruction = instruction
+        
+        mnemonic = instruction.mnemonic.lower()
+        opcode = instruction.opcode
+        nextaddress = (address + instruction.length) & 0xffffffff
+        
+        op1 = instruction.op1
+        op2 = instruction.op2
+        
+        if opcode in byte_opcodes:
+            size = 1
+        else:
+            size = 4
+        
+        if mnemonic in arithmetic:
+            destination = self.locate(op1, group)
+            
+            op1value = self.read(destination, size, group)
+            op2value = self.get_operand(op2, size, group)
+            
+            result = self.arithmetic(arithmetic[mnemonic], op1value, op2value, size, group)
+            
+            if mnemonic not in ("cmp", "test"):
+                self.write(destination, result, size, group)
+        
+        elif mnemonic in ("inc", "dec"):
+            destination = self.locate(op1, group)
+            
+            op1value = self.read(destination, size, group)
+            
+            if mnemonic == "inc":
+                result = (op1value + 1) & self.get_mask(size)
+                overflow = result == self.get_sign(size)
+                adjust = (result & 0xf) == 0
+            else:
+                result = (op1value + self.get_mask(size)) & self.get_mask(size)
+                overflow = result == self.get_sign(size) - 1
+                adjust = (result & 0xf) == 0xf
+            
+            # INC and DEC leave CF alone
+            self.set_flags(group, result, size, OF=overflow, AF=adjust)
+            
+            self.write(destination, result, size, group)
+        
+        elif mnemonic in shifts:
+            destination = self.locate(op1, group)
+            
+            op1value = self.read(destination, size, group)
+            
+            # D0 and D1 shift by one and have no second operand
+            if opcode in (0xd0, 0xd1):
+                count = numpy.ones(len(group), dtype=numpy.uint64)
+            else:
+                count = self.get_operand(op2, 1, group) & 0x1f
+            
+            result = self.shift(mnemonic, op1value, count, size, group)
+            
+            self.write(destination, result, size, group)
+        
+        elif mnemonic == "imul":
+            # Only the two and three operand forms write one register
+            if opcode == 0xaf:
+                op1value = self.get_operand(op1, size, group)
+                op2value = self.get_operand(op2, size, group)
+            elif opcode in (0x69, 0x6b):
+                op1value = self.get_operand(op2, size, group)
+                op2value = self.get_operand(instruction.op3, size, group)
+            else:
+                raise PyVectorEscape()
+            
+            product = self.get_signed(op1value, size) * self.get_signed(op2value, size)
+            result = product.astype(numpy.uint64) & self.get_mask(size)
+            
+            overflow = product != self.get_signed(result, size)
+            
+            self.set_flags(group, result, size, CF=overflow, OF=overflow)
+            
+            self.write(self.locate(op1, group), result, size, group)
+        
+        elif mnemonic == "mov":
+            if opcode not in (0x88, 0x89, 0x8a, 0x8b, 0xc6, 0xc7) and not 0xb0 <= opcode <= 0xbf:
+                raise PyVectorEscape()
+            
+            destination = self.locate(op1, group)
+            
+            self.write(destination, self.get_operand(op2, size, group), size, group)
+        
+        elif mnemonic == "movzx":
+            if opcode == 0xb6:
+                result = self.get_operand(op2, 1, group)
+            else:
+                result = self.get_operand(op2, 2, group)
+            
+            self.write(self.locate(op1, group), result, 4, group)
+        
+        elif mnemonic == "lea":
+            if op2.type != pydasm.OPERAND_TYPE_MEMORY:
+                raise PyVectorEscape()
+            
+            self.write(self.locate(op1, group), self.get_address(op2, group), 4, group)
+        
+        elif mnemonic.startswith("set") and 0x90 <= opcode <= 0x9f:
+            result = self.condition(opcode & 0xf, group).astype(numpy.uint64)
+            
+            self.write(self.locate(op1, group), result, 1, group)
+        
+        elif mnemonic.startswith("j") and (0x70 <= opcode <= 0x7f or 0x80 <= opcode <= 0x8f):
+            taken = self.condition(opcode & 0xf, group)
+            target = (nextaddress + op1.immediate) & 0xffffffff
+            
+            return [(target, group[taken]), (nextaddress, group[~taken])]
+        
+        elif mnemonic == "jmp":
+            if opcode in (0xe9, 0xeb):
+                return [((nextaddress + op1.immediate) & 0xffffffff, group)]
+            
+            return self.split(self.get_operand(op1, 4, group), group)
+        
+        elif mnemonic == "call":
+            if opcode == 0xe8:
+                targets = [((nextaddress + op1.immediate) & 0xffffffff, group)]
+            else:
+                targets = self.split(self.get_operand(op1, 4, group), group)
+            
+            self.push(numpy.zeros(len(group), dtype=numpy.uint64) + nextaddress, group)
+            
+            return targets
+        
+        elif mnemonic in ("ret", "retn"):
+            stack = self.get_uniform(self.registers[4][group])
+            
+            targets = self.split(self.read_memory(stack, 4, group), group)
+            
+            adjust = 4
+            if opcode == 0xc2:
+                adjust += op1.immediate & 0xffff
+            
+            self.registers[4][group] = (stack + adjust) & 0xffffffff
+            
+            return targets
+        
+        elif mnemonic == "push":
+            if 0x50 <= opcode <= 0x57:
+                value = self.get_register(opcode - 0x50, 4, group)
+            elif opcode in (0x68, 0x6a, 0xff):
+                value = self.get_operand(op1, 4, group)
+            else:
+                raise PyVectorEscape()
+            
+            self.push(value, group)
+        
+        elif mnemonic == "pop":
+            if not 0x58 <= opcode <= 0x5f:
+                raise PyVectorEscape()
+            
+            stack = self.get_uniform(self.registers[4][group])
+            
+            value = self.read_memory(stack, 4, group)
+            
+            self.registers[4][group] = (stack + 4) & 0xffffffff
+            self.set_register(opcode - 0x58, value, 4, group)
+        
+        elif mnemonic == "nop":
+            pass
+        
+        else:
+            raise PyVectorEscape()
+        
+        return [(nextaddress, group)]
+    
+    #
+    # split: Groups lanes by a computed jump target
+    #
+    def split(self, targets, group):
+        result = []
+        for target in numpy.unique(targets):
+            result.append((int(target), group[targets == target]))
+        
+        return result
+    
+    #
+    # arithmetic: Computes an ALU result and its flags for every lane,
+    #             the formulas are the same ones PyFlags uses
+    #
+    def arithmetic(self, mnemonic, op1, op2, size, group):
+        mask = self.get_mask(size)
+        sign = self.get_sign(size)
+        
+        if mnemonic == "ADD":
+            result = (op1 + op2) & mask
+            
+            carry = result < op1
+            overflow = (~(op1 ^ op2) & (op2 ^ result) & sign) != 0
+            adjust = ((op1 ^ op2 ^ result) & 0x10) != 0
+            
+            self.set_flags(group, result, size, CF=carry, OF=overflow, AF=adjust)
+        elif mnemonic in ("SUB", "CMP"):
+            result = (op1 + (mask + 1) - op2) & mask
+            
+            carry = op1 < op2
+            overflow = ((op1 ^ op2) & (op1 ^ result) & sign) != 0
+            adjust = ((op1 ^ op2 ^ result) & 0x10) != 0
+            
+            self.set_flags(group, result, size, CF=carry, OF=overflow, AF=adjust)
+        else:
+            if mnemonic in ("AND", "TEST"):
+                result = op1 & op2
+            elif mnemonic == "OR":
+                result = op1 | op2
+            else:
+                result = op1 ^ op2
+            
+            clear = numpy.zeros(len(group), dtype=numpy.bool_)
+            
+            self.set_flags(group, result, size, CF=clear, OF=clear)
+        
+        return result
+    
+    #
+    # shift: Shifts or rotates every lane by its own count.  Lanes with a
+    #        zero count keep their value and flags.
+    #
+    def shift(self, mnemonic, op1, count, size, group):
+        mask = self.get_mask(size)
+        sign = self.get_sign(size)
+        bits = size * 8
+        
+        moved = count != 0
+        
+        # Shifting a uint64 by the full width is undefined so the
+        # counts we use are kept at least one below it
+        last = numpy.maximum(count, 1) - 1
+        
+        if mnemonic in ("shl", "sal"):
+            result = (op1 << count) & mask
+            
+            carry = numpy.where(count <= bits, (op1 << last) & sign, 0) != 0
+            overflow = (((op1 << last) ^ result) & sign) != 0
+        elif mnemonic == "shr":
+            result = op1 >> count
+            
+            carry = ((op1 >> last) & 1) != 0
+            overflow = (count == 1) & (op1 >= sign)
+        elif mnemonic == "sar":
+            result = (self.get_signed(op1, size) >> count.astype(numpy.int64)).astype(numpy.uint64) & mask
+            
+            carry = numpy.where(count < bits, (op1 >> numpy.minimum(last, bits - 1)) & 1, op1 >= sign) != 0
+            overflow = numpy.zeros(len(group), dtype=numpy.bool_)
+        else:
+            count = count % bits
+            
+            if mnemonic == "rol":
+                result = ((op1 << count) | (op1 >> (bits - count))) & mask
+                
+                carry = (result & 1) != 0
+                overflow = ((result & sign) != 0) ^ carry
+            else:
+                result = ((op1 >> count) | (op1 << (bits - count))) & mask
+                
+                carry = (result & sign) != 0
+                overflow = carry ^ ((result & (sign >> 1)) != 0)
+            
+            # Rotates only touch CF and OF
+            self.flags["CF"][group[moved]] = carry[moved]
+            self.flags["OF"][group[moved]] = overflow[moved]
+            
+            return result
+        
+        moved_group = group[moved]
+        
+        self.flags["CF"][moved_group] = carry[moved]
+        self.flags["OF"][moved_group] = overflow[moved]
+        self.flags["ZF"][moved_group] = result[moved] == 0
+        self.flags["SF"][moved_group] = result[moved] >= sign
+        self.flags["PF"][moved_group] = self.parity[(result[moved] & 0xff).astype(numpy.intp)]
+        
+        return numpy.where(moved, result, op1)
+    
+    #
+    # set_flags: Stores the result flags for a group plus any others given
+    #
+    def set_flags(self, group, result, size, **flags):
+        self.flags["ZF"][group] = result == 0
+        self.flags["SF"][group] = result >= self.get_sign(size)
+        self.flags["PF"][group] = self.parity[(result & 0xff).astype(numpy.intp)]
+        
+        for flag, value in flags.items():
+            self.flags[flag][group] = value
+        
+        return True
+    
+    #
+    # condition: Evaluates a jcc/setcc condition code for every lane
+    #
+    def condition(self, code, group):
+        flags = self.flags
+        
+        if code in (0x0, 0x1):
+            result = flags["OF"][group]
+        elif code in (0x2, 0x3):
+            result = flags["CF"][group]
+        elif code in (0x4, 0x5):
+            result = flags["ZF"][group]
+        elif code in (0x6, 0x7):
+            result = flags["CF"][group] | flags["ZF"][group]
+        elif code in (0x8, 0x9):
+            result = flags["SF"][group]
+        elif code in (0xa, 0xb):
+            result = flags["PF"][group]
+        elif code in (0xc, 0xd):
+            result = flags["SF"][group] != flags["OF"][group]
+        else:
+            result = flags["ZF"][group] | (flags["SF"][group] != flags["OF"][group])
+        
+        # Odd codes are the negated form
+        if code & 1:
+            result = ~result
+        
+        return result
+    
+    #
+    # locate: Works out where an operand lives.  Memory operands have to
+    #         be at the same address in every lane.
+    #
+    def locate(self, op, group):
+        if op.type == pydasm.OPERAND_TYPE_REGISTER:
+            return ("register", op.reg)
+        elif op.type == pydasm.OPERAND_TYPE_MEMORY:
+            return ("memory", self.get_uniform(self.get_address(op, group)))
+        
+        raise PyVectorEscape()
+    
+    #
+    # read: Fetches the value at a located operand
+    #
+    def read(self, location, size, group):
+        kind, where = location
+        
+        if kind == "register":
+            return self.get_register(where, size, group)
+        
+        return self.read_memory(where, size, group)
+    
+    #
+    # write: Stores a value at a located operand
+    #
+    def write(self, location, value, size, group):
+        kind, where = location
+        
+        if kind == "register":
+            return self.set_register(where, value, size, group)
+        
+        return self.write_memory(where, value, size, group)
+    
+    #
+    # get_operand: Returns the value of any operand for every lane
+    #
+    def get_operand(self, op, size, group):
+        if op.type == pydasm.OPERAND_TYPE_IMMEDIATE:
+            # Sign extend from the encoded width, 83 and 6b rely on this
+            value = op.immediate
+            if op.immbytes in (1, 2):
+                value &= self.get_mask(op.immbytes)
+                if value & self.get_sign(op.immbytes):
+                    value -= self.get_mask(op.immbytes) + 1
+            
+            return numpy.zeros(len(group), dtype=numpy.uint64) + (value & self.get_mask(size))
+        
+        return self.read(self.locate(op, group), size, group)
+    
+    #
+    # get_address: Computes a memory operand address for every lane
+    #
+    def get_address(self, op, group):
+        displacement = op.displacement
+        if op.dispbytes in (1, 2):
+            displacement &= self.get_mask(op.dispbytes)
+            if displacement & self.get_sign(op.dispbytes):
+                displacement -= self.get_mask(op.dispbytes) + 1
+        
+        address = numpy.zeros(len(group), dtype=numpy.uint64) + (displacement & 0xffffffff)
+        
+        if 0 <= op.basereg < 8:
+            address += self.registers[op.basereg][group]
+        if 0 <= op.indexreg < 8:
+            address += self.registers[op.indexreg][group] << (self.instruction.get_scale() or 0)
+        
+        return address & 0xffffffff
+    
+    #
+    # get_uniform: Returns the one value every lane agrees on or escapes
+    #
+    def get_uniform(self, values):
+        value = values[0]
+        if (values != value).any():
+            raise PyVectorEscape()
+        
+        return int(value)
+    
+    #
+    # get_register: Returns a register for every lane in the group
+    #
+    def get_register(self, register, size, group):
+        # AH, CH, DH and BH
+        if size == 1 and register >= 4:
+            return (self.registers[register - 4][group] >> 8) & 0xff
+        
+        return self.registers[register][group] & self.get_mask(size)
+    
+    #
+    # set_register: Stores a register for every lane in the group
+    #
+    def set_register(self, register, value, size, group):
+        if size == 4:
+            self.registers[register][group] = value
+        elif size == 1 and register >= 4:
+            register -= 4
+            self.registers[register][group] = (self.registers[register][group] & 0xffff00ff) | (value << 8)
+        else:
+            self.registers[register][group] = (self.registers[register][group] & (0xffffffff ^ self.get_mask(size))) | value
+        
+        return True
+    
+    #
+    # read_memory: Reads little endian memory at one address for every
+    #              lane, bytes a lane has written come from the overlay
+    #
+    def read_memory(self, address, size, group):
+        # Memory, stack and heap handlers only run on the scalar cpu
+        if self.emu.cpu.watched(address, size):
+            raise PyVectorEscape()
+        
+        value = numpy.zeros(len(group), dtype=numpy.uint64)
+        
+        for x in range(size):
+            location = (address + x) & 0xffffffff
+            
+            if location in self.memory:
+                value |= self.memory[location][group].astype(numpy.uint64) << (8 * x)
+            else:
+                byte = self.emu.get_memory(location, 1)
+                if byte is False or byte is None:
+                    raise PyVectorEscape()
+                
+                value |= byte << (8 * x)
+        
+        return value
+    
+    #
+    # write_memory: Writes little endian memory at one address for every
+    #               lane into the overlay
+    #
+    def write_memory(self, address, value, size, group):
+        if self.emu.cpu.watched(address, size):
+            raise PyVectorEscape()
+        
+        for x in range(size):
+            location = (address + x) & 0xffffffff
+            
+            if location not in self.memory:
+                byte = self.emu.get_memory(location, 1)
+                if byte is False or byte is None:
+                    raise PyVectorEscape()
+                
+                self.memory[location] = numpy.zeros(self.lanes, dtype=numpy.uint8) + byte
+            
+            self.memory[location][group] = (value >> (8 * x)) & 0xff
+        
+        return True
+    
+    #
+    # push: Pushes a dword for every lane, the stack has to line up
+    #
+    def push(self, value, group):
+        stack = (self.get_uniform(self.registers[4][group]) - 4) & 0xffffffff
+        
+        self.write_memory(stack, value, 4, group)
+        
+        self.registers[4][group] = stack
+        
+        return True
+    
+    def get_mask(self, size):
+        return (1 << (size * 8)) - 1
+    
+    def get_sign(self, size):
+        return 1 << (size * 8 - 1)
+    
+    #
+    # get_signed: Converts lane values to signed int64
+    #
+    def get_signed(self, value, size):
+        value = value.astype(numpy.int64)
+        
+        return numpy.where(value >= self.get_sign(size), value - (self.get_mask(size) + 1), value)
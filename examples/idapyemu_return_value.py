@@ -24,8 +24,9 @@ def my_ret_handler(emu, address):
     
     print "[*] Returning %x: %x, %x, %x = %x" % (address, value1, value2, value3, emu.get_register("EAX"))
 
+    # Throw away anything the function changed, including EIP
+    emu.restore(start)
     reset_stack(emu, value1 + 1, value2 + 2, value3 + 3)
-    emu.set_register("EIP", ScreenEA())
     
     count += 1
         
@@ -63,6 +64,9 @@ emu.set_register("EIP", ScreenEA())
 # This sets our stack values for the function
 reset_stack(emu, 0x00000000, 0x00000001, 0x00000002)
 
+# Save the state at the start of the function so every run begins clean
+start = emu.snapshot()
+
 # Set up our memory access handler
 emu.set_mnemonic_handler("ret", my_ret_handler)
 
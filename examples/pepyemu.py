@@ -37,31 +37,12 @@ print "[*] Code Base Addr:   0x%08x" % (codebase)
 print "[*] Data Base Addr:   0x%08x" % (database)
 print "[*] Entry Point Addr: 0x%08x\n" % (entrypoint)
 
-for section in pe.sections:
-    if section.Name.startswith(".text"):
-        textsection = section
-    elif section.Name.startswith(".data"):
-        datasection = section
+print "[*] Mapping %s into memory" % (exename)
 
-emu = PEPyEmu()
+# Sections are paged in from the file as they are touched
+emu = PEPyEmu(filename=exename)
 
-print "[*] Loading text section bytes into memory"
-        
-for x in range(len(textsection.data)):
-    c = textsection.data[x]
-    
-    emu.set_memory(codebase + x, int(ord(c)), size=1)
-
-print "[*] Text section loaded into memory"
-
-print "[*] Loading data section bytes into memory"
-        
-for x in range(len(datasection.data)):
-    c = datasection.data[x]
-    
-    emu.set_memory(database + x, int(ord(c)), size=1)
-
-print "[*] Data section loaded into memory\n"
+print "[*] Image mapped into memory\n"
 
 emu.set_register("EIP", address)
 
@@ -1,9 +1,28 @@
+import sys, types
+
 from parse import parse
-from data import table
+from data import table as source
 from utils import prop
 
-# pre-parse all of our tables
-table = dict([(k,parse(v)) for k,v in table.items()])
+# the parsed tables, only decode() below needs them so they're parsed the
+# first time it runs or the first time someone reads ia32.table, optable or
+# prefix. the decoder in dasm uses the flattened ones that tables.py keeps
+# in opcodes.marshal
+table = optable = prefix = None
+
+def load():
+    '''parse all of our tables'''
+    global table, optable, prefix
+    if table is not None:
+        return table
+
+    table = dict([(k,parse(v)) for k,v in source.items()])
+
+    ### quick lookup tables
+    optable = table['opcode_1']
+    optable = dict([ (i, v) for i,v in zip(range(len(optable)), optable) ])
+    prefix = [k for k,v in optable.items() if v[0] == ':' ]
+    return table
 
 def sib(val):
     "(scale, index, base)"
@@ -13,14 +32,10 @@ def sib(val):
 modrm=sib
 modrm.__doc__ = "mod / reg / r/m"
 
-### quick lookup tables
-optable = table['opcode_1']
-optable = dict([ (i, v) for i,v in zip(range(len(optable)), optable) ])
-prefix = [k for k,v in optable.items() if v[0] == ':' ]
-
 ###
 def decode(s):
     '''given an iterable s, return the next valid instruction'''
+    load()
     s = iter(s)
     size = 0
     keys = 'prefix opcode modrm sib disp imm size'.split(' ')
@@ -89,6 +104,22 @@ def decode(s):
     res['size'] = size
     return res
 
+class lazy(types.ModuleType):
+    '''this package, parsing the tables when one of them is first read'''
+    def __getattr__(self, name):
+        if name in ('table', 'optable', 'prefix'):
+            load()
+            return globals()[name]
+        raise AttributeError(name)
+
+if __name__ != '__main__':
+    module = lazy(__name__, __doc__)
+    module.__dict__.update([(k,v) for k,v in globals().items() if k not in ('table', 'optable', 'prefix')])
+
+    # hold on to the real module so its globals aren't cleared
+    module.module = sys.modules[__name__]
+    sys.modules[__name__] = module
+
 if __name__ == '__main__':
     def hex(num):
         return '%x'% num
@@ -0,0 +1,591 @@
+## a pure python stand in for pydasm (the python binding of libdasm).
+## instructions are decoded straight out of a buffer at an offset using the
+## flattened tables from data.py, and come back with the same fields pydasm
+## gives so PyInstruction can't tell the difference.
+
+import struct, array
+
+from tables import load, INSN, PREFIX, ESCAPE, GROUP, RMTABLE, MODRM_REG
+from tables import E, G, M, R, I, J, O, A, S, C, D, P, Q, N, V, W, U, X, Y
+from tables import REG, SEG, CONST, ST, STI, SIZE_V, SIZE_P, SIZE_A
+
+MODE_32 = 0
+MODE_16 = 1
+
+# only the intel syntax is produced, the att constant is for compatibility
+FORMAT_ATT = 0
+FORMAT_INTEL = 1
+
+OPERAND_TYPE_NONE = 0
+OPERAND_TYPE_MEMORY = 1
+OPERAND_TYPE_REGISTER = 2
+OPERAND_TYPE_IMMEDIATE = 3
+
+# base and index of a memory operand that doesn't use one
+REGISTER_NOP = 8
+
+# the one byte opcode table, everything else hangs off it
+opcodes = load()
+
+# (base, index) of each 16 bit modrm.rm
+modrm16 = ((3, 6), (3, 7), (5, 6), (5, 7), (6, 8), (7, 8), (5, 8), (3, 8))
+
+# how pydasm spells the group 1 prefixes in front of the mnemonic
+group1_names = {0x01000000: 'lock ', 0x02000000: 'repne ', 0x03000000: 'rep '}
+
+unpack_word = struct.Struct('<H').unpack_from
+unpack_dword = struct.Struct('<I').unpack_from
+
+class operand(object):
+    '''an operand, unset fields fall back to the class'''
+    type = OPERAND_TYPE_NONE
+    reg = 0
+    basereg = REGISTER_NOP
+    indexreg = REGISTER_NOP
+    scale = 0
+    dispbytes = 0
+    dispoffset = 0
+    immbytes = 0
+    immoffset = 0
+    sectionbytes = 0
+    section = 0
+    displacement = 0
+    immediate = 0
+    flags = 0
+
+    # table kind and size in bytes, for printing
+    kind = 0
+    size = 0
+
+# shared by every missing operand
+none = operand()
+
+class instruction(object):
+    '''a decoded instruction, same fields as pydasm'''
+    length = 0
+    type = 0
+    mode = MODE_32
+    opcode = 0
+    modrm = 0
+    sib = 0
+    extindex = 0
+    fpuindex = 0
+    dispbytes = 0
+    immbytes = 0
+    sectionbytes = 0
+    flags = 0
+    op1 = none
+    op2 = none
+    op3 = none
+
+    mnemonic = ''
+    prefix = ''
+
+def immediate(data, offset, size, signed):
+    '''reads a little endian immediate, signed ones are extended to 32 bits'''
+    if size == 1:
+        value = ord(data[offset])
+        if signed and value & 0x80:
+            value |= 0xffffff00
+    elif size == 2:
+        value = unpack_word(data, offset)[0]
+        if signed and value & 0x8000:
+            value |= 0xffff0000
+    else:
+        value = unpack_dword(data, offset)[0]
+    return value
+
+def decode(data, offset=0, mode=MODE_32):
+    '''decodes the instruction at data[offset], None if it isn't valid'''
+    start = offset
+    flags = 0
+
+    entry = opcodes[ord(data[offset])]
+    while entry and entry[0] == PREFIX:
+        flags = (flags & ~entry[1]) | entry[2]
+        offset += 1
+        if offset - start > 14:
+            return None
+        entry = opcodes[ord(data[offset])]
+
+    opcode = ord(data[offset])
+    offset += 1
+    while entry and entry[0] == ESCAPE:
+        opcode = ord(data[offset])
+        offset += 1
+        entry = entry[1][opcode]
+
+    if not entry:
+        return None
+
+    insn = instruction()
+    insn.mode = mode
+    insn.opcode = opcode
+
+    # modrm and whatever memory operand it describes
+    modrm = mod = rm = 0
+    memory = entry[1]
+    if memory:
+        modrm = ord(data[offset])
+        offset += 1
+        mod = modrm >> 6
+        rm = modrm & 7
+        insn.modrm = modrm
+
+        if entry[0] == GROUP:
+            insn.extindex = (modrm >> 3) & 7
+            entry = entry[2][insn.extindex | (mod == 3) << 3]
+            if entry and entry[0] == RMTABLE:
+                entry = entry[1][rm]
+            if not entry:
+                return None
+
+        memory = mod != 3 and entry[1] != MODRM_REG
+
+    osize = (mode == MODE_16) != bool(flags & 0x100) and 2 or 4
+    asize = (mode == MODE_16) != bool(flags & 0x1000) and 2 or 4
+
+    # pick an alternative by prefix, mod and size
+    mnemonic = entry[2]
+    operands = entry[3]
+    mandatory = 0
+    if entry[4]:
+        group1 = flags & 0xff000000
+        if group1 == 0x03000000:
+            key = 0xf3
+        elif group1 == 0x02000000:
+            key = 0xf2
+        elif flags & 0x100:
+            key = 0x66
+        else:
+            key = 0
+
+        for alternative in entry[4]:
+            if alternative[0] != -1 and alternative[0] != key:
+                continue
+            if alternative[1] != -1 and (alternative[1] == 3) != (mod == 3):
+                continue
+            if alternative[2] != -1 and alternative[2] != osize:
+                continue
+            if alternative[3] != -1 and alternative[3] != asize:
+                continue
+
+            mandatory = alternative[0]
+            mnemonic = alternative[4]
+            operands = alternative[5]
+            break
+        else:
+            return None
+
+        if not mnemonic:
+            return None
+
+        # the prefix picked the instruction, it doesn't change the size
+        if mandatory == 0x66:
+            osize = mode == MODE_16 and 2 or 4
+
+    insn.mnemonic = mnemonic
+
+    group1 = flags & 0xff000000
+    if group1 and mandatory not in (0xf2, 0xf3):
+        insn.prefix = group1_names[group1]
+
+    # the memory operand, decoded once for whichever operand uses it
+    basereg = indexreg = REGISTER_NOP
+    scale = displacement = dispbytes = dispoffset = 0
+    if memory:
+        if asize == 4:
+            if rm == 4:
+                sib = ord(data[offset])
+                offset += 1
+                insn.sib = sib
+
+                index = (sib >> 3) & 7
+                if index != 4:
+                    indexreg = index
+                    scale = 1 << (sib >> 6)
+
+                if sib & 7 == 5 and mod == 0:
+                    dispbytes = 4
+                else:
+                    basereg = sib & 7
+            elif rm == 5 and mod == 0:
+                dispbytes = 4
+            else:
+                basereg = rm
+
+            if mod == 1:
+                dispbytes = 1
+            elif mod == 2:
+                dispbytes = 4
+        else:
+            basereg, indexreg = modrm16[rm]
+            if indexreg != REGISTER_NOP:
+                scale = 1
+
+            if mod == 0 and rm == 6:
+                basereg = REGISTER_NOP
+                dispbytes = 2
+            elif mod == 1:
+                dispbytes = 1
+            elif mod == 2:
+                dispbytes = 2
+
+        if dispbytes:
+            dispoffset = offset - start
+            displacement = immediate(data, offset, dispbytes, dispbytes == 1)
+            offset += dispbytes
+
+    reg = (modrm >> 3) & 7
+    immbytes = 0
+    ops = []
+    for kind, size, extra in operands:
+        op = operand()
+        op.kind = kind
+
+        if size < 0:
+            if size == SIZE_V:
+                size = osize
+            elif size == SIZE_P:
+                size = osize + 2
+            else:
+                size = osize * 2
+        op.size = size
+
+        if kind == E or kind == M or kind == Q or kind == W:
+            if mod == 3:
+                op.type = OPERAND_TYPE_REGISTER
+                op.reg = rm
+            else:
+                op.type = OPERAND_TYPE_MEMORY
+                op.basereg = basereg
+                op.indexreg = indexreg
+                op.scale = scale
+                op.dispbytes = dispbytes
+                op.dispoffset = dispoffset
+                op.displacement = displacement
+        elif kind == G or kind == V or kind == P or kind == S or kind == C or kind == D:
+            op.type = OPERAND_TYPE_REGISTER
+            op.reg = reg
+        elif kind == I or kind == J:
+            if kind == J:
+                extra = 1
+            op.type = OPERAND_TYPE_IMMEDIATE
+            op.immbytes = size
+            op.immoffset = offset - start
+            op.immediate = immediate(data, offset, size, extra)
+            offset += size
+            immbytes += size
+        elif kind == REG or kind == SEG or kind == ST:
+            op.type = OPERAND_TYPE_REGISTER
+            op.reg = extra
+        elif kind == N or kind == U or kind == R or kind == STI:
+            op.type = OPERAND_TYPE_REGISTER
+            op.reg = rm
+        elif kind == O:
+            op.type = OPERAND_TYPE_MEMORY
+            op.dispbytes = dispbytes = asize
+            op.dispoffset = offset - start
+            op.displacement = immediate(data, offset, asize, 0)
+            offset += asize
+        elif kind == X or kind == Y:
+            op.type = OPERAND_TYPE_MEMORY
+            op.basereg = kind == X and 6 or 7
+        elif kind == CONST:
+            op.type = OPERAND_TYPE_IMMEDIATE
+            op.immediate = extra
+        elif kind == A:
+            op.type = OPERAND_TYPE_IMMEDIATE
+            op.immbytes = size - 2
+            op.immoffset = offset - start
+            op.immediate = immediate(data, offset, size - 2, 0)
+            op.sectionbytes = insn.sectionbytes = 2
+            op.section = unpack_word(data, offset + size - 2)[0]
+            offset += size
+            immbytes += size - 2
+
+        ops.append(op)
+
+    length = offset - start
+    if length > 15:
+        return None
+
+    if ops:
+        insn.op1 = ops[0]
+        if len(ops) > 1:
+            insn.op2 = ops[1]
+            if len(ops) > 2:
+                insn.op3 = ops[2]
+
+    insn.length = length
+    insn.flags = flags
+    insn.dispbytes = dispbytes
+    insn.immbytes = immbytes
+
+    return insn
+
+def get_instruction(data, mode=MODE_32, offset=0):
+    '''pydasm.get_instruction, returns None for anything we can't decode'''
+    try:
+        return decode(data, offset, mode)
+    except (IndexError, struct.error):
+        return None
+
+def get_mnemonic_string(instruction, format=FORMAT_INTEL):
+    '''the mnemonic with any lock/rep prefix, like pydasm'''
+    return instruction.prefix + instruction.mnemonic
+
+## lengths only. most 32 bit code has no prefixes, so the length of those
+## instructions is looked up by opcode and modrm in tables built from the
+## same flattened opcodes, anything else goes through decode().
+
+# (fixed, bymodrm) for one and two byte opcodes, built on first use
+lengths = None
+
+def operand_bytes(operands):
+    '''bytes of immediates and offsets after the modrm in 32 bit mode'''
+    res = 0
+    for kind, size, extra in operands:
+        if kind == I or kind == J or kind == A:
+            if size == SIZE_V:
+                size = 4
+            elif size == SIZE_P:
+                size = 6
+            res += size
+        elif kind == O:
+            res += 4
+    return res
+
+def unprefixed(entry, mod):
+    '''the operands decode() picks with no prefixes, None if it's invalid'''
+    if not entry[4]:
+        return entry[3]
+
+    for alternative in entry[4]:
+        if alternative[0] > 0 or alternative[2] == 2 or alternative[3] == 2:
+            continue
+        if alternative[1] != -1 and (alternative[1] == 3) != (mod == 3):
+            continue
+        if alternative[4]:
+            return alternative[5]
+        return None
+    return None
+
+def modrm_lengths(entry, size):
+    '''instruction length by modrm byte, -length when a sib follows and 0
+    when decode() has to look at it'''
+    res = []
+    for modrm in range(256):
+        mod = modrm >> 6
+        rm = modrm & 7
+
+        insn = entry
+        if entry[0] == GROUP:
+            insn = entry[2][(modrm >> 3) & 7 | (mod == 3) << 3]
+            if insn and insn[0] == RMTABLE:
+                insn = insn[1][rm]
+        operands = insn and unprefixed(insn, mod)
+        if operands is None:
+            res.append(0)
+            continue
+
+        length = size + 1 + operand_bytes(operands)
+        if mod == 3 or insn[1] == MODRM_REG:
+            res.append(length)
+        elif rm == 4:
+            res.append(-(length + 1 + (0, 1, 4)[mod]))
+        else:
+            res.append(length + (rm == 5 and 4, 1, 4)[mod])
+    return tuple(res)
+
+def build_lengths(table, size):
+    fixed = [0] * 256
+    bymodrm = [None] * 256
+    shared = {}
+    for opcode, entry in enumerate(table):
+        if not entry or entry[0] not in (INSN, GROUP):
+            continue
+
+        if entry[0] == INSN and not entry[1]:
+            operands = unprefixed(entry, 0)
+            if operands is not None:
+                fixed[opcode] = size + operand_bytes(operands)
+            continue
+
+        # most plain instructions share a handful of tables
+        key = entry[0] == INSN and not entry[4] and (entry[1], operand_bytes(entry[3])) or opcode
+        if key not in shared:
+            shared[key] = modrm_lengths(entry, size)
+        bymodrm[opcode] = shared[key]
+    return fixed, bymodrm
+
+def get_lengths():
+    global lengths
+    if lengths is None:
+        lengths = build_lengths(opcodes, 1) + build_lengths(opcodes[0x0f][1], 2)
+    return lengths
+
+def get_length(data, offset=0, mode=MODE_32):
+    '''the length of the instruction at data[offset], 0 if it isn't valid'''
+    insn = get_instruction(data, mode, offset)
+    return insn and insn.length or 0
+
+def get_offsets(data, start=0, end=None, mode=MODE_32):
+    '''the offsets of the instructions in a linear sweep of data[start:end].
+    bytes that don't decode are stepped over one at a time, an instruction
+    that runs past end stops the sweep'''
+    if end is None:
+        end = len(data)
+    res = array.array('L')
+    append = res.append
+
+    offset = start
+    if mode == MODE_32:
+        fixed, bymodrm, fixed0f, bymodrm0f = get_lengths()
+        code = bytearray(data)
+
+        # close enough to the end that the tables could read past it
+        limit = end - 16
+        while offset < limit:
+            opcode = code[offset]
+            if opcode == 0x0f:
+                opcode = code[offset + 1]
+                length = fixed0f[opcode]
+                if not length:
+                    modrm = bymodrm0f[opcode]
+                    if modrm:
+                        length = modrm[code[offset + 2]]
+                        if length < 0:
+                            length = -length
+                            if code[offset + 3] & 7 == 5 and code[offset + 2] < 0x40:
+                                length += 4
+            else:
+                length = fixed[opcode]
+                if not length:
+                    modrm = bymodrm[opcode]
+                    if modrm:
+                        length = modrm[code[offset + 1]]
+                        if length < 0:
+                            length = -length
+                            if code[offset + 2] & 7 == 5 and code[offset + 1] < 0x40:
+                                length += 4
+
+            if not length:
+                insn = get_instruction(data, mode, offset)
+                if not insn:
+                    offset += 1
+                    continue
+                length = insn.length
+
+            append(offset)
+            offset += length
+
+    while offset < end:
+        insn = get_instruction(data, mode, offset)
+        if not insn:
+            offset += 1
+            continue
+        if offset + insn.length > end:
+            break
+
+        append(offset)
+        offset += insn.length
+
+    return res
+
+## printing
+
+class names:
+    r8 = 'al cl dl bl ah ch dh bh'.split(' ')
+    r16 = 'ax cx dx bx sp bp si di'.split(' ')
+    r32 = 'eax ecx edx ebx esp ebp esi edi'.split(' ')
+    mm = 'mm0 mm1 mm2 mm3 mm4 mm5 mm6 mm7'.split(' ')
+    xmm = 'xmm0 xmm1 xmm2 xmm3 xmm4 xmm5 xmm6 xmm7'.split(' ')
+    sreg = 'es cs ss ds fs gs res1 res2'.split(' ')
+    cr = 'cr0 cr1 cr2 cr3 cr4 cr5 cr6 cr7'.split(' ')
+    dr = 'dr0 dr1 dr2 dr3 dr4 dr5 dr6 dr7'.split(' ')
+    st = ['st(%d)' % i for i in range(8)]
+    ptr = {1: 'byte', 2: 'word', 4: 'dword', 6: 'fword', 8: 'qword', 10: 'tword', 16: 'dqword'}
+
+def get_register_string(op):
+    kind = op.kind
+    if kind in (S, SEG):
+        return names.sreg[op.reg]
+    if kind == C:
+        return names.cr[op.reg]
+    if kind == D:
+        return names.dr[op.reg]
+    if kind in (P, N, Q):
+        return names.mm[op.reg]
+    if kind in (V, U, W):
+        return names.xmm[op.reg]
+    if kind in (ST, STI):
+        return names.st[op.reg]
+    if op.size == 1:
+        return names.r8[op.reg]
+    if op.size == 2:
+        return names.r16[op.reg]
+    return names.r32[op.reg]
+
+def get_memory_string(instruction, op, size):
+    registers = instruction.flags & 0x1000 and names.r16 or names.r32
+    if instruction.mode == MODE_16:
+        registers = instruction.flags & 0x1000 and names.r32 or names.r16
+
+    parts = []
+    if op.basereg != REGISTER_NOP:
+        parts.append(registers[op.basereg])
+    if op.indexreg != REGISTER_NOP:
+        if op.scale > 1:
+            parts.append('%s*%d' % (registers[op.indexreg], op.scale))
+        else:
+            parts.append(registers[op.indexreg])
+
+    res = '+'.join(parts)
+    displacement = op.displacement
+    if op.dispbytes:
+        bits = op.dispbytes * 8
+        displacement &= (1 << bits) - 1
+        if not parts:
+            res = '0x%x' % displacement
+        elif displacement & (1 << (bits - 1)):
+            res += '-0x%x' % ((1 << bits) - displacement)
+        elif displacement:
+            res += '+0x%x' % displacement
+
+    segment = (instruction.flags >> 16) & 0xff
+    if segment:
+        res = '%s:[%s]' % (names.sreg[segment - 1], res)
+    else:
+        res = '[%s]' % res
+
+    if size and op.size in names.ptr:
+        res = '%s %s' % (names.ptr[op.size], res)
+    return res
+
+def get_operand_string(instruction, op, offset=0):
+    if op.type == OPERAND_TYPE_REGISTER:
+        return get_register_string(op)
+
+    if op.type == OPERAND_TYPE_MEMORY:
+        # the size is only spelled out when no register gives it away
+        size = OPERAND_TYPE_REGISTER not in (instruction.op1.type, instruction.op2.type, instruction.op3.type)
+        return get_memory_string(instruction, op, size)
+
+    if op.type == OPERAND_TYPE_IMMEDIATE:
+        if op.kind == J:
+            return '0x%x' % ((offset + instruction.length + op.immediate) & 0xffffffff)
+        if op.kind == A:
+            return '0x%x:0x%x' % (op.section, op.immediate)
+        return '0x%x' % op.immediate
+
+    return ''
+
+def get_instruction_string(instruction, format=FORMAT_INTEL, offset=0):
+    '''pydasm.get_instruction_string, jump targets are relative to offset'''
+    operands = []
+    for op in (instruction.op1, instruction.op2, instruction.op3):
+        if op.type:
+            operands.append(get_operand_string(instruction, op, offset))
+
+    return '%s %s' % (get_mnemonic_string(instruction, format), ','.join(operands))
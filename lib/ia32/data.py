@@ -1,13 +1,29 @@
 ## ia32 opcode tables - thx to sandpile.org and a little bit of alcohol
 ## (that also means that this potentially will contain errors)
 
+## notation:
+##  one row per opcode (or per modrm.reg in the group tables), in order
+##  "-" is an invalid opcode
+##  "xx:" is a prefix, ">table" continues decoding in another table
+##  a mnemonic naming another table is a group, its operands go first
+##  "insn A (x) insn B (y)" picks the first alternative matching:
+##      (none) (66) (f3) (f2) - mandatory prefix
+##      (mem) (reg) - modrm.mod
+##      (o16) (o32) (a16) (a32) - operand/address size
+##  anything else in () is informational and always matches
+##  group tables with 16 rows have the mod != 3 forms first, then mod == 3
+##  within those, ">table" picks a row from an 8 row table by modrm.rm
+##  operands follow sandpile, plus:
+##      N/U mmx/xmm register in modrm.rm, sti is st(modrm.rm)
+##      eXX is a register sized by the operand size, Ibs a sign extended Ib
+
 opcode_1 = '''
 add Eb, Gb
 add Ev, Gv
 add Gb, Eb
 add Gv, Ev
 add al, Ib
-add rAX, Iz
+add eAX, Iz
 push es
 pop es
 or Eb, Gb
@@ -15,7 +31,7 @@ or Ev, Gv
 or Gb, Eb
 or Gv, Ev
 or al, Ib
-or rAX, Iz
+or eAX, Iz
 push cs
 >opcode_2
 
@@ -25,51 +41,51 @@ adc Ev, Gv
 adc Gb, Eb
 adc Gv, Ev
 adc al, Ib
-adc rAX, Iz
+adc eAX, Iz
 push ss
 pop ss
 sbb Eb, Gb
-sbb Ev,Gv
-sbb Gb,Eb
-sbb Gv,Ev
+sbb Ev, Gv
+sbb Gb, Eb
+sbb Gv, Ev
 sbb al, Ib
-sbb rAX,Iz
+sbb eAX, Iz
 push ds
 pop ds
 
 # 0x20
-and Eb,Gb
-and Ev,Gv
-and Gb,Eb
-and Gv,Ev
+and Eb, Gb
+and Ev, Gv
+and Gb, Eb
+and Gv, Ev
 and al, Ib
-and rAx, Iz
+and eAX, Iz
 es:
 daa
-isub Eb,Gb
-sub Ev,Gv
-sub Gb,Eb
-sub Gv,Ev
+sub Eb, Gb
+sub Ev, Gv
+sub Gb, Eb
+sub Gv, Ev
 sub al, Ib
-sub rAX,Iz
+sub eAX, Iz
 cs:
 das
 
 # 0x30
-xor Eb,Gb
-xor Ev,Gv
-xor Gb,Eb
-xor Gv,Ev
-xor al,Ib
-xor rAX,Iz
+xor Eb, Gb
+xor Ev, Gv
+xor Gb, Eb
+xor Gv, Ev
+xor al, Ib
+xor eAX, Iz
 ss:
 aaa
-cmp Eb,Gb
-cmp Ev,Gv
-cmp Gb,Eb
-cmp Gv,Ev
-cmp al,Ib
-cmp rAX,Iz
+cmp Eb, Gb
+cmp Ev, Gv
+cmp Gb, Eb
+cmp Gv, Ev
+cmp al, Ib
+cmp eAX, Iz
 ds:
 aas
 
@@ -92,172 +108,172 @@ dec eSI
 dec eDI
 
 # 0x50
-push rAX
-push rCX
-push rDX
-push rBX
-push rSP
-push rBP
-push rSI
-push rDI
-pop rAX
-pop rCX
-pop rDX
-pop rBX
-pop rSP
-pop rBP
-pop rSI
-pop rDI
+push eAX
+push eCX
+push eDX
+push eBX
+push eSP
+push eBP
+push eSI
+push eDI
+pop eAX
+pop eCX
+pop eDX
+pop eBX
+pop eSP
+pop eBP
+pop eSI
+pop eDI
 
 # 0x60
 pusha (80186+)
 popa (80186+)
-bound Gv,Ma (80186+)
-arpl Ew,Gw (80286+)
+bound Gv, Ma (80186+)
+arpl Ew, Gw (80286+)
 fs: (80386+)
-gs: (80387+)
+gs: (80386+)
 opsize: (80386+)
 adsize: (80386+)
 push Iz (80186+)
-imul Gv,Ev,Iz (80186+)
-push Ib (80186+)
-imul Gv,Ev,Ib (80186+)
-ins Yb, DX (80186+)
-ins Yz, DX (80186+)
-outs DX, Xb (80186+)
-outs DX,Xz (80186+)
+imul Gv, Ev, Iz (80186+)
+push Ibs (80186+)
+imul Gv, Ev, Ibs (80186+)
+insb Yb, dx (80186+)
+insw Yz, dx (o16) insd Yz, dx (o32)
+outsb dx, Xb (80186+)
+outsw dx, Xz (o16) outsd dx, Xz (o32)
 
 # 0x70
 jo Jb
 jno Jb
-jb Jb
-jnb Jb
+jc Jb
+jnc Jb
 jz Jb
 jnz Jb
 jbe Jb
-jnbe Jb
+ja Jb
 js Jb
 jns Jb
 jp Jb
 jnp Jb
 jl Jb
-jnl Jb
+jge Jb
 jle Jb
-jnle Jb
-
-#0x80
-group_1 Eb,Ib
-group_1 Ev,Iz
-group_1 Eb,Ib
-group_1 Ev,Ib
-test Eb,Gb
-test Ev,Gv
-xchg Eb,Gb
-xchg Ev,Gv
+jg Jb
+
+# 0x80
+group_1 Eb, Ib
+group_1 Ev, Iz
+group_1 Eb, Ib
+group_1 Ev, Ibs
+test Eb, Gb
+test Ev, Gv
+xchg Eb, Gb
+xchg Ev, Gv
 mov Eb, Gb
-mov Eb,Gv
-mov Gb,Eb
-mov Gv,Ev
-mov Mw,Sw
-lea Gv,M
-mov Sw,Mw
-group_10
+mov Ev, Gv
+mov Gb, Eb
+mov Gv, Ev
+mov Ew, Sw
+lea Gv, M
+mov Sw, Ew
+group_1a Ev
 
-#0x90
-nop
-xchg rCX,rAX
-xchg rDX,rAX
-xchg rBX,rAX
-xchg rSP,rAX
-xchg rBP,rAX
-xchg rSI,rAX
-xchg rDI, rAX
-cbw (8088) cwde (80386+)
-cwd (8088) cdq (80386+)
+# 0x90
+pause (f3) nop ()
+xchg eCX, eAX
+xchg eDX, eAX
+xchg eBX, eAX
+xchg eSP, eAX
+xchg eBP, eAX
+xchg eSI, eAX
+xchg eDI, eAX
+cbw (o16) cwde (o32)
+cwd (o16) cdq (o32)
 call Ap
 wait () fwait ()
-pushf Fv
-popf fv
+pushf
+popf
 sahf
 lahf
 
-#0xa0
+# 0xa0
 mov al, Ob
-mov rAX, Ov
+mov eAX, Ov
 mov Ob, al
-mov Ov, rAX
-movs Yb,Xb
-movs Yv,Xv
-cmps Yb,Xb
-cmps Yv,Xv
+mov Ov, eAX
+movsb Yb, Xb
+movsw Yv, Xv (o16) movsd Yv, Xv (o32)
+cmpsb Xb, Yb
+cmpsw Xv, Yv (o16) cmpsd Xv, Yv (o32)
 test al, Ib
-test rAX,Iz
-stos Yv,al
-stos Yv,rAx
-lods al, Xb
-lods rAX,Xv
-scas Yb,al
-scas Yv,rAx
-
-#0xb0
+test eAX, Iz
+stosb Yb, al
+stosw Yv, eAX (o16) stosd Yv, eAX (o32)
+lodsb al, Xb
+lodsw eAX, Xv (o16) lodsd eAX, Xv (o32)
+scasb al, Yb
+scasw eAX, Yv (o16) scasd eAX, Yv (o32)
+
+# 0xb0
 mov al, Ib
 mov cl, Ib
-mov dl,Ib
-mov bl,Ib
-mov ah,Ib
-mov ch,Ib
-mov dh,Ib
-mov bh,Ib
-mov rAX,Iv
-mov rCX,Iv
-mov rDX,Iv
-mov rBX,Iv
-mov rSP,Iv
-mov rBP,Iv
-mov rSI,Iv
-mov rDI,Iv
-
-#0xc0
-group_2 Eb,Ib (80186+)
-group_2 Ev,Ib (80186+)
+mov dl, Ib
+mov bl, Ib
+mov ah, Ib
+mov ch, Ib
+mov dh, Ib
+mov bh, Ib
+mov eAX, Iv
+mov eCX, Iv
+mov eDX, Iv
+mov eBX, Iv
+mov eSP, Iv
+mov eBP, Iv
+mov eSI, Iv
+mov eDI, Iv
+
+# 0xc0
+group_2 Eb, Ib (80186+)
+group_2 Ev, Ib (80186+)
 retn Iw
-retn
-les Gz,Mp
-lds Gz,Mp
-group_11 Eb,Ib
-group_11 Ev,Iz
-enter Iw,Ib (80186+)
+ret
+les Gz, Mp
+lds Gz, Mp
+group_11 Eb, Ib
+group_11 Ev, Iz
+enter Iw, Ib (80186+)
 leave (80186+)
 retf Iw
 retf
 int3
 int Ib
 into
-iret
+iret (o16) iretd (o32)
 
-#0xd0
+# 0xd0
 group_2 Eb, 1
 group_2 Ev, 1
-group_2 Eb,CL
-group_2 Ev,CL
+group_2 Eb, cl
+group_2 Ev, cl
 aam Ib
 aad Ib
 salc () setalc ()
 xlat
-esc 0
-esc 1
-esc 2
-esc 3
-esc 4
-esc 5
-esc 6
-esc 7
-
-#0xe0
+fpu_d8
+fpu_d9
+fpu_da
+fpu_db
+fpu_dc
+fpu_dd
+fpu_de
+fpu_df
+
+# 0xe0
 loopnz Jb () loopne Jb ()
 loopz Jb () loope Jb ()
 loop Jb
-jcxz Jb () jecx Jb ()
+jcxz Jb (a16) jecxz Jb (a32)
 in al, Ib
 in eAX, Ib
 out Ib, al
@@ -268,26 +284,26 @@ jmp Ap
 jmp Jb
 in al, dx
 in eAX, dx
-out dx,al
+out dx, al
 out dx, eAX
 
-#f0
+# 0xf0
 lock:
 int1 () icebp (80386+)
-repnz: () repne: ()
-repz: () rep: () repe: ()
+repne: () repnz: ()
+rep: () repe: () repz: ()
 hlt
 cmc
-group_3 Eb
-group_3 Ev
+group_3b Eb
+group_3v Ev
 clc
 stc
 cli
 sti
 cld
 std
-group_4   Eb    # inc/dec
-group_5   Ev    # inc/dec etc.
+group_4 Eb    # inc/dec
+group_5       # inc/dec etc.
 '''
 
 group_1 = '''
@@ -301,6 +317,17 @@ xor
 cmp
 '''
 
+group_1a = '''
+pop
+-
+-
+-
+-
+-
+-
+-
+'''
+
 group_2 = '''
 rol
 ror
@@ -312,20 +339,37 @@ sal
 sar
 '''
 
-group_3 = '''
+group_3b = '''
 test Ib
+test Ib
+not
+neg
+mul
+imul
+div
+idiv
+'''
+
+group_3v = '''
+test Iz
 test Iz
 not
 neg
-mul rAX
-imul rAX
-div rAX
-idiv rAX
+mul
+imul
+div
+idiv
 '''
 
 group_4 = '''
-inc Eb
-dec Eb
+inc
+dec
+-
+-
+-
+-
+-
+-
 '''
 
 group_5 = '''
@@ -336,30 +380,84 @@ call Mp
 jmp Ev
 jmp Mp
 push Ev
+-
 '''
 
-### XXX: this doesn't look right...
 group_6 = '''
-sldt Mw () sldt Rv ()
-str Mw () str Rv ()
-lldt Mw () lldt Rv ()
-ltr Mw () ltr Rv ()
-verr Mw () verw Rv ()
-verw Mw () verw Rv ()
-jmpe Ev (IA-64)
+sldt Ew
+str Ew
+lldt Ew
+ltr Ew
+verr Ew
+verw Ew
+-
+-
 '''
 
+# mod == 3 forms are rows 8-15
 group_7 = '''
 sgdt Ms
 sidt Ms
 lgdt Ms
 lidt Ms
-smsw Mw
+smsw Ew
+-
+lmsw Ew
+invlpg Mb (80486+)
+
+>group_7_c0
+>group_7_c8
+>group_7_d0
+-
+smsw Ew
+-
+lmsw Ew
+>group_7_f8
+'''
+
+group_7_c0 = '''
+-
+vmcall
+vmlaunch
+vmresume
+vmxoff
+-
+-
+-
+'''
+
+group_7_c8 = '''
+monitor
+mwait
+-
+-
+-
+-
+-
+-
+'''
+
+group_7_d0 = '''
+xgetbv
+xsetbv
+-
+-
+-
+-
+-
 -
-lmsw Mw
-invlpg M (80486+)
 '''
 
+group_7_f8 = '''
+-
+rdtscp
+-
+-
+-
+-
+-
+-
+'''
 
 group_8 = '''
 -
@@ -372,59 +470,444 @@ btr
 btc
 '''
 
-### XXX: it looks like we'll need to provide a property of an opcode
 group_9 = '''
 -
-cmpxchg Mq
+cmpxchg8b Mq
 -
 -
 -
 -
-vmptrld Mq
+vmptrld Mq (none) vmclear Mq (66) vmxon Mq (f3)
 vmptrst Mq
+
+-
+-
+-
+-
+-
+-
+rdrand Ev
+rdseed Ev
 '''
 
 group_10 = '''
-pop Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+ud1 Gv, Ev
+'''
+
+group_11 = '''
+mov
+-
+-
+-
+-
+-
+-
+-
+'''
+
+group_12 = '''
+-
+-
+-
+-
+-
+-
+-
+-
+
+-
+-
+psrlw Nq, Ib (none) psrlw Udq, Ib (66)
+-
+psraw Nq, Ib (none) psraw Udq, Ib (66)
+-
+psllw Nq, Ib (none) psllw Udq, Ib (66)
+-
+'''
+
+group_13 = '''
+-
+-
+-
+-
+-
+-
+-
+-
+
+-
+-
+psrld Nq, Ib (none) psrld Udq, Ib (66)
+-
+psrad Nq, Ib (none) psrad Udq, Ib (66)
+-
+pslld Nq, Ib (none) pslld Udq, Ib (66)
+-
+'''
+
+group_14 = '''
+-
+-
+-
+-
+-
+-
+-
+-
+
+-
+-
+psrlq Nq, Ib (none) psrlq Udq, Ib (66)
+psrldq Udq, Ib (66)
+-
+-
+psllq Nq, Ib (none) psllq Udq, Ib (66)
+pslldq Udq, Ib (66)
+'''
+
+group_15 = '''
+fxsave M
+fxrstor M
+ldmxcsr Md
+stmxcsr Md
+xsave M
+xrstor M
+xsaveopt M
+clflush Mb
+
+-
+-
+-
+-
+-
+lfence
+mfence
+sfence
+'''
+
+group_16 = '''
+prefetchnta Mb
+prefetcht0 Mb
+prefetcht1 Mb
+prefetcht2 Mb
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+'''
+
+## x87, indexed by modrm.reg like the groups
+
+fpu_d8 = '''
+fadd Md
+fmul Md
+fcom Md
+fcomp Md
+fsub Md
+fsubr Md
+fdiv Md
+fdivr Md
+
+fadd st0, sti
+fmul st0, sti
+fcom st0, sti
+fcomp st0, sti
+fsub st0, sti
+fsubr st0, sti
+fdiv st0, sti
+fdivr st0, sti
+'''
+
+fpu_d9 = '''
+fld Md
+-
+fst Md
+fstp Md
+fldenv M
+fldcw Mw
+fnstenv M
+fnstcw Mw
+
+fld sti
+fxch sti
+>fpu_d9_d0
+-
+>fpu_d9_e0
+>fpu_d9_e8
+>fpu_d9_f0
+>fpu_d9_f8
+'''
+
+fpu_d9_d0 = '''
+fnop
+-
+-
+-
+-
+-
+-
+-
+'''
+
+fpu_d9_e0 = '''
+fchs
+fabs
+-
+-
+ftst
+fxam
+-
+-
+'''
+
+fpu_d9_e8 = '''
+fld1
+fldl2t
+fldl2e
+fldpi
+fldlg2
+fldln2
+fldz
+-
+'''
+
+fpu_d9_f0 = '''
+f2xm1
+fyl2x
+fptan
+fpatan
+fxtract
+fprem1
+fdecstp
+fincstp
+'''
+
+fpu_d9_f8 = '''
+fprem
+fyl2xp1
+fsqrt
+fsincos
+frndint
+fscale
+fsin
+fcos
+'''
+
+fpu_da = '''
+fiadd Md
+fimul Md
+ficom Md
+ficomp Md
+fisub Md
+fisubr Md
+fidiv Md
+fidivr Md
+
+fcmovb st0, sti
+fcmove st0, sti
+fcmovbe st0, sti
+fcmovu st0, sti
+-
+>fpu_da_e8
+-
+-
+'''
+
+fpu_da_e8 = '''
+-
+fucompp
+-
+-
+-
+-
+-
+-
+'''
+
+fpu_db = '''
+fild Md
+fisttp Md
+fist Md
+fistp Md
+-
+fld Mt
+-
+fstp Mt
+
+fcmovnb st0, sti
+fcmovne st0, sti
+fcmovnbe st0, sti
+fcmovnu st0, sti
+>fpu_db_e0
+fucomi st0, sti
+fcomi st0, sti
+-
+'''
+
+fpu_db_e0 = '''
+feni
+fdisi
+fnclex
+fninit
+fsetpm
+-
+-
+-
+'''
+
+fpu_dc = '''
+fadd Mq
+fmul Mq
+fcom Mq
+fcomp Mq
+fsub Mq
+fsubr Mq
+fdiv Mq
+fdivr Mq
+
+fadd sti, st0
+fmul sti, st0
+fcom sti
+fcomp sti
+fsubr sti, st0
+fsub sti, st0
+fdivr sti, st0
+fdiv sti, st0
+'''
+
+fpu_dd = '''
+fld Mq
+fisttp Mq
+fst Mq
+fstp Mq
+frstor M
+-
+fnsave M
+fnstsw Mw
+
+ffree sti
+fxch sti
+fst sti
+fstp sti
+fucom sti
+fucomp sti
+-
+-
+'''
+
+fpu_de = '''
+fiadd Mw
+fimul Mw
+ficom Mw
+ficomp Mw
+fisub Mw
+fisubr Mw
+fidiv Mw
+fidivr Mw
+
+faddp sti, st0
+fmulp sti, st0
+fcomp sti
+>fpu_de_d8
+fsubrp sti, st0
+fsubp sti, st0
+fdivrp sti, st0
+fdivp sti, st0
+'''
+
+fpu_de_d8 = '''
+-
+fcompp
+-
+-
+-
+-
+-
+-
+'''
+
+fpu_df = '''
+fild Mw
+fisttp Mw
+fist Mw
+fistp Mw
+fbld Mt
+fild Mq
+fbstp Mt
+fistp Mq
+
+ffreep sti
+fxch sti
+fstp sti
+fstp sti
+>fpu_df_e0
+fucomip st0, sti
+fcomip st0, sti
+-
+'''
+
+fpu_df_e0 = '''
+fnstsw ax
+-
+-
+-
+-
+-
+-
+-
 '''
 
-# XXX: tbh, these tables are inaccurate due to lack of foresight on my part
-#      and i'm tired of typing...
 opcode_2 = '''
 group_6
 group_7
-lar Gv,Ew
-lsl Gv,Ew
+lar Gv, Ew
+lsl Gv, Ew
 -
 syscall
 clts
 sysret
+invd
+wbinvd
 -
+ud2
 -
--
--
--
--
--
+nop Ev
+femms
 -
 
 # 0x10
-movups Vp, Wp
-movups Wp, Vp
-movlps Vp, Mq () movhlps Vp,Vq ()
-movlps Mq, Vp
-unpcklps Vp, Wq
-unpckhps Vp,Wq
-movhps Vps,Mq () movlhps Vp,Wp ()
--
-cmovs Gv,Ev
-cmovns Gv,Ev
-cmovp Gv,Ev
-cmovnp Gv,Ev
-cmovl Gv,Ev
-cmovnl Gv,Ev
-cmovle Gv,Ev
-cmovnle Gv,Ev
+movups Vps, Wps (none) movupd Vpd, Wpd (66) movss Vss, Wss (f3) movsd Vsd, Wsd (f2)
+movups Wps, Vps (none) movupd Wpd, Vpd (66) movss Wss, Vss (f3) movsd Wsd, Vsd (f2)
+movlps Vq, Mq (none mem) movhlps Vq, Uq (none reg) movlpd Vq, Mq (66) movsldup Vq, Wq (f3) movddup Vq, Wq (f2)
+movlps Mq, Vq (none) movlpd Mq, Vq (66)
+unpcklps Vps, Wq (none) unpcklpd Vpd, Wq (66)
+unpckhps Vps, Wq (none) unpckhpd Vpd, Wq (66)
+movhps Vq, Mq (none mem) movlhps Vq, Uq (none reg) movhpd Vq, Mq (66) movshdup Vq, Wq (f3)
+movhps Mq, Vq (none) movhpd Mq, Vq (66)
+group_16
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
+nop Ev
 
 # 0x20
 mov Rd, Cd
@@ -435,14 +918,14 @@ mov Dd, Rd
 -
 -
 -
-movaps Vp,Wp
-movaps Wp,Vp
-cvtpi2ps Vp,Qq
-movntps Md,Vp
-cvttps2pi Pq,Wp
-cvtps2pi Pq,Wp
-ucomiss Vs,Ws
-comiss Vp,Wp
+movaps Vps, Wps (none) movapd Vpd, Wpd (66)
+movaps Wps, Vps (none) movapd Wpd, Vpd (66)
+cvtpi2ps Vps, Qpi (none) cvtpi2pd Vpd, Qpi (66) cvtsi2ss Vss, Ed (f3) cvtsi2sd Vsd, Ed (f2)
+movntps Mps, Vps (none) movntpd Mpd, Vpd (66)
+cvttps2pi Ppi, Wps (none) cvttpd2pi Ppi, Wpd (66) cvttss2si Gd, Wss (f3) cvttsd2si Gd, Wsd (f2)
+cvtps2pi Ppi, Wps (none) cvtpd2pi Ppi, Wpd (66) cvtss2si Gd, Wss (f3) cvtsd2si Gd, Wsd (f2)
+ucomiss Vss, Wss (none) ucomisd Vsd, Wsd (66)
+comiss Vss, Wss (none) comisd Vsd, Wsd (66)
 
 # 0x30
 wrmsr
@@ -452,10 +935,10 @@ rdpmc
 sysenter
 sysexit
 -
+getsec
+>opcode_38
 -
--
--
--
+>opcode_3a
 -
 -
 -
@@ -463,219 +946,798 @@ sysexit
 -
 
 # 0x40
-cmovo Gv,Ev
-cmovno Gv,Ev
-cmovb Gv,Ev
-cmovnb Gv,Ev
-cmovz Gv,Ev
-cmovnz Gv,Ev
-cmovbe Gv,Ev
-cmovnbe Gv,Ev
-cmovs Gv,Ev
-cmovns Gv,Ev
-cmovp Gv,Ev
-cmovnp Gv,Ev
-cmovl Gv,Ev
-cmovnl Gv,Ev
-cmovle Gv,Ev
-cmovnle Gv,Ev
+cmovo Gv, Ev
+cmovno Gv, Ev
+cmovc Gv, Ev
+cmovnc Gv, Ev
+cmovz Gv, Ev
+cmovnz Gv, Ev
+cmovbe Gv, Ev
+cmova Gv, Ev
+cmovs Gv, Ev
+cmovns Gv, Ev
+cmovp Gv, Ev
+cmovnp Gv, Ev
+cmovl Gv, Ev
+cmovge Gv, Ev
+cmovle Gv, Ev
+cmovg Gv, Ev
 
 # 0x50
-movmskps Gd, Vp
-sqrtps Vp,Wp
-rsqrtps Vp,Wp
-rcpps Vp,Wp
-andps Vp,Wp
-andnps Vp,Wp
-orps Vp,Wp
-xorps Vp,Wp
-addps Vp,Wp
-mulps Vp,Wp
-cvtps2pd Vp,Wp
-cvtdq2ps Vp,Wd
-subps Vp,Wp
-minps Vp,Wp
-divps Vp,Wp
-maxps Vp,Wp
+movmskps Gd, Ups (none) movmskpd Gd, Upd (66)
+sqrtps Vps, Wps (none) sqrtpd Vpd, Wpd (66) sqrtss Vss, Wss (f3) sqrtsd Vsd, Wsd (f2)
+rsqrtps Vps, Wps (none) rsqrtss Vss, Wss (f3)
+rcpps Vps, Wps (none) rcpss Vss, Wss (f3)
+andps Vps, Wps (none) andpd Vpd, Wpd (66)
+andnps Vps, Wps (none) andnpd Vpd, Wpd (66)
+orps Vps, Wps (none) orpd Vpd, Wpd (66)
+xorps Vps, Wps (none) xorpd Vpd, Wpd (66)
+addps Vps, Wps (none) addpd Vpd, Wpd (66) addss Vss, Wss (f3) addsd Vsd, Wsd (f2)
+mulps Vps, Wps (none) mulpd Vpd, Wpd (66) mulss Vss, Wss (f3) mulsd Vsd, Wsd (f2)
+cvtps2pd Vpd, Wps (none) cvtpd2ps Vps, Wpd (66) cvtss2sd Vsd, Wss (f3) cvtsd2ss Vss, Wsd (f2)
+cvtdq2ps Vps, Wdq (none) cvtps2dq Vdq, Wps (66) cvttps2dq Vdq, Wps (f3)
+subps Vps, Wps (none) subpd Vpd, Wpd (66) subss Vss, Wss (f3) subsd Vsd, Wsd (f2)
+minps Vps, Wps (none) minpd Vpd, Wpd (66) minss Vss, Wss (f3) minsd Vsd, Wsd (f2)
+divps Vps, Wps (none) divpd Vpd, Wpd (66) divss Vss, Wss (f3) divsd Vsd, Wsd (f2)
+maxps Vps, Wps (none) maxpd Vpd, Wpd (66) maxss Vss, Wss (f3) maxsd Vsd, Wsd (f2)
 
 # 0x60
-punpcklbw Pq,Qd
-punpcklwd Pq,Qd
-punpckldq Pq,Qd
-packsswb Pq,Qq
-pcmpgtb Pq,Qq
-pcmpgtw Pq,Qq
-pcmpgtd Pq,Qq
-packuswb Pq,Qq
-punpckhbw Pq,Qd
-punpckhwd Pq,Qd
-punpckhdq Pq,Qd
-packssdw Pq,Qq
--
--
-movd Pq, Ed
-movq Pq, Qq
+punpcklbw Pq, Qd (none) punpcklbw Vdq, Wdq (66)
+punpcklwd Pq, Qd (none) punpcklwd Vdq, Wdq (66)
+punpckldq Pq, Qd (none) punpckldq Vdq, Wdq (66)
+packsswb Pq, Qq (none) packsswb Vdq, Wdq (66)
+pcmpgtb Pq, Qq (none) pcmpgtb Vdq, Wdq (66)
+pcmpgtw Pq, Qq (none) pcmpgtw Vdq, Wdq (66)
+pcmpgtd Pq, Qq (none) pcmpgtd Vdq, Wdq (66)
+packuswb Pq, Qq (none) packuswb Vdq, Wdq (66)
+punpckhbw Pq, Qd (none) punpckhbw Vdq, Wdq (66)
+punpckhwd Pq, Qd (none) punpckhwd Vdq, Wdq (66)
+punpckhdq Pq, Qd (none) punpckhdq Vdq, Wdq (66)
+packssdw Pq, Qq (none) packssdw Vdq, Wdq (66)
+punpcklqdq Vdq, Wdq (66)
+punpckhqdq Vdq, Wdq (66)
+movd Pd, Ed (none) movd Vd, Ed (66)
+movq Pq, Qq (none) movdqa Vdq, Wdq (66) movdqu Vdq, Wdq (f3)
 
 # 0x70
-pshufw Pq,Qq,Ib
+pshufw Pq, Qq, Ib (none) pshufd Vdq, Wdq, Ib (66) pshufhw Vdq, Wdq, Ib (f3) pshuflw Vdq, Wdq, Ib (f2)
 group_12
 group_13
 group_14
-pcmpeqb Pq,Qq
-pcmpeqw Pq,Qq
-pcmpeqd Pq,Qq
+pcmpeqb Pq, Qq (none) pcmpeqb Vdq, Wdq (66)
+pcmpeqw Pq, Qq (none) pcmpeqw Vdq, Wdq (66)
+pcmpeqd Pq, Qq (none) pcmpeqd Vdq, Wdq (66)
 emms
+vmread Ed, Gd
+vmwrite Gd, Ed
 -
 -
--
--
--
--
-movd Ed,Pd
-movq Qq,Pq
+haddpd Vpd, Wpd (66) haddps Vps, Wps (f2)
+hsubpd Vpd, Wpd (66) hsubps Vps, Wps (f2)
+movd Ed, Pd (none) movd Ed, Vd (66) movq Vq, Wq (f3)
+movq Qq, Pq (none) movdqa Wdq, Vdq (66) movdqu Wdq, Vdq (f3)
 
 # 0x80
 jo Jz
 jno Jz
-jb Jz
-jnb Jz
+jc Jz
+jnc Jz
 jz Jz
 jnz Jz
 jbe Jz
-jnbe Jz
+ja Jz
 js Jz
 jns Jz
 jp Jz
 jnp Jz
 jl Jz
-jnl Jz
+jge Jz
 jle Jz
-jnle Jz
+jg Jz
 
 # 0x90
 seto Eb
 setno Eb
-setb Eb
-setnb Eb
+setc Eb
+setnc Eb
 setz Eb
 setnz Eb
 setbe Eb
-setnbe Eb
+seta Eb
 sets Eb
 setns Eb
 setp Eb
 setnp Eb
 setl Eb
-setnl Eb
+setge Eb
 setle Eb
-setnle Eb
+setg Eb
 
-#0xa0
+# 0xa0
 push fs
 pop fs
 cpuid
-bt Ev,Gv
-shld Ev,Gv,Ib
-shld Ev,Gv,cl
+bt Ev, Gv
+shld Ev, Gv, Ib
+shld Ev, Gv, cl
 -
 -
 push gs
 pop gs
 rsm
-bts Ev,Gv
-shrd Ev,Gv,Ib
-shrd Ev,Gv,cl
+bts Ev, Gv
+shrd Ev, Gv, Ib
+shrd Ev, Gv, cl
 group_15
-imul Gv,Ev
+imul Gv, Ev
 
 # 0xb0
-cmpxchg Eb,Gb
-cmpxchg Ev,Gv
-lss Gz,Mp
-btr Ev,Gv
-lfs Gz,Mp
-lgs Gz,Mp
-movzx Gv,Eb
-movzx Gv,Ew
-popcnt Gv,Ev    # requires 0xf3
+cmpxchg Eb, Gb
+cmpxchg Ev, Gv
+lss Gv, Mp
+btr Ev, Gv
+lfs Gv, Mp
+lgs Gv, Mp
+movzx Gv, Eb
+movzx Gv, Ew
+popcnt Gv, Ev (f3)
 group_10
-group_8 Ev,Ib
-btc Ev,Gv
-bsf Gv,Ev
-bsr Gv,Ev
-movsx Gv,Eb
-movsx Gv,Ew
-
-#0xc0
-xadd Eb,Gb
-xadd Ev,Gv
-cmpps Vp,Wp,Ib
-movnti Md,Gd
-pinsrw Pq,Eq,Ib
-pextrw Gd,Pq,Ib
-shufps Vp,Wp,Ib
-group_9 Mq
-bswap rAX
-bswap rCX
-bswap rDX
-bswap rBX
-bswap rSP
-bswap rBP
-bswap rSI
-bswap rDI
+group_8 Ev, Ib
+btc Ev, Gv
+tzcnt Gv, Ev (f3) bsf Gv, Ev ()
+lzcnt Gv, Ev (f3) bsr Gv, Ev ()
+movsx Gv, Eb
+movsx Gv, Ew
+
+# 0xc0
+xadd Eb, Gb
+xadd Ev, Gv
+cmpps Vps, Wps, Ib (none) cmppd Vpd, Wpd, Ib (66) cmpss Vss, Wss, Ib (f3) cmpsd Vsd, Wsd, Ib (f2)
+movnti Md, Gd
+pinsrw Pq, Ed, Ib (none) pinsrw Vdq, Ed, Ib (66)
+pextrw Gd, Nq, Ib (none) pextrw Gd, Udq, Ib (66)
+shufps Vps, Wps, Ib (none) shufpd Vpd, Wpd, Ib (66)
+group_9
+bswap eAX
+bswap eCX
+bswap eDX
+bswap eBX
+bswap eSP
+bswap eBP
+bswap eSI
+bswap eDI
 
 # 0xd0
-addsubpd Vp,Wp  #requires 0x66
-psrlw Pq,Qq
-psrld Pq,Qq
-psrlq Pq,Qq
-paddq Pq,Qq
-pmullw Pq,Qq
-movq Vd, Pq     # requires 0x66
--
-psubusb Pq,Qq
-psubusw Pq,Qq
-pminub Pq,Qq
-pand Pq,Qq
-paddusb Pq,Qq
-paddusw Pq,Qq
-pmaxub Pq,Qq
-andn Pq,Qq
-
-#0xe0
-pavgb Pq,Qq
-psraw Pq,Qq
-psrad Pq,Qq
-pavgw Pq,Qq
-pmulhuw Pq,Qq
-pmulhw Pq,Qq
--
-movnq Mq,Pq
-psubsb Pq,Qq
-psubsw Pq,Qq
-pminsw Pq,Qq
-por Pq,Qq
-paddsb Pq,Qq
-paddsw Pq,Qq
-pmaxsw Pq,Qq
-pxor Pq,Qq
+addsubpd Vpd, Wpd (66) addsubps Vps, Wps (f2)
+psrlw Pq, Qq (none) psrlw Vdq, Wdq (66)
+psrld Pq, Qq (none) psrld Vdq, Wdq (66)
+psrlq Pq, Qq (none) psrlq Vdq, Wdq (66)
+paddq Pq, Qq (none) paddq Vdq, Wdq (66)
+pmullw Pq, Qq (none) pmullw Vdq, Wdq (66)
+movq Wq, Vq (66) movq2dq Vdq, Nq (f3) movdq2q Pq, Uq (f2)
+pmovmskb Gd, Nq (none) pmovmskb Gd, Udq (66)
+psubusb Pq, Qq (none) psubusb Vdq, Wdq (66)
+psubusw Pq, Qq (none) psubusw Vdq, Wdq (66)
+pminub Pq, Qq (none) pminub Vdq, Wdq (66)
+pand Pq, Qq (none) pand Vdq, Wdq (66)
+paddusb Pq, Qq (none) paddusb Vdq, Wdq (66)
+paddusw Pq, Qq (none) paddusw Vdq, Wdq (66)
+pmaxub Pq, Qq (none) pmaxub Vdq, Wdq (66)
+pandn Pq, Qq (none) pandn Vdq, Wdq (66)
+
+# 0xe0
+pavgb Pq, Qq (none) pavgb Vdq, Wdq (66)
+psraw Pq, Qq (none) psraw Vdq, Wdq (66)
+psrad Pq, Qq (none) psrad Vdq, Wdq (66)
+pavgw Pq, Qq (none) pavgw Vdq, Wdq (66)
+pmulhuw Pq, Qq (none) pmulhuw Vdq, Wdq (66)
+pmulhw Pq, Qq (none) pmulhw Vdq, Wdq (66)
+cvttpd2dq Vdq, Wpd (66) cvtdq2pd Vpd, Wq (f3) cvtpd2dq Vdq, Wpd (f2)
+movntq Mq, Pq (none) movntdq Mdq, Vdq (66)
+psubsb Pq, Qq (none) psubsb Vdq, Wdq (66)
+psubsw Pq, Qq (none) psubsw Vdq, Wdq (66)
+pminsw Pq, Qq (none) pminsw Vdq, Wdq (66)
+por Pq, Qq (none) por Vdq, Wdq (66)
+paddsb Pq, Qq (none) paddsb Vdq, Wdq (66)
+paddsw Pq, Qq (none) paddsw Vdq, Wdq (66)
+pmaxsw Pq, Qq (none) pmaxsw Vdq, Wdq (66)
+pxor Pq, Qq (none) pxor Vdq, Wdq (66)
 
 # 0xf0
-lddqu Vp,Md
-psllw Pq,Qq
-pslld Pq,Qq
-psllq Pq,Qq
-pmuludq Pq,Qq
-pmaddwd Pq,Qq
-psadbw Pq,Qq
-maskmovq Pq,Pq
-psubb Pq,Qq
-psubw Pq,Qq
-psubd Pq,Qq
-psubq Pq,Qq
-paddb Pq,Qq
-paddw Pq,Qq
-paddd Pq,Qq
+lddqu Vdq, Mdq (f2)
+psllw Pq, Qq (none) psllw Vdq, Wdq (66)
+pslld Pq, Qq (none) pslld Vdq, Wdq (66)
+psllq Pq, Qq (none) psllq Vdq, Wdq (66)
+pmuludq Pq, Qq (none) pmuludq Vdq, Wdq (66)
+pmaddwd Pq, Qq (none) pmaddwd Vdq, Wdq (66)
+psadbw Pq, Qq (none) psadbw Vdq, Wdq (66)
+maskmovq Pq, Nq (none) maskmovdqu Vdq, Udq (66)
+psubb Pq, Qq (none) psubb Vdq, Wdq (66)
+psubw Pq, Qq (none) psubw Vdq, Wdq (66)
+psubd Pq, Qq (none) psubd Vdq, Wdq (66)
+psubq Pq, Qq (none) psubq Vdq, Wdq (66)
+paddb Pq, Qq (none) paddb Vdq, Wdq (66)
+paddw Pq, Qq (none) paddw Vdq, Wdq (66)
+paddd Pq, Qq (none) paddd Vdq, Wdq (66)
+ud0 Gv, Ev
+'''
+
+## 0x0f 0x38 and 0x0f 0x3a, ssse3 and sse4
+opcode_38 = '''
+pshufb Pq, Qq (none) pshufb Vdq, Wdq (66)
+phaddw Pq, Qq (none) phaddw Vdq, Wdq (66)
+phaddd Pq, Qq (none) phaddd Vdq, Wdq (66)
+phaddsw Pq, Qq (none) phaddsw Vdq, Wdq (66)
+pmaddubsw Pq, Qq (none) pmaddubsw Vdq, Wdq (66)
+phsubw Pq, Qq (none) phsubw Vdq, Wdq (66)
+phsubd Pq, Qq (none) phsubd Vdq, Wdq (66)
+phsubsw Pq, Qq (none) phsubsw Vdq, Wdq (66)
+psignb Pq, Qq (none) psignb Vdq, Wdq (66)
+psignw Pq, Qq (none) psignw Vdq, Wdq (66)
+psignd Pq, Qq (none) psignd Vdq, Wdq (66)
+pmulhrsw Pq, Qq (none) pmulhrsw Vdq, Wdq (66)
+-
+-
+-
+-
+
+# 0x10
+pblendvb Vdq, Wdq (66)
+-
+-
+-
+blendvps Vdq, Wdq (66)
+blendvpd Vdq, Wdq (66)
+-
+ptest Vdq, Wdq (66)
+-
+-
+-
+-
+pabsb Pq, Qq (none) pabsb Vdq, Wdq (66)
+pabsw Pq, Qq (none) pabsw Vdq, Wdq (66)
+pabsd Pq, Qq (none) pabsd Vdq, Wdq (66)
+-
+
+# 0x20
+pmovsxbw Vdq, Wq (66)
+pmovsxbd Vdq, Wd (66)
+pmovsxbq Vdq, Ww (66)
+pmovsxwd Vdq, Wq (66)
+pmovsxwq Vdq, Wd (66)
+pmovsxdq Vdq, Wq (66)
+-
+-
+pmuldq Vdq, Wdq (66)
+pcmpeqq Vdq, Wdq (66)
+movntdqa Vdq, Mdq (66)
+packusdw Vdq, Wdq (66)
+-
+-
+-
+-
+
+# 0x30
+pmovzxbw Vdq, Wq (66)
+pmovzxbd Vdq, Wd (66)
+pmovzxbq Vdq, Ww (66)
+pmovzxwd Vdq, Wq (66)
+pmovzxwq Vdq, Wd (66)
+pmovzxdq Vdq, Wq (66)
+-
+pcmpgtq Vdq, Wdq (66)
+pminsb Vdq, Wdq (66)
+pminsd Vdq, Wdq (66)
+pminuw Vdq, Wdq (66)
+pminud Vdq, Wdq (66)
+pmaxsb Vdq, Wdq (66)
+pmaxsd Vdq, Wdq (66)
+pmaxuw Vdq, Wdq (66)
+pmaxud Vdq, Wdq (66)
+
+# 0x40
+pmulld Vdq, Wdq (66)
+phminposuw Vdq, Wdq (66)
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x50
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x60
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x70
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x80
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x90
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xa0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xb0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xc0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xd0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xe0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xf0
+movbe Gv, Mv (none) crc32 Gd, Eb (f2)
+movbe Mv, Gv (none) crc32 Gd, Ev (f2)
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+'''
+
+opcode_3a = '''
+-
+-
+-
+-
+-
+-
+-
+-
+roundps Vps, Wps, Ib (66)
+roundpd Vpd, Wpd, Ib (66)
+roundss Vss, Wss, Ib (66)
+roundsd Vsd, Wsd, Ib (66)
+blendps Vps, Wps, Ib (66)
+blendpd Vpd, Wpd, Ib (66)
+pblendw Vdq, Wdq, Ib (66)
+palignr Pq, Qq, Ib (none) palignr Vdq, Wdq, Ib (66)
+
+# 0x10
+-
+-
+-
+-
+pextrb Eb, Vdq, Ib (66)
+pextrw Ew, Vdq, Ib (66)
+pextrd Ed, Vdq, Ib (66)
+extractps Ed, Vdq, Ib (66)
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x20
+pinsrb Vdq, Eb, Ib (66)
+insertps Vdq, Wd, Ib (66)
+pinsrd Vdq, Ed, Ib (66)
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x30
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x40
+dpps Vps, Wps, Ib (66)
+dppd Vpd, Wpd, Ib (66)
+mpsadbw Vdq, Wdq, Ib (66)
+-
+pclmulqdq Vdq, Wdq, Ib (66)
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x50
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x60
+pcmpestrm Vdq, Wdq, Ib (66)
+pcmpestri Vdq, Wdq, Ib (66)
+pcmpistrm Vdq, Wdq, Ib (66)
+pcmpistri Vdq, Wdq, Ib (66)
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x70
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x80
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0x90
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xa0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xb0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xc0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xd0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xe0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+
+# 0xf0
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
+-
 -
 '''
 
@@ -683,14 +1745,45 @@ paddd Pq,Qq
 table = {
     'opcode_1' : opcode_1,
     'opcode_2' : opcode_2,
+    'opcode_38' : opcode_38,
+    'opcode_3a' : opcode_3a,
     'group_1' : group_1,
+    'group_1a' : group_1a,
     'group_2' : group_2,
-    'group_3' : group_3,
+    'group_3b' : group_3b,
+    'group_3v' : group_3v,
     'group_4' : group_4,
     'group_5' : group_5,
     'group_6' : group_6,
     'group_7' : group_7,
+    'group_7_c0' : group_7_c0,
+    'group_7_c8' : group_7_c8,
+    'group_7_d0' : group_7_d0,
+    'group_7_f8' : group_7_f8,
     'group_8' : group_8,
     'group_9' : group_9,
     'group_10' : group_10,
+    'group_11' : group_11,
+    'group_12' : group_12,
+    'group_13' : group_13,
+    'group_14' : group_14,
+    'group_15' : group_15,
+    'group_16' : group_16,
+    'fpu_d8' : fpu_d8,
+    'fpu_d9' : fpu_d9,
+    'fpu_d9_d0' : fpu_d9_d0,
+    'fpu_d9_e0' : fpu_d9_e0,
+    'fpu_d9_e8' : fpu_d9_e8,
+    'fpu_d9_f0' : fpu_d9_f0,
+    'fpu_d9_f8' : fpu_d9_f8,
+    'fpu_da' : fpu_da,
+    'fpu_da_e8' : fpu_da_e8,
+    'fpu_db' : fpu_db,
+    'fpu_db_e0' : fpu_db_e0,
+    'fpu_dc' : fpu_dc,
+    'fpu_dd' : fpu_dd,
+    'fpu_de' : fpu_de,
+    'fpu_de_d8' : fpu_de_d8,
+    'fpu_df' : fpu_df,
+    'fpu_df_e0' : fpu_df_e0,
 }
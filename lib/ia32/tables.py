@@ -0,0 +1,240 @@
+## flattens the text tables in data.py into nested tuples that the decoder
+## can index directly. everything is plain tuples, ints and strings so the
+## result is marshaled to opcodes.marshal, run this file to regenerate it
+## after editing data.py (until then they're built again at every import).
+
+import os, marshal, hashlib
+
+from parse import parse_firstpass, isConstraint
+import data
+
+# entry kinds
+INSN, PREFIX, ESCAPE, GROUP, RMTABLE = range(1, 6)
+
+# operand kinds
+(E, G, M, R, I, J, O, A, S, C, D, P, Q, N, V, W, U, X, Y,
+ REG, SEG, CONST, ST, STI) = range(1, 25)
+
+# sizes that depend on the operand size
+SIZE_V = -1     # 2 or 4
+SIZE_P = -2     # far pointer, 4 or 6
+SIZE_A = -3     # bound pair, 4 or 8
+
+# entry[1] of an instruction or group says what follows the opcode
+MODRM_NONE, MODRM, MODRM_REG = 0, 1, 2
+
+addressing = dict(zip('EGMRIJOASCDPQNVWUXY',
+    (E, G, M, R, I, J, O, A, S, C, D, P, Q, N, V, W, U, X, Y)))
+
+sizes = {
+    '': 0, 'b': 1, 'bs': 1, 'w': 2, 'd': 4, 'q': 8, 'dq': 16, 't': 10,
+    's': 6, 'v': SIZE_V, 'z': SIZE_V, 'p': SIZE_P, 'a': SIZE_A,
+    'ps': 16, 'pd': 16, 'ss': 4, 'sd': 8, 'pi': 8,
+}
+
+registers = {}
+for size, names in [(1, 'al cl dl bl ah ch dh bh'), (2, 'ax cx dx bx sp bp si di'),
+                    (4, 'eax ecx edx ebx esp ebp esi edi'),
+                    (SIZE_V, 'eAX eCX eDX eBX eSP eBP eSI eDI')]:
+    for index, name in enumerate(names.split(' ')):
+        registers[name] = (REG, size, index)
+for index, name in enumerate('es cs ss ds fs gs'.split(' ')):
+    registers[name] = (SEG, 2, index)
+registers['1'] = (CONST, 1, 1)
+registers['st0'] = (ST, 10, 0)
+registers['sti'] = (STI, 10, 0)
+
+# name -> (mask, value) of the instruction flags, same values as libdasm
+prefixes = {
+    'lock': (0xff000000, 0x01000000),
+    'repne': (0xff000000, 0x02000000), 'repnz': (0xff000000, 0x02000000),
+    'rep': (0xff000000, 0x03000000), 'repe': (0xff000000, 0x03000000),
+    'repz': (0xff000000, 0x03000000),
+    'es': (0x00ff0000, 0x00010000), 'cs': (0x00ff0000, 0x00020000),
+    'ss': (0x00ff0000, 0x00030000), 'ds': (0x00ff0000, 0x00040000),
+    'fs': (0x00ff0000, 0x00050000), 'gs': (0x00ff0000, 0x00060000),
+    'opsize': (0x00000100, 0x00000100),
+    'adsize': (0x00001000, 0x00001000),
+}
+
+# constraint word -> (position in the constraint tuple, value)
+constraints = {
+    'none': (0, 0), '66': (0, 0x66), 'f3': (0, 0xf3), 'f2': (0, 0xf2),
+    'mem': (1, 0), 'reg': (1, 3),
+    'o16': (2, 2), 'o32': (2, 4),
+    'a16': (3, 2), 'a32': (3, 4),
+}
+ANY = (-1, -1, -1, -1)
+
+modrm_kinds = (E, G, M, R, S, C, D, P, Q, N, V, W, U, STI)
+
+class TableError(Exception): pass
+
+# the marshaled (digest, opcodes) next to us
+cache = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opcodes.marshal')
+
+def parse_operand(arg):
+    '''"Ev" -> (kind, size, signed)'''
+    if arg in registers:
+        return registers[arg]
+
+    if arg[0] not in addressing or arg[1:] not in sizes:
+        raise TableError("Unknown operand %s" % repr(arg))
+
+    return (addressing[arg[0]], sizes[arg[1:]], int(arg[1:] == 'bs'))
+
+def parse_constraint(col):
+    res = list(ANY)
+    for word in col[1:-1].split(' '):
+        if word in constraints:
+            position, value = constraints[word]
+            res[position] = value
+    return tuple(res)
+
+def split_alternatives(row):
+    '''yields (mnemonic, [operand], constraint) for every alternative in a row'''
+    insn = None; args = []
+    for col in row:
+        if insn is None:
+            insn = col
+        elif isConstraint(col):
+            yield insn, args, parse_constraint(col)
+            insn = None; args = []
+        elif col != ',':
+            args.append(col)
+
+    if insn is not None:
+        yield insn, args, ANY
+
+def needs_modrm(operands):
+    kinds = [op[0] for op in operands]
+    if R in kinds:
+        return MODRM_REG
+    for kind in kinds:
+        if kind in modrm_kinds:
+            return MODRM
+    return MODRM_NONE
+
+class builder:
+    '''builds each table once, groups once for every set of outer operands'''
+    def __init__(self, source):
+        self.source = source
+        self.rows = {}
+        self.built = {}
+
+    def get_rows(self, name):
+        if name not in self.rows:
+            self.rows[name] = list(parse_firstpass(self.source[name]))
+        return self.rows[name]
+
+    def table(self, name, outer=()):
+        key = (name, outer)
+        if key in self.built:
+            return self.built[key]
+
+        rows = self.get_rows(name)
+        if name.startswith('opcode_'):
+            count = 256
+        elif name.startswith('group_') or name.startswith('fpu_'):
+            # 8 rows are used for either mod, 16 split mem/reg
+            count = len(rows) > 8 and 16 or 8
+        else:
+            raise TableError("Unknown table %s" % name)
+
+        if len(rows) > count:
+            raise TableError("%s has %d rows" % (name, len(rows)))
+
+        res = [self.entry(name, row, outer) for row in rows]
+        res += [None] * (count - len(res))
+        if count == 8:
+            res += res
+
+        res = tuple(res)
+        self.built[key] = res
+        return res
+
+    def entry(self, name, row, outer):
+        try:
+            if row[0] == '>':
+                table = row[1]
+                if name.startswith('opcode_'):
+                    return (ESCAPE, self.table(table))
+                return (RMTABLE, self.subtable(table, outer))
+
+            if len(row) > 1 and row[1] == ':':
+                mask, value = prefixes[row[0]]
+                return (PREFIX, mask, value)
+
+            return self.insn(row, outer)
+
+        except (KeyError, IndexError, TableError), e:
+            raise TableError('%s row %s -> %s: %s' % (name, repr(row), e.__class__.__name__, str(e)))
+
+    def subtable(self, name, outer):
+        rows = self.get_rows(name)
+        if len(rows) != 8:
+            raise TableError("%s has %d rows" % (name, len(rows)))
+        return tuple([self.insn(row, outer) for row in rows])
+
+    def insn(self, row, outer):
+        alternatives = []
+        for mnemonic, args, constraint in split_alternatives(row):
+            operands = outer + tuple([parse_operand(arg) for arg in args])
+            if mnemonic == '-':
+                mnemonic = None
+
+            elif mnemonic in self.source:
+                # a group takes over the row
+                return (GROUP, MODRM, self.table(mnemonic, operands))
+
+            alternatives.append((constraint, mnemonic, operands))
+
+        if len(alternatives) == 1 and alternatives[0][1] is None:
+            return None
+
+        modrm = max([needs_modrm(operands) for constraint, mnemonic, operands in alternatives])
+
+        constraint, mnemonic, operands = alternatives[0]
+        if constraint == ANY:
+            return (INSN, modrm, mnemonic, operands, None)
+
+        alternatives = tuple([constraint + (mnemonic, operands) for constraint, mnemonic, operands in alternatives])
+        return (INSN, modrm, None, (), alternatives)
+
+def build(source=data.table):
+    '''returns the decoding root, the flattened one byte opcode table'''
+    return builder(source).table('opcode_1')
+
+def digest(source=data.table):
+    '''identifies the text the tables are built from'''
+    res = hashlib.sha1()
+    for name in sorted(source):
+        res.update(name)
+        res.update(source[name])
+    return res.hexdigest()
+
+def generate(filename=cache):
+    '''writes the flattened tables out for load()'''
+    fd = open(filename, 'wb')
+    try:
+        marshal.dump((digest(), build()), fd)
+    finally:
+        fd.close()
+
+def load(filename=cache):
+    '''the flattened tables from the cache, built again if data.py changed'''
+    try:
+        fd = open(filename, 'rb')
+        try:
+            version, opcodes = marshal.load(fd)
+        finally:
+            fd.close()
+    except (IOError, EOFError, ValueError, TypeError):
+        return build()
+
+    if version != digest():
+        return build()
+    return opcodes
+
+if __name__ == '__main__':
+    generate()
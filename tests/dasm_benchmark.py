@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import sys, time
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from ia32 import dasm
+
+try:
+    import pydasm
+except ImportError:
+    pydasm = None
+
+# A function prologue, a few loads and stores, a loop and some sse
+code = "\x55"                           # push ebp
+code += "\x89\xe5"                      # mov ebp, esp
+code += "\x83\xec\x08"                  # sub esp, 0x8
+code += "\xa1\x48\x26\x05\x08"          # mov eax, [0x8052648]
+code += "\x85\xc0"                      # test eax, eax
+code += "\x74\x12"                      # jz +0x12
+code += "\xc7\x04\x24\x48\x26\x05\x08"  # mov dword [esp], 0x8052648
+code += "\x8b\x44\x8e\xfc"              # mov eax, [esi+ecx*4-0x4]
+code += "\x64\xa1\x30\x00\x00\x00"      # mov eax, fs:[0x30]
+code += "\x0f\xb6\xd8"                  # movzx ebx, al
+code += "\xf3\xa5"                      # rep movsd
+code += "\x66\x0f\x6f\x04\x24"          # movdqa xmm0, [esp]
+code += "\x6a\xff"                      # push -1
+code += "\xff\xd0"                      # call eax
+code += "\xc9"                          # leave
+code += "\xc3"                          # ret
+
+code = code * 2000
+
+fields = ["length", "opcode", "modrm", "sib", "extindex", "dispbytes", "immbytes", "flags"]
+opfields = ["type", "reg", "basereg", "indexreg", "dispbytes", "immbytes"]
+
+def run(name, decode):
+    offset = 0
+    count = 0
+
+    start = time.time()
+    while offset < len(code):
+        instruction = decode(offset)
+        if not instruction:
+            print "[!] %s failed at %d" % (name, offset)
+            sys.exit(-1)
+
+        offset += instruction.length
+        count += 1
+    elapsed = time.time() - start
+
+    print "%-8s %d instructions in %.3fs, %d/s" % (name, count, elapsed, count / elapsed)
+
+run("ia32", lambda offset: dasm.get_instruction(code, dasm.MODE_32, offset))
+
+# the length only sweep has to land on the same boundaries
+start = time.time()
+offsets = dasm.get_offsets(code)
+elapsed = time.time() - start
+
+print "%-8s %d instructions in %.3fs, %d/s" % ("offsets", len(offsets), elapsed, len(offsets) / elapsed)
+
+offset = 0
+for found in offsets:
+    if found != offset:
+        print "[!] offsets %d != %d" % (found, offset)
+        sys.exit(-1)
+    offset += dasm.get_length(code, offset)
+
+if not pydasm:
+    print "pydasm not found, skipping the comparison"
+else:
+    run("pydasm", lambda offset: pydasm.get_instruction(code[offset:offset + 16], pydasm.MODE_32))
+
+    offset = 0
+    while offset < len(code) / 2000:
+        ours = dasm.get_instruction(code, dasm.MODE_32, offset)
+        theirs = pydasm.get_instruction(code[offset:offset + 16], pydasm.MODE_32)
+
+        for field in fields:
+            if getattr(ours, field) != getattr(theirs, field):
+                print "[!] %d %s: %r != %r" % (offset, field, getattr(ours, field), getattr(theirs, field))
+
+        for op in ["op1", "op2", "op3"]:
+            for field in opfields:
+                if getattr(getattr(ours, op), field) != getattr(getattr(theirs, op), field):
+                    print "[!] %d %s.%s: %r != %r" % (offset, op, field, getattr(getattr(ours, op), field), getattr(getattr(theirs, op), field))
+
+        if dasm.get_mnemonic_string(ours, dasm.FORMAT_INTEL) != pydasm.get_mnemonic_string(theirs, pydasm.FORMAT_INTEL).rstrip(" "):
+            print "[!] %d mnemonic: %s != %s" % (offset, dasm.get_mnemonic_string(ours, dasm.FORMAT_INTEL), pydasm.get_mnemonic_string(theirs, pydasm.FORMAT_INTEL))
+
+        offset += ours.length
+
+print "Done"
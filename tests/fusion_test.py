@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import sys
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+
+# A loop made of the idioms that get fused
+code = "\xb9\x00\x01\x00\x00"    # mov ecx, 0x100
+code += "\x55"                   # push ebp
+code += "\x89\xe5"               # mov ebp, esp
+code += "\x31\xc0"               # xor eax, eax
+code += "\x8b\xd1"               # mov edx, ecx
+code += "\x83\xc2\xfc"           # add edx, -4
+code += "\x85\xd2"               # test edx, edx
+code += "\x7e\x01"               # jle 0x00401014
+code += "\x40"                   # inc eax
+code += "\x5d"                   # pop ebp
+code += "\x49"                   # dec ecx
+code += "\x83\xf9\x00"           # cmp ecx, 0
+code += "\x75\xea"               # jnz 0x00401005
+code += "\x90"                   # nop
+
+start = 0x00401000
+end = start + len(code) - 1
+
+registers = ["EAX", "EBX", "ECX", "EDX", "ESP", "EBP", "ESI", "EDI", "EIP"]
+flags = ["CF", "PF", "ZF", "SF", "OF"]
+
+def run(fusion):
+    emu = PEPyEmu()
+    emu.load_image(start, code, "rx")
+    emu.set_block_mode(True)
+    emu.set_fusion_mode(fusion)
+
+    if not emu.execute(start=start, end=end):
+        print "[!] Execution failed with fusion %d" % fusion
+        sys.exit(-1)
+
+    state = {}
+    for register in registers:
+        state[register] = emu.get_register(register)
+    for flag in flags:
+        state[flag] = emu.cpu.get_register8(flag)
+
+    return state
+
+unfused = run(False)
+fused = run(True)
+
+for name in registers + flags:
+    if unfused[name] != fused[name]:
+        print "[!] %s mismatch 0x%08x != 0x%08x" % (name, unfused[name], fused[name])
+        sys.exit(-1)
+
+print "EAX: 0x%08x EDX: 0x%08x" % (fused["EAX"], fused["EDX"])
+print "Done"
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import sys, struct
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+from PyHLE import PyHLE
+
+# Plain cdecl versions of the routines, run as x86 or replaced by PyHLE
+strlen = "\x8b\x54\x24\x04"       # mov edx, [esp+4]
+strlen += "\x31\xc0"              # xor eax, eax
+strlen += "\x80\x3c\x02\x00"      # cmp byte [edx+eax], 0
+strlen += "\x74\x03"              # jz +3
+strlen += "\x40"                  # inc eax
+strlen += "\xeb\xf7"              # jmp -9
+strlen += "\xc3"                  # ret
+
+strcpy = "\x8b\x54\x24\x04"       # mov edx, [esp+4]
+strcpy += "\x8b\x4c\x24\x08"      # mov ecx, [esp+8]
+strcpy += "\x8a\x01"              # mov al, [ecx]
+strcpy += "\x88\x02"              # mov [edx], al
+strcpy += "\x41"                  # inc ecx
+strcpy += "\x42"                  # inc edx
+strcpy += "\x84\xc0"              # test al, al
+strcpy += "\x75\xf6"              # jnz -10
+strcpy += "\x8b\x44\x24\x04"      # mov eax, [esp+4]
+strcpy += "\xc3"                  # ret
+
+memcpy = "\x56"                   # push esi
+memcpy += "\x57"                  # push edi
+memcpy += "\x8b\x7c\x24\x0c"      # mov edi, [esp+0xc]
+memcpy += "\x8b\x74\x24\x10"      # mov esi, [esp+0x10]
+memcpy += "\x8b\x4c\x24\x14"      # mov ecx, [esp+0x14]
+memcpy += "\xf3\xa4"              # rep movsb
+memcpy += "\x8b\x44\x24\x0c"      # mov eax, [esp+0xc]
+memcpy += "\x5f"                  # pop edi
+memcpy += "\x5e"                  # pop esi
+memcpy += "\xc3"                  # ret
+
+memset = "\x57"                   # push edi
+memset += "\x8b\x7c\x24\x08"      # mov edi, [esp+8]
+memset += "\x8b\x44\x24\x0c"      # mov eax, [esp+0xc]
+memset += "\x8b\x4c\x24\x10"      # mov ecx, [esp+0x10]
+memset += "\xf3\xaa"              # rep stosb
+memset += "\x8b\x44\x24\x08"      # mov eax, [esp+8]
+memset += "\x5f"                  # pop edi
+memset += "\xc3"                  # ret
+
+# Returns -1, 0 or 1 like the HLE routine
+strcmp = "\x8b\x4c\x24\x04"       # mov ecx, [esp+4]
+strcmp += "\x8b\x54\x24\x08"      # mov edx, [esp+8]
+strcmp += "\x8a\x01"              # mov al, [ecx]
+strcmp += "\x3a\x02"              # cmp al, [edx]
+strcmp += "\x75\x08"              # jnz +8
+strcmp += "\x84\xc0"              # test al, al
+strcmp += "\x74\x11"              # jz +17
+strcmp += "\x41"                  # inc ecx
+strcmp += "\x42"                  # inc edx
+strcmp += "\xeb\xf2"              # jmp -14
+strcmp += "\xb8\x01\x00\x00\x00"  # mov eax, 1
+strcmp += "\x73\x05"              # jae +5
+strcmp += "\xb8\xff\xff\xff\xff"  # mov eax, -1
+strcmp += "\xc3"                  # ret
+strcmp += "\x31\xc0"              # xor eax, eax
+strcmp += "\xc3"                  # ret
+
+routines = {"strlen": (0x00401000, strlen),
+            "strcpy": (0x00401100, strcpy),
+            "memcpy": (0x00401200, memcpy),
+            "memset": (0x00401300, memset),
+            "strcmp": (0x00401400, strcmp)}
+
+caller = 0x00402000
+
+hello = 0x00403000
+empty = 0x00403010
+abc = 0x00403020
+abd = 0x00403030
+a = 0x00403040
+buffer = 0x00403100
+
+data = "hello\x00".ljust(0x10, "\x00")
+data += "\x00".ljust(0x10, "\x00")
+data += "abc\x00".ljust(0x10, "\x00")
+data += "abd\x00".ljust(0x10, "\x00")
+data += "a\x00".ljust(0x10, "\x00")
+data = data.ljust(0x100, "\x00") + "\xcc" * 0x20
+
+cases = [("strlen", [hello]),
+         ("strlen", [empty]),
+         ("strcpy", [buffer, hello]),
+         ("strcpy", [buffer, empty]),
+         ("memcpy", [buffer, hello, 6]),
+         ("memcpy", [buffer, hello, 0]),
+         ("memset", [buffer, 0x41, 5]),
+         ("memset", [buffer, 0x41, 0]),
+         ("strcmp", [abc, abd]),
+         ("strcmp", [abd, abc]),
+         ("strcmp", [abc, abc]),
+         ("strcmp", [empty, a])]
+
+def run(name, arguments, hle):
+    emu = PEPyEmu()
+
+    for address, code in routines.values():
+        emu.load_image(address, code, "rx")
+
+    emu.load_image(0x00403000, data, "rw")
+
+    # push the arguments, call the routine and clean up after it
+    address, code = routines[name]
+
+    code = ""
+    for argument in reversed(arguments):
+        code += "\x68" + struct.pack("<L", argument)
+    code += "\xe8" + struct.pack("<l", address - (caller + len(code) + 5))
+    code += "\x83\xc4" + chr(len(arguments) * 4)
+
+    emu.load_image(caller, code + "\x90", "rx")
+
+    if hle:
+        routine = PyHLE(emu)
+        routine.add_function(address, name)
+
+    if not emu.execute(start=caller, end=caller + len(code)):
+        print "[!] %s failed with hle %d" % (name, hle)
+        sys.exit(-1)
+
+    if hle and routine.calls != 1:
+        print "[!] %s never reached the high level routine" % name
+        sys.exit(-1)
+
+    memory = [emu.get_memory(0x00403000 + x, 1) for x in range(len(data))]
+
+    return emu.get_register("EAX"), memory
+
+for name, arguments in cases:
+    emulated = run(name, arguments, False)
+    replaced = run(name, arguments, True)
+
+    if emulated[0] != replaced[0]:
+        print "[!] %s%s returned 0x%08x != 0x%08x" % (name, tuple(arguments), replaced[0], emulated[0])
+        sys.exit(-1)
+
+    for x in range(len(data)):
+        if emulated[1][x] != replaced[1][x]:
+            print "[!] %s%s left 0x%02x != 0x%02x @ 0x%08x" % (name, tuple(arguments), replaced[1][x], emulated[1][x], 0x00403000 + x)
+            sys.exit(-1)
+
+print "Cases: %d" % len(cases)
+print "Done"
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import sys
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+
+iat = 0x00404000
+
+# Two import tables, out of order, with LoadLibraryA imported twice
+imports = [(iat + 0x00, "KERNEL32.dll", "GetProcAddress"),
+           (iat + 0x10, "MSVCRT.dll", "memcpy"),
+           (iat + 0x04, "KERNEL32.dll", "LoadLibraryA"),
+           (iat + 0x0c, "MSVCRT.dll", "strlen"),
+           (iat + 0x18, "kernel32.dll", "LoadLibraryA")]
+
+# Stubs are handed out in the order the imports are seen
+stubs = {"GetProcAddress": 0x70000000,
+         "memcpy": 0x70000004,
+         "LoadLibraryA": 0x70000008,
+         "strlen": 0x7000000c}
+
+emu = PEPyEmu()
+emu.load_image(iat, "\xcc" * 0x20, "rw")
+
+if not emu.os.bind_imports(emu, imports):
+    print "[!] Couldnt bind imports"
+    sys.exit(-1)
+
+for address, dllname, function in imports:
+    stub = emu.get_memory(address, 4)
+    if stub != stubs[function]:
+        print "[!] %s!%s @ 0x%08x points at 0x%08x not 0x%08x" % (dllname, function, address, stub, stubs[function])
+        sys.exit(-1)
+
+    library = emu.os.get_library(stub)
+    if not library or library['name'] != function:
+        print "[!] No library at stub 0x%08x for %s" % (stub, function)
+        sys.exit(-1)
+
+    if emu.os.library_names.get(function) != stub or emu.os.library_keys.get((dllname.lower(), function)) != stub:
+        print "[!] %s!%s is not indexed at 0x%08x" % (dllname, function, stub)
+        sys.exit(-1)
+
+# The words between the thunks are left alone by the single write
+for address in [iat + 0x08, iat + 0x14, iat + 0x1c]:
+    if emu.get_memory(address, 4) != 0xcccccccc:
+        print "[!] Word @ 0x%08x changed to 0x%08x" % (address, emu.get_memory(address, 4))
+        sys.exit(-1)
+
+print "Stubs: 0x%08x-0x%08x" % (emu.os.library_start, emu.os.library_end)
+print "Done"
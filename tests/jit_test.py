@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import sys
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+
+# A checksum loop over the instructions the compiler handles inline
+code = "\xb9\x00\x01\x00\x00"    # mov ecx, 0x100
+code += "\x31\xc0"               # xor eax, eax
+code += "\xba\x78\x56\x34\x12"   # mov edx, 0x12345678
+code += "\x01\xd0"               # add eax, edx
+code += "\xc1\xe2\x03"           # shl edx, 3
+code += "\x31\xc2"               # xor edx, eax
+code += "\x0f\xb6\xd8"           # movzx ebx, al
+code += "\x29\xd8"               # sub eax, ebx
+code += "\x50"                   # push eax
+code += "\x5f"                   # pop edi
+code += "\x49"                   # dec ecx
+code += "\x75\xef"               # jnz 0x0040100c
+code += "\xa1\x00\x30\x40\x00"    # mov eax, [0x00403000]
+code += "\x89\xc3"               # mov ebx, eax
+code += "\xb8\x00\x00\x66\x55"    # mov eax, 0x55660000
+code += "\x66\xa1\x00\x30\x40\x00" # mov ax, [0x00403000]
+code += "\x90"                   # nop
+
+data = "\x44\x33\x22\x11"
+
+start = 0x00401000
+end = start + len(code) - 1
+
+registers = ["EAX", "EBX", "ECX", "EDX", "ESP", "EBP", "ESI", "EDI", "EIP"]
+flags = ["CF", "PF", "ZF", "SF", "OF"]
+
+def run(threshold, watch=False):
+    emu = PEPyEmu()
+    emu.load_image(start, code, "rx")
+    emu.load_image(0x00403000, data, "rw")
+    emu.set_block_mode(True)
+    emu.set_jit_threshold(threshold)
+
+    # Memory handlers must see the EIP of the instruction touching memory
+    accesses = []
+    if watch:
+        def memory_handler(emu, address, value, size, type):
+            accesses.append((type, emu.get_register("EIP")))
+
+            return True
+
+        emu.set_memory_handler(0x00403000, memory_handler)
+
+    if not emu.execute(start=start, end=end):
+        print "[!] Execution failed with threshold %d" % threshold
+        sys.exit(-1)
+
+    state = {}
+    for register in registers:
+        state[register] = emu.get_register(register)
+    for flag in flags:
+        state[flag] = emu.cpu.get_register8(flag)
+    state["accesses"] = accesses
+
+    return state
+
+interpreted = run(0)
+compiled = run(2)
+
+for name in registers + flags:
+    if interpreted[name] != compiled[name]:
+        print "[!] %s mismatch 0x%08x != 0x%08x" % (name, interpreted[name], compiled[name])
+        sys.exit(-1)
+
+interpreted = run(0, True)
+compiled = run(1, True)
+
+if interpreted["accesses"] != compiled["accesses"]:
+    print "[!] Memory handler saw %s != %s" % (interpreted["accesses"], compiled["accesses"])
+    sys.exit(-1)
+
+# The block leaves after rewriting its own sub into a mov, the flags of
+# the add have to be stored before it does
+smc = "\x83\xc0\xff"                     # add eax, -1
+smc += "\xc6\x05\x0a\x20\x40\x00\x89"     # mov byte [0x0040200a], 0x89
+smc += "\x29\xd8"                        # sub eax, ebx
+smc += "\x90"                            # nop
+
+def run_smc(threshold):
+    emu = PEPyEmu()
+    emu.load_image(0x00402000, smc, "rwx")
+    emu.set_block_mode(True)
+    emu.set_jit_threshold(threshold)
+
+    if not emu.execute(start=0x00402000, end=0x0040200c):
+        print "[!] Self modifying execution failed with threshold %d" % threshold
+        sys.exit(-1)
+
+    return [emu.cpu.get_register8(flag) for flag in flags]
+
+if run_smc(0) != run_smc(1) or not run_smc(1)[flags.index("SF")]:
+    print "[!] Flags lost leaving a rewritten block %s != %s" % (run_smc(0), run_smc(1))
+    sys.exit(-1)
+
+# The moffs loads must read [0x00403000] itself
+for state in [interpreted, compiled]:
+    if state["EBX"] != 0x11223344 or state["EAX"] != 0x55663344:
+        print "[!] moffs load gave EAX 0x%08x EBX 0x%08x" % (state["EAX"], state["EBX"])
+        sys.exit(-1)
+
+print "EAX: 0x%08x EDX: 0x%08x" % (compiled["EAX"], compiled["EDX"])
+print "Done"
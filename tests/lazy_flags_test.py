@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import sys, random
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyCPU import PyCPU
+from PyFlags import PyFlags
+
+class PyEmu:
+    def __init__(self):
+        self.register_handlers = {}
+
+mnemonics = ["ADD", "ADC", "SUB", "CMP", "SBB", "NEG", "LOGIC", "SAR", "SHR", "SHL", "SAL", "IMUL", "MUL", "INC", "DEC"]
+
+cpu = PyCPU(PyEmu())
+
+# What the flags would be if we evaluated them eagerly
+eager = {"CF": 0, "PF": 0, "AF": 0, "ZF": 0, "SF": 0, "OF": 0}
+
+for x in xrange(100000):
+    mnemonic = random.choice(mnemonics)
+    size = random.choice([1, 2, 4])
+    mask = (2 ** (size * 8) - 1)
+    
+    op1 = random.randint(0, mask)
+    op2 = random.randint(1, (size * 8) - 1)
+    result = random.randint(0, mask)
+    
+    cpu.set_flags(mnemonic, op1, op2, result, size)
+    
+    flags = PyFlags(mnemonic, op1, op2, result, size)
+    for flag in eager.keys():
+        value = flags.get_flag(flag)
+        if value != None:
+            eager[flag] = value
+    
+    # Read some flags in the middle of the stream
+    if random.randint(0, 3) == 0:
+        flag = random.choice(eager.keys())
+        if cpu.get_register8(flag) != eager[flag]:
+            print "[!] %s mismatch after %s(%x, %x, %x, %d)" % (flag, mnemonic, op1, op2, result, size)
+            sys.exit(-1)
+    
+    # And write some directly
+    if random.randint(0, 19) == 0:
+        flag = random.choice(eager.keys())
+        cpu.set_register8(flag, 1)
+        eager[flag] = 1
+
+print "Done"
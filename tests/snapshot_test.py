@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import sys
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+
+code = "\xb8\x11\x11\x11\x11"        # mov eax, 0x11111111
+code += "\x89\x05\x00\x30\x40\x00"   # mov [0x00403000], eax
+code += "\xff\x05\x04\x30\x40\x00"   # inc dword [0x00403004]
+code += "\x90"                       # nop
+
+start = 0x00401000
+end = start + len(code) - 1
+
+data = 0x00403000
+mapped = 0x00405000
+
+def check(emu, what, eax, stored, count):
+    state = (emu.get_register("EAX"), emu.get_memory(data, 4), emu.get_memory(data + 4, 4))
+    if state != (eax, stored, count):
+        print "[!] %s gave EAX 0x%08x [data] 0x%08x [data+4] %d" % ((what,) + state)
+        sys.exit(-1)
+
+def execute(emu):
+    if not emu.execute(start=start, end=end):
+        print "[!] Execution failed"
+        sys.exit(-1)
+
+# Compiled blocks have to go when restore puts back the code they came from
+emu = PEPyEmu()
+emu.load_image(start, code, "rwx")
+emu.load_image(data, "\x00" * 8, "rw")
+emu.set_block_mode(True)
+emu.set_jit_threshold(1)
+emu.set_register("EAX", 0x1234)
+ebx = emu.get_register("EBX")
+
+older = emu.snapshot()
+
+execute(emu)
+check(emu, "First run", 0x11111111, 0x11111111, 1)
+
+# Patch the immediate and map a page after the first snapshot
+emu.set_memory(start + 1, 0x22222222, 4)
+emu.load_image(mapped, "\x99" * 4, "rw")
+
+latest = emu.snapshot()
+
+execute(emu)
+check(emu, "Patched run", 0x22222222, 0x22222222, 2)
+
+emu.set_register("EBX", 0x77)
+emu.set_memory(mapped, 0, 1)
+
+# The latest snapshot only puts back the dirty pages
+emu.restore(latest)
+check(emu, "Latest restore", 0x22222222, 0x11111111, 1)
+
+if emu.get_register("EBX") != ebx or emu.get_memory(mapped, 1) != 0x99:
+    print "[!] Latest restore left EBX 0x%08x [mapped] 0x%02x" % (emu.get_register("EBX"), emu.get_memory(mapped, 1))
+    sys.exit(-1)
+
+execute(emu)
+check(emu, "Run after latest restore", 0x22222222, 0x22222222, 2)
+
+# An older snapshot compares every page and drops the one mapped since
+emu.restore(older)
+check(emu, "Older restore", 0x1234, 0, 0)
+
+if mapped in emu.memory.pages:
+    print "[!] Older restore kept the page mapped after it"
+    sys.exit(-1)
+
+if emu.get_memory(start + 1, 4) != 0x11111111:
+    print "[!] Older restore left the patched code"
+    sys.exit(-1)
+
+execute(emu)
+check(emu, "Run after older restore", 0x11111111, 0x11111111, 1)
+
+print "Done"
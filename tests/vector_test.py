@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import sys
+
+sys.path.append("..")
+sys.path.append("../lib")
+
+from PyEmu import PEPyEmu
+from PyVector import PyVector
+
+# Odd and even inputs take different sides of the branch and the even
+# side runs an instruction PyVector leaves to the scalar cpu
+code = "\x89\xc1"                # mov ecx, eax
+code += "\x83\xe1\x01"           # and ecx, 1
+code += "\x74\x05"               # jz 0x0040100c
+code += "\x83\xc0\x10"           # add eax, 0x10
+code += "\xeb\x04"               # jmp 0x00401010
+code += "\xf7\xd0"               # not eax
+code += "\xd1\xe8"               # shr eax, 1
+code += "\x35\x5a\x5a\x00\x00"   # xor eax, 0x5a5a
+code += "\x90"                   # nop
+
+start = 0x00401000
+end = start + len(code) - 1
+
+inputs = [0x0, 0x1, 0x2, 0x3, 0x7f, 0x80, 0xff, 0x100,
+          0x1234, 0x5a5a, 0x7fffffff, 0x80000000, 0xdeadbeef, 0xfffffffe, 0xffffffff, 0x41414141]
+
+def prepare():
+    emu = PEPyEmu()
+    emu.load_image(start, code, "rx")
+    emu.set_register("EIP", start)
+
+    return emu
+
+# Every lane on its own through the scalar cpu
+scalar = []
+for value in inputs:
+    emu = prepare()
+    emu.set_register("EAX", value)
+
+    if not emu.execute(start=start, end=end):
+        print "[!] Scalar execution failed for 0x%08x" % value
+        sys.exit(-1)
+
+    scalar.append(emu.get_register("EAX"))
+
+emu = prepare()
+eax = emu.get_register("EAX")
+
+vector = PyVector(emu, start, end)
+results = vector.run({"registers": {"EAX": inputs}})
+if not results:
+    print "[!] Vector execution failed"
+    sys.exit(-1)
+
+for value, expected, result in zip(inputs, scalar, results):
+    if expected != result:
+        print "[!] 0x%08x gave 0x%08x != 0x%08x" % (value, result, expected)
+        sys.exit(-1)
+
+if not vector.escapes:
+    print "[!] The even lanes should have finished on the scalar cpu"
+    sys.exit(-1)
+
+# The emulator is left the way we found it
+if emu.get_register("EAX") != eax or emu.get_register("EIP") != start:
+    print "[!] Emulator state was not restored"
+    sys.exit(-1)
+
+# Uneven inputs are refused
+if PyVector(prepare(), start, end).run({"registers": {"EAX": inputs, "EBX": inputs[:-1]}}) is not False:
+    print "[!] Uneven inputs should be refused"
+    sys.exit(-1)
+
+# A pc handler sees every lane, so hooked lanes finish on the scalar cpu
+calls = []
+def pc_handler(emu, address):
+    calls.append(address)
+
+    return True
+
+emu = prepare()
+emu.set_pc_handler(start + 0x10, pc_handler)
+
+hooked = PyVector(emu, start, end).run({"registers": {"EAX": inputs}})
+if hooked != scalar or len(calls) != len(inputs):
+    print "[!] pc handler ran %d times for %d lanes" % (len(calls), len(inputs))
+    sys.exit(-1)
+
+print "Lanes: %d Escapes: %d" % (len(results), vector.escapes)
+print "Done"